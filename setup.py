@@ -16,6 +16,9 @@ setup(name='smc-python',
       install_requires=[
           'requests==2.12.0'
       ],
+      extras_require={
+          'simulator': ['numpy']
+      },
       include_package_data=True,
       classifiers=[
         "Programming Language :: Python :: 2.7",
@@ -7,6 +7,8 @@ __version__ = '0.5.1'
 # Default SMC Session
 session = Session()
 
+from smc.base.transaction import transaction  # @UnusedImport
+
 
 def set_stream_logger(name='smc', level=logging.DEBUG, format_string=None):
     """
@@ -21,12 +21,18 @@ Get element reference::
 All elements by type::
 
     smc.actions.search.all_elements_by_type('host')
+
+Resolve many names to href concurrently::
+
+    smc.actions.search.NameResolver().resolve(['host1', 'host2'], 'host')
 """
 import logging
 from smc.api.common import fetch_href_by_name, fetch_json_by_href,\
     fetch_json_by_name, fetch_entry_point, fetch_json_by_post
 from smc import session
 from smc.api.exceptions import UnsupportedEntryPoint
+from smc.base.collection import ElementCollection
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
 
 logger = logging.getLogger(__name__)
 
@@ -262,19 +268,179 @@ def element_as_smcresult_use_filter(name, _filter):
 
 def element_href_by_batch(list_to_find, filter=None):  # @ReservedAssignment
     """ Find batch of entries by name. Reduces number of find calls from
-    calling class.
+    calling class. Names are resolved concurrently using a
+    :class:`NameResolver`.
 
     :param list list_to_find: list of names to find
     :param filter: optional filter, i.e. 'tcp_service', 'host', etc
     :return: list: {name: href, name: href}, href may be None if not found
+        or the lookup failed
     """
     try:
-        if filter:
-            return [{k: element_href_use_filter(k, filter)
-                     for k in list_to_find}]
-        return [{k: element_href(k) for k in list_to_find}]
+        resolver = NameResolver()
+        resolved = resolver.resolve(list_to_find, filter)
     except TypeError:
         logger.error("{} is not iterable".format(list_to_find))
+        return
+    hrefs = {}
+    for name, href in resolved.items():
+        if href is AMBIGUOUS and filter:
+            href = resolver.candidates(name, filter)[-1]
+        hrefs[name] = href or None
+    return [hrefs]
+
+
+class _Marker(object):
+    """
+    Result of name resolution when a name does not resolve to a single
+    href. Markers evaluate as False.
+    """
+    __slots__ = ('label',)
+
+    def __init__(self, label):
+        self.label = label
+
+    def __repr__(self):
+        return self.label
+
+    def __bool__(self):
+        return False
+    __nonzero__ = __bool__
+
+
+#: Returned by :class:`NameResolver` when no element has the name
+NOT_FOUND = _Marker('NOT_FOUND')
+#: Returned by :class:`NameResolver` when more than one element has the name
+AMBIGUOUS = _Marker('AMBIGUOUS')
+#: Returned by :class:`NameResolver` when the lookup of the name failed
+ERROR = _Marker('ERROR')
+
+
+class NameResolver(object):
+    """
+    Resolve element names to href in bulk. Duplicate names are resolved
+    once and results are cached by the resolver, so a resolver can be
+    reused while processing input that repeats names (i.e. provisioning
+    from a CSV file)::
+
+        resolver = NameResolver()
+        hrefs = resolver.resolve(['host-1', 'host-2', 'missing'], 'host')
+        for name, href in hrefs.items():
+            if href is NOT_FOUND:
+                ...
+            elif href is AMBIGUOUS:
+                print(resolver.candidates(name, 'host'))
+            elif href is ERROR:
+                print(resolver.error(name, 'host'))
+
+    Names are searched concurrently with one exact match query per name.
+    When a filter context is provided and the number of names to resolve
+    reaches ``batch_threshold``, the elements of the filter context are
+    listed once instead and names are matched locally. Names whose
+    lookup failed are not cached and are searched again by the next call
+    to :meth:`resolve`.
+
+    :param int workers: number of concurrent queries
+    :param int batch_threshold: number of names for a filter context at
+        which the filter context is listed rather than queried by name
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, batch_threshold=100):
+        self.workers = workers
+        self.batch_threshold = batch_threshold
+        self._cache = {}  # (filter_context, name) -> tuple of href
+        self._errors = {}  # (filter_context, name) -> exception
+
+    def resolve(self, names, filter_context=None):
+        """
+        Resolve names to href.
+
+        :param list names: element names, duplicates are allowed
+        :param str filter_context: optional filter, i.e. 'host',
+            'network_elements', 'services'
+        :return: dict of name to href, :data:`NOT_FOUND`,
+            :data:`AMBIGUOUS` or :data:`ERROR`
+        :rtype: dict
+        """
+        names = set(names)
+        for name in names:
+            self._errors.pop((filter_context, name), None)
+        missing = [name for name in names
+                   if name and (filter_context, name) not in self._cache]
+        if missing:
+            if filter_context and len(missing) >= self.batch_threshold:
+                self._resolve_by_listing(missing, filter_context)
+            else:
+                self._resolve_by_name(missing, filter_context)
+
+        results = {}
+        for name in names:
+            hrefs = self._cache.get((filter_context, name), ())
+            if (filter_context, name) in self._errors:
+                results[name] = ERROR
+            elif not hrefs:
+                results[name] = NOT_FOUND
+            elif len(hrefs) > 1:
+                results[name] = AMBIGUOUS
+            else:
+                results[name] = hrefs[0]
+        return results
+
+    def candidates(self, name, filter_context=None):
+        """
+        All hrefs found for a name resolved previously. Use to choose
+        between the elements of an :data:`AMBIGUOUS` result.
+
+        :rtype: tuple
+        """
+        return self._cache.get((filter_context, name), ())
+
+    def error(self, name, filter_context=None):
+        """
+        Exception raised by the lookup of a name that resolved to
+        :data:`ERROR` in the last call to :meth:`resolve`.
+
+        :rtype: Exception
+        """
+        return self._errors.get((filter_context, name))
+
+    def clear(self):
+        """
+        Clear cached results
+
+        :return: None
+        """
+        self._cache.clear()
+        self._errors.clear()
+
+    def _resolve_by_name(self, names, filter_context):
+        def search(name):
+            return fetch_href_by_name(name, filter_context=filter_context).json
+
+        for name, result, error in imap_unordered(search, names, self.workers):
+            if error is not None:
+                logger.error('Failed to resolve %s: %s', name, error)
+                self._errors[(filter_context, name)] = error
+                continue
+            self._cache[(filter_context, name)] = _unique_hrefs(result)
+
+    def _resolve_by_listing(self, names, filter_context):
+        found = dict((name, []) for name in names)
+        collection = ElementCollection(filter_context=filter_context)
+        for item in collection.iter_items():
+            if item.get('name') in found:
+                found[item.get('name')].append(item)
+        for name, items in found.items():
+            self._cache[(filter_context, name)] = _unique_hrefs(items)
+
+
+def _unique_hrefs(items):
+    hrefs = []
+    for item in items or []:
+        href = item.get('href')
+        if href and href not in hrefs:
+            hrefs.append(href)
+    return tuple(hrefs)
 
 
 def all_elements_by_type(name):
@@ -0,0 +1,202 @@
+"""
+Upload or refresh policy on many engines.
+
+:py:meth:`smc.core.engine.Engine.upload` and
+:py:meth:`smc.core.engine.Engine.refresh` return a generator that polls a
+single task, sleeping between polls. :class:`FleetUpload` starts the tasks
+for many engines and polls all of them from one loop, keeping a bounded
+number of tasks running::
+
+    from smc.core.engine import Engine
+    from smc.administration.fleet import FleetUpload
+
+    engines = list(Engine.objects.all())
+    upload = FleetUpload(engines, policy='Corporate', concurrency=25,
+                         wave_size=50, failure_threshold=0.1)
+    for result in upload.run():
+        print(result.wave, result.status, result.engine.name, result.message)
+
+Engines are processed in waves of ``wave_size`` engines; a wave starts after
+the previous wave is complete. When the failures in a wave reach the
+failure threshold, no more tasks are started: running tasks are followed to
+completion and the remaining engines of the wave and of later waves are
+skipped. Start with a small first wave to validate a policy on a few
+engines before pushing it to the rest of the fleet.
+
+Results are yielded as tasks complete and are kept by engine name in
+:attr:`FleetUpload.results`.
+"""
+import logging
+import re
+import time
+from collections import namedtuple, OrderedDict
+from smc.administration.tasks import Task, clean_html
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+#: Result of an upload or refresh. Status is 'success', 'failed',
+#: 'timeout' or 'skipped'; message is the last task message, or the
+#: exception if the task could not be started
+UploadResult = namedtuple('UploadResult',
+                          'engine wave status message follower')
+
+
+class _Running(object):
+    __slots__ = ('engine', 'task', 'started', 'errors')
+
+    def __init__(self, engine, task, started):
+        self.engine = engine
+        self.task = task
+        self.started = started
+        self.errors = 0  # consecutive failed polls
+
+
+class FleetUpload(object):
+    """
+    Upload or refresh policy on engines in waves. See
+    :py:mod:`smc.administration.fleet`.
+
+    :param list engines: engines to upload to
+    :param str policy: name of policy to upload; if None, the current policy
+        of each engine is uploaded
+    :param bool refresh: refresh the current policy rather than upload
+    :param int concurrency: maximum number of tasks running at once
+    :param int wave_size: number of engines per wave; default all engines
+        in one wave
+    :param failure_threshold: failures that stop a wave. A float between 0
+        and 1 (inclusive) is a fraction of the wave, i.e. 0.1 or 1.0 for
+        the whole wave; an int is a number of engines. Default: no
+        threshold.
+    :param int poll: seconds between polls of the running tasks
+    :param int timeout: seconds after which a running task is counted as
+        failed with status 'timeout'; the task is not aborted
+    :param int poll_errors: consecutive failed polls of a task after which
+        the engine is counted as failed, i.e. when the task no longer
+        exists on the SMC
+    :param int workers: number of concurrent requests when starting and
+        polling tasks
+    :ivar dict results: :py:data:`UploadResult` by engine name
+    """
+
+    def __init__(self, engines, policy=None, refresh=False, concurrency=20,
+                 wave_size=None, failure_threshold=None, poll=3,
+                 timeout=None, poll_errors=5, workers=DEFAULT_WORKERS):
+        self.engines = list(engines)
+        self.policy = policy
+        self.refresh = refresh
+        self.concurrency = max(1, concurrency)
+        self.wave_size = wave_size or len(self.engines) or 1
+        self.failure_threshold = failure_threshold
+        self.poll = poll
+        self.timeout = timeout
+        self.poll_errors = max(1, poll_errors)
+        self.workers = workers
+        self.results = OrderedDict()
+        self._stopped = False
+
+    def _limit(self, size):
+        threshold = self.failure_threshold
+        if threshold is None:
+            return size + 1
+        if isinstance(threshold, float) and 0 < threshold <= 1:
+            return max(1, int(round(threshold * size)))
+        return max(1, int(threshold))
+
+    def _start(self, engine):
+        if self.refresh:
+            follower = next(engine.refresh(wait_for_finish=False))
+        else:
+            follower = next(engine.upload(self.policy, wait_for_finish=False))
+        return Task(follower=follower)
+
+    def _result(self, engine, wave, status, message, follower=None):
+        if message is not None and not isinstance(message, Exception):
+            message = re.sub(clean_html, '', message)
+        result = UploadResult(engine, wave, status, message, follower)
+        self.results[engine.name] = result
+        if status in ('failed', 'timeout'):
+            logger.warning('Policy %s on %s %s: %s',
+                           'refresh' if self.refresh else 'upload',
+                           engine.name, status, message)
+        return result
+
+    def run(self):
+        """
+        Start and follow the tasks of all waves.
+
+        :return: generator of :py:data:`UploadResult` as tasks complete;
+            skipped engines are returned when their wave is stopped
+        """
+        self.results = OrderedDict()
+        stopped = False
+        for start in range(0, len(self.engines), self.wave_size):
+            wave = start // self.wave_size + 1
+            engines = self.engines[start:start + self.wave_size]
+            if stopped:
+                for engine in engines:
+                    yield self._result(engine, wave, 'skipped', None)
+                continue
+            for result in self._wave(wave, engines):
+                yield result
+            stopped = self._stopped
+
+    def _wave(self, wave, engines):
+        pending = list(reversed(engines))
+        running = []
+        failures, limit = 0, self._limit(len(engines))
+        self._stopped = False
+        while running or (pending and not self._stopped):
+            starting = []
+            while pending and not self._stopped and \
+                    len(running) + len(starting) < self.concurrency:
+                starting.append(pending.pop())
+            for engine, task, error in imap_unordered(
+                    self._start, starting, self.workers):
+                if error is not None:
+                    failures += 1
+                    yield self._result(engine, wave, 'failed', error)
+                else:
+                    running.append(_Running(engine, task, time.time()))
+            self._stopped = self._stopped or failures >= limit
+            if not running:
+                continue
+            time.sleep(self.poll)
+            still_running = []
+            for entry, _, error in imap_unordered(
+                    lambda entry: entry.task(), running, self.workers):
+                task = entry.task
+                if error is not None:
+                    entry.errors += 1
+                    logger.debug('Polling task of %s failed: %s',
+                                 entry.engine.name, error)
+                    if entry.errors >= self.poll_errors:
+                        failures += 1
+                        yield self._result(entry.engine, wave, 'failed',
+                                           error, task.follower)
+                        continue
+                elif task.success:
+                    yield self._result(entry.engine, wave, 'success',
+                                       task.last_message, task.follower)
+                    continue
+                elif not task.in_progress:
+                    failures += 1
+                    yield self._result(entry.engine, wave, 'failed',
+                                       task.last_message, task.follower)
+                    continue
+                else:
+                    entry.errors = 0
+                if self.timeout is not None and \
+                        time.time() - entry.started > self.timeout:
+                    failures += 1
+                    yield self._result(entry.engine, wave, 'timeout',
+                                       task.last_message, task.follower)
+                    continue
+                still_running.append(entry)
+            running = still_running
+            self._stopped = self._stopped or failures >= limit
+        if self._stopped and pending:
+            logger.warning('Stopped wave %s after %s failures, skipping '
+                           'remaining engines', wave, failures)
+        for engine in reversed(pending):
+            yield self._result(engine, wave, 'skipped', None)
@@ -0,0 +1,235 @@
+"""
+Remove unused elements from the SMC.
+
+:py:func:`smc.actions.search.search_unused` only returns elements that no
+other element references. Elements referenced only by other unused elements
+(for example the members of an unused group) become unused once those are
+deleted. The sweeper uses a :py:class:`smc.index.references.ReferenceGraph`
+to find these elements up front and deletes them in waves: elements are
+deleted only after every unused element referencing them, and the elements
+of a wave are deleted concurrently.
+
+Review the plan before deleting anything::
+
+    from smc.administration.sweeper import Sweeper
+
+    sweeper = Sweeper(types=['host', 'network', 'group'])
+    plan = sweeper.plan()
+    for number, wave in enumerate(plan.waves):
+        for meta in wave:
+            print(number, meta.get('type'), meta.get('name') or meta.get('href'))
+
+Then delete. Progress is reported as each element is deleted::
+
+    for result in sweeper.sweep(plan):
+        print(result.wave, result.status, result.name, result.error or '')
+
+Before each wave after the first, the SMC is asked again for unused
+elements and elements of the wave that are still in use (for example
+referenced by an element type that the reference graph does not crawl) are
+skipped rather than deleted.
+
+The ETag of each element is recorded when the plan is created and sent
+with its delete, so an element that was modified after the plan was
+reviewed is not deleted: the conflict reported by the SMC is not retried
+with the current ETag and the result is 'failed' with the error from the
+SMC. Create a new plan to include it again.
+"""
+import logging
+import re
+from collections import namedtuple
+import smc.actions.search as search
+from smc.api.exceptions import DeleteElementFailed, FetchElementFailed
+from smc.base.model import prepared_request
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+from smc.index.references import ReferenceGraph
+
+logger = logging.getLogger(__name__)
+
+_ELEMENT = re.compile(r'^(.*?/elements/[^/]+/[^/]+)')
+
+#: Result of a delete. Status is 'deleted', 'failed' or 'skipped' (still
+#: in use); error is the exception or None
+SweepResult = namedtuple('SweepResult', 'href name type wave status error')
+
+
+def _owner(href):
+    # Top level element of a sub element href, i.e. the policy of a rule
+    match = _ELEMENT.match(href)
+    return match.group(1) if match else href
+
+
+def _type_of(href):
+    return _owner(href).rstrip('/').split('/')[-2]
+
+
+def _etag(meta):
+    return prepared_request(
+        FetchElementFailed, href=meta.get('href')).read().etag
+
+
+def _delete(meta):
+    # A conflict means the element changed since the plan; fail rather
+    # than retry with the current ETag
+    etag = meta.get('etag')
+    prepared_request(
+        DeleteElementFailed, href=meta.get('href'),
+        headers={'if-match': etag} if etag else None,
+        retry_conflict=False).delete()
+
+
+class SweepPlan(object):
+    """
+    Elements to delete, grouped in waves. Elements of a wave are only
+    referenced by elements of earlier waves.
+
+    :ivar list waves: list of waves, each a list of element meta (dict
+        with href, name, type and etag). Name is None for elements found
+        from references until confirmed unused by the SMC.
+    """
+
+    def __init__(self, waves):
+        self.waves = waves
+
+    def __len__(self):
+        return sum(len(wave) for wave in self.waves)
+
+    def __iter__(self):
+        for wave in self.waves:
+            for meta in wave:
+                yield meta
+
+    def __repr__(self):
+        return 'SweepPlan(elements={}, waves={})'.format(
+            len(self), len(self.waves))
+
+
+class Sweeper(object):
+    """
+    Plan and delete unused elements. See
+    :py:mod:`smc.administration.sweeper`.
+
+    :param list types: element types to delete, i.e. ['host', 'group'];
+        default all types returned by search_unused
+    :param ReferenceGraph graph: reference graph to use; built when the
+        plan is created if not provided
+    :param int workers: number of concurrent requests
+    """
+
+    def __init__(self, types=None, graph=None, workers=DEFAULT_WORKERS):
+        self.types = set(types) if types else None
+        self.graph = graph
+        self.workers = workers
+
+    def _allowed(self, typeof):
+        return self.types is None or typeof in self.types
+
+    def _unused(self):
+        return dict((meta.get('href'), meta)
+                    for meta in search.search_unused() or []
+                    if self._allowed(meta.get('type')))
+
+    def plan(self):
+        """
+        Find unused elements and the elements referenced only by them.
+        Nothing is deleted.
+
+        :rtype: SweepPlan
+        """
+        unused = self._unused()
+        if self.graph is None:
+            self.graph = ReferenceGraph.build(workers=self.workers)
+        graph = self.graph
+
+        selected = dict(unused)
+        frontier = list(unused)
+        while frontier:
+            candidates = set()
+            for href in frontier:
+                for referenced in graph.includes(href, transitive=True):
+                    referenced = _owner(referenced)
+                    if referenced not in selected and \
+                            self._allowed(_type_of(referenced)):
+                        candidates.add(referenced)
+            frontier = []
+            for href in sorted(candidates):
+                if all(_owner(referrer) in selected
+                       for referrer in graph.referenced_by(href)):
+                    meta = graph.meta(href) or {}
+                    selected[href] = {'href': href,
+                                      'name': meta.get('name'),
+                                      'type': _type_of(href)}
+                    frontier.append(href)
+
+        for meta, etag, error in imap_unordered(
+                _etag, list(selected.values()), self.workers):
+            if error is not None:
+                # Deleted or no longer readable since it was listed
+                logger.warning('Excluding %s from plan: %s',
+                               meta.get('href'), error)
+                del selected[meta.get('href')]
+            else:
+                meta['etag'] = etag
+
+        levels = {}
+        for href in selected:
+            self._level(href, selected, levels, set())
+        waves = [[] for _ in range(max(levels.values()) + 1)] \
+            if levels else []
+        for href in sorted(selected):
+            waves[levels[href]].append(selected[href])
+        return SweepPlan(waves)
+
+    def _level(self, href, selected, levels, visiting):
+        if href in levels:
+            return levels[href]
+        visiting.add(href)
+        level = 0
+        for referrer in self.graph.referenced_by(href):
+            referrer = _owner(referrer)
+            # Reference cycles are broken by ignoring the closing edge
+            if referrer != href and referrer in selected and \
+                    referrer not in visiting:
+                level = max(level, self._level(
+                    referrer, selected, levels, visiting) + 1)
+        visiting.discard(href)
+        levels[href] = level
+        return level
+
+    def sweep(self, plan=None):
+        """
+        Delete the elements of a plan, wave by wave. A plan is created
+        if none is provided.
+
+        :param SweepPlan plan: plan from :meth:`plan`
+        :return: generator yielding a :py:class:`SweepResult` per element
+        """
+        if plan is None:
+            plan = self.plan()
+        for number, wave in enumerate(plan.waves):
+            if number:
+                unused = self._unused()
+                ready = []
+                for meta in wave:
+                    current = unused.get(meta.get('href'))
+                    if current is None:
+                        yield SweepResult(meta.get('href'), meta.get('name'),
+                                          meta.get('type'), number,
+                                          'skipped', None)
+                    else:
+                        ready.append(dict(meta, name=current.get('name')))
+                wave = ready
+            deleted = []
+            for meta, _, error in imap_unordered(_delete, wave, self.workers):
+                if error is not None:
+                    logger.warning('Failed to delete %s: %s',
+                                   meta.get('href'), error)
+                else:
+                    deleted.append(meta.get('href'))
+                yield SweepResult(
+                    meta.get('href'), meta.get('name'), meta.get('type'),
+                    number, 'failed' if error is not None else 'deleted',
+                    error)
+            if self.graph is not None:
+                for href in deleted:
+                    self.graph.remove(href)
@@ -9,6 +9,7 @@ from smc import session
 from smc.api.exceptions import SMCOperationFailure, SMCConnectionError,\
     UnsupportedEntryPoint
 from smc.base.util import unicode_to_bytes
+from smc.base.views import unwrap
 
 logger = logging.getLogger(__name__)
 
@@ -70,10 +71,13 @@ class SMCRequest(_RequestHandler):
     :param dict params: query string parameters
     :param str filename: name of file for download, optional for create
     :param str etag: etag of element, required for update
+    :param bool retry_conflict: when a delete fails with a conflict (409)
+        because the ETag sent is not current, retry with the current ETag.
+        Set to False to fail instead.
     """
 
     def __init__(self, href=None, json=None, params=None, filename=None,
-                 etag=None, **kwargs):
+                 etag=None, retry_conflict=True, **kwargs):
         _RequestHandler.__init__(self)
         #: Filename if a file download is requested
         self.filename = filename
@@ -83,8 +87,10 @@ class SMCRequest(_RequestHandler):
         self.href = href
         #: ETag for PUT request modifications
         self.etag = etag
+        #: Retry a delete with the current ETag on conflict
+        self.retry_conflict = retry_conflict
         #: JSON data to send in request
-        self.json = {} if json is None else json
+        self.json = {} if json is None else unwrap(json)
 
         for k, v in kwargs.items():
             setattr(self, k, v)
@@ -304,3 +304,17 @@ class EngineCommandFailed(SMCException):
     thrown if the SMC API responds with any sort of error and wrap the response
     """
     pass
+
+
+class TransactionFailed(SMCException):
+    """
+    Thrown when one or more elements modified within a transaction
+    failed to update. Elements that did not fail are still committed.
+
+    :ivar dict failures: exception for each failed element, keyed by
+        the element href
+    """
+
+    def __init__(self, msg=None, failures=None):
+        super(TransactionFailed, self).__init__(msg)
+        self.failures = failures or {}
@@ -144,11 +144,7 @@ class Session(object):
         else:
             raise SMCConnectionError("Login failed, HTTP status code: %s and "
                                      "reason: %s" % (r.status_code, r.reason))
-        logger.debug('Registering class mappings')
-        # Load the modules to register needed classes
-        for pkg in ('smc.policy', 'smc.elements', 'smc.routing',
-                    'smc.vpn', 'smc.administration', 'smc.core'):
-            import_submodules(pkg, recursive=False)
+        load_class_mappings()
 
     def logout(self):
         """ Logout session from SMC """
@@ -273,6 +269,17 @@ class SessionCache(object):
         return self.api_entry
 
 
+def load_class_mappings():
+    """
+    Load the modules to register the element classes used by the
+    collection and factory functions.
+    """
+    logger.debug('Registering class mappings')
+    for pkg in ('smc.policy', 'smc.elements', 'smc.routing',
+                'smc.vpn', 'smc.administration', 'smc.core'):
+        import_submodules(pkg, recursive=False)
+
+
 def import_submodules(package, recursive=True):
     """
     Import all submodules of a module, recursively,
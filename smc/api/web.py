@@ -101,8 +101,10 @@ class SMCAPIConnection(object):
 
                     counters.update(delete=1)
 
-                    # Conflict (409) if ETag is not current
-                    if response.status_code in (409,):
+                    # Conflict (409) if ETag is not current. Retry with
+                    # the current ETag unless the request asks to fail
+                    if response.status_code in (409,) and \
+                            request.retry_conflict:
                         req = self.session.get(request.href)
                         etag = req.headers.get('ETag')
                         response = self.session.delete(
@@ -5,9 +5,15 @@ correct class type.
 
 See :ref:`collection-reference-label` for examples on search capabilities.
 """
+import itertools
 from smc import session
 import smc.base.model
 from smc.api.exceptions import FetchElementFailed, UnsupportedEntryPoint
+from smc.base.pool import imap, merge, DEFAULT_WORKERS
+
+#: Number of elements requested per page when iterating an
+#: :class:`ElementCollection`
+DEFAULT_PAGE_SIZE = 500
 
 
 class SubElementCollection(object):
@@ -40,6 +46,15 @@ class SubElementCollection(object):
         return iter(self)
 
 
+def _hydrate(element):
+    result = smc.base.model.prepared_request(
+        FetchElementFailed,
+        href=element.href
+    ).read()
+    element._add_cache(result.json, result.etag)
+    return element
+
+
 def sub_collection(href, cls):
     return type(
         cls.__name__, (SubElementCollection,), {})(href, cls)
@@ -49,7 +64,8 @@ def create_collection(href, cls):
     """
     This collection type inserts a 'create' method into the collection.
     This will proxy to the sub elements create method while restricting
-    access to other attributes that woulnd't be initialized yet.
+    access to other attributes that woulnd't be initialized yet. Rule
+    collections also proxy 'import_rules'.
     """
 
     def create(self, *args, **kwargs):
@@ -58,8 +74,17 @@ def create_collection(href, cls):
 
     create.__doc__ = cls.create.__doc__
     create.__name__ = cls.create.__name__
+    methods = {'create': create}
+
+    if hasattr(cls, 'import_rules'):
+        def import_rules(self, *args, **kwargs):
+            return self.cls(href=href).import_rules(*args, **kwargs)
+
+        import_rules.__doc__ = cls.import_rules.__doc__
+        methods.update(import_rules=import_rules)
+
     return type(
-        cls.__name__, (SubElementCollection,), {'create': create}
+        cls.__name__, (SubElementCollection,), methods
     )(href, cls)
 
 
@@ -68,41 +93,132 @@ class ElementCollection(object):
     ElementCollection is generated dynamically from the
     connection manager and provides methods to obtain
     data from the SMC.
+
+    Results are retrieved from the SMC in pages of ``page_size`` elements
+    and yielded as each page arrives. The next page is requested in the
+    background while the current page is consumed, so iterating large
+    collections only holds two pages in memory.
     """
 
     def __init__(self, **params):
+        self._limit = params.pop('limit', None)
+        self._page_size = params.pop('page_size', DEFAULT_PAGE_SIZE)
+        self._prefetch = params.pop('prefetch', None)
         self._params = params
-    
+
     def __iter__(self):
-        limit = self._params.pop('limit', None)
+        elements = (smc.base.model.Element.from_meta(**item)
+                    for item in self.iter_items())
+        if self._prefetch:
+            return imap(_hydrate, elements, workers=self._prefetch)
+        return elements
 
+    def items(self, **kwargs):
+        """
+        Return the meta data for each element in the collection, as dict
+        with keys href, name and type. All pages are retrieved before
+        returning; use :meth:`iter_items` to process each page as it
+        arrives.
+
+        :rtype: list(dict)
+        """
+        return list(self.iter_items())
+
+    def iter_items(self):
+        """
+        Generator returning the meta data for each element in the
+        collection as each page of results arrives.
+        """
         count = 0
-        for item in self.items():
-            yield smc.base.model.Element.from_meta(**item)
+        for page in self._pages():
+            for item in page:
+                yield item
+
+                # If the limit is set and has been reached, stop
+                count += 1
+                if self._limit is not None and count >= self._limit:
+                    return
+
+    def _pages(self):
+        size = self._page_size
+        if self._limit is not None:
+            size = min(size, self._limit) if size else self._limit
+        if not size:
+            yield self._fetch(self._params)
+            return
+
+        if self._limit is not None:
+            offsets = range(0, self._limit, size)
+        else:
+            offsets = itertools.count(0, size)
+
+        def fetch(offset):
+            params = dict(self._params, limit=size, offset=offset)
+            return offset, self._fetch(params)
 
-            # If the limit is set and has been reached, stop
-            count += 1
-            if limit is not None and count >= limit:
+        first = None
+        for offset, page in imap(fetch, offsets, workers=1, window=2):
+            if len(page) > size:
+                # Paging not supported, page is the full collection
+                yield page
+                return
+            if page and offset:
+                if page[0].get('href') == first:
+                    # Offset not supported, retrieve the remainder
+                    yield self._fetch(self._params)[offset:]
+                    return
+            elif page:
+                first = page[0].get('href')
+            yield page
+            if len(page) < size:
                 return
 
-    def items(self, **kwargs):
-        # Return a collection
+    def _fetch(self, params):
         try:
             return smc.base.model.prepared_request(
                 FetchElementFailed,
-                params=self._params,
-            ).read().json
+                params=params,
+            ).read().json or []
         except FetchElementFailed:
             return []
 
     def limit(self, count):
         """
         Limit provides the ability to limit the number of results returned
-        from the collection.
+        from the collection. Only the number of elements required are
+        requested from the SMC.
 
         :param int count: number of records to page
         """
-        self._params.update(limit=count)
+        self._limit = count
+        return self
+
+    def prefetch(self, concurrency=DEFAULT_WORKERS):
+        """
+        Retrieve the full json of each element while iterating. Elements
+        ahead of the consumer are retrieved in parallel (at most twice
+        the concurrency are in flight) and each element is returned with
+        its cache populated, so accessing element data does not make a
+        request::
+
+            for host in Host.objects.all().prefetch(concurrency=16):
+                print(host.name, host.data.get('address'))
+
+        :param int concurrency: number of concurrent requests, or 0 to
+            disable prefetching
+        """
+        self._prefetch = concurrency
+        return self
+
+    def page_size(self, count):
+        """
+        Number of elements requested from the SMC per page when iterating
+        the collection. Larger pages use fewer requests but more memory.
+
+        :param int count: elements per page, or None to retrieve the
+            collection in a single request
+        """
+        self._page_size = count
         return self
 
     def all(self):
@@ -165,6 +281,17 @@ class CollectionManager(object):
                              exact_match=exact_match)
     filter.__doc__ = ElementCollection.filter.__doc__
 
+    def where(self, *predicates, **lookups):
+        """
+        Query elements by attribute conditions evaluated locally, i.e.
+        ``Host.objects.where(comment__icontains='dmz')``.
+        See :py:mod:`smc.base.query`.
+
+        :rtype: smc.base.query.Query
+        """
+        from smc.base.query import Query
+        return Query(self).where(*predicates, **lookups)
+
 
 class Search(object):
     """
@@ -251,6 +378,99 @@ class Search(object):
         return types
 
 
+class MultiCollection(object):
+    """
+    Collection over multiple element types returned from
+    :py:attr:`MultiSearch.objects`. Each element type is queried
+    separately and concurrently. Results are returned as a single
+    iterator as each page of each type arrives; elements of each type
+    are returned in the order provided by the SMC, but elements of
+    different types are interleaved.
+    """
+
+    def __init__(self, managers, workers=DEFAULT_WORKERS):
+        self._collections = [manager.iterator() for manager in managers]
+        self.workers = workers
+
+    def __iter__(self):
+        return merge(self._collections, self.workers, DEFAULT_PAGE_SIZE)
+
+    def all(self):
+        """
+        Retrieve all elements of each element type
+        """
+        for collection in self._collections:
+            collection.all()
+        return self
+
+    def filter(self, filter, exact_match=False):  # @ReservedAssignment
+        """
+        Filter results of each element type.
+
+        :param str,list filter: any parameter to attempt to match on
+        :param bool exact_match: Whether match needs to be exact or not
+        """
+        for collection in self._collections:
+            collection.filter(filter, exact_match)
+        return self
+
+    def limit(self, count):
+        """
+        Limit the number of results returned for each element type.
+
+        :param int count: number of records per element type
+        """
+        for collection in self._collections:
+            collection.limit(count)
+        return self
+
+    def prefetch(self, concurrency=DEFAULT_WORKERS):
+        """
+        Retrieve the full json of each element while iterating. See
+        :py:meth:`ElementCollection.prefetch`.
+
+        :param int concurrency: number of concurrent requests per type
+        """
+        for collection in self._collections:
+            collection.prefetch(concurrency)
+        return self
+
+
+class MultiSearch(object):
+    """
+    Search across multiple entry points concurrently. Unlike
+    :class:`Search` with comma separated entry points which sends a
+    single combined query, each entry point (or context filter) is
+    queried by a separate request and requests run in parallel::
+
+        >>> search = MultiSearch(['host', 'network', 'address_range'])
+        >>> list(search.objects.filter('172.18.1'))
+        [Host(name=SMC), Network(name=network-172.18.1.0/24), AddressRange(name=range-172.18.1.100-172.18.1.120)]
+
+    :param str,list resources: list of entry point names, or a comma
+        separated string
+    :param int workers: maximum number of concurrent queries
+    :raises UnsupportedEntryPoint: an entry point does not exist
+    """
+
+    def __init__(self, resources, workers=DEFAULT_WORKERS):
+        if not isinstance(resources, (list, tuple)):
+            resources = resources.split(',')
+        self._searches = [Search(resource.strip())
+                          for resource in resources]
+        self.workers = workers
+
+    @property
+    def objects(self):
+        """
+        A collection over each entry point
+
+        :return: :class:`~MultiCollection`
+        """
+        return MultiCollection(
+            [search.objects for search in self._searches], self.workers)
+
+
 _context_filters = ('fw_clusters', 'engine_clusters', 'ips_clusters',
                     'layer2_clusters', 'network_elements', 'services',
                     'services_and_applications', 'tags', 'situations')
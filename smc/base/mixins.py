@@ -13,6 +13,8 @@ class UnicodeMixin(object):
     \@python_2_unicode_compatible
     From: http://python-future.org/what_else.html
     """
+    __slots__ = ()
+
     import sys
     if sys.version_info > (3, 0):
         def __str__(x): return x.__unicode__()
@@ -46,11 +46,11 @@ Element class relationship::
 Classes that do not require state on retrieved json or provide basic
 container functionality may inherit from object.
 """
-import copy
 from collections import namedtuple
 import functools
 import smc.compat as compat
 import smc.base.collection
+import smc.base.transaction
 from smc.api.web import counters
 from smc.api.common import SMCRequest, fetch_href_by_name, fetch_entry_point
 from smc.api.exceptions import ElementNotFound, \
@@ -61,6 +61,12 @@ from smc.base.resource import with_metaclass, Registry
 from .util import bytes_to_unicode, unicode_to_bytes, merge_dicts,\
     find_type_from_self
 from .mixins import UnicodeMixin
+from .views import freeze, unwrap
+
+try:
+    intern = intern  # @ReservedAssignment
+except NameError:  # Python 3
+    from sys import intern  # @UnresolvedImport
 
 
 def exception(function):
@@ -148,14 +154,22 @@ def ElementFactory(href):
         return e
 
 
-class ElementResource:
+class ElementResource(object):
     """
     Convenience class to provide dotted access to resource links.
     Resource links are referenced in the element as a list with
-    dict items in format {'href', 'rel'}. Attributes are added
-    dynamically using 'rel' as name and href as the value. This
-    makes it possible to access a link via self.resource.rel
+    dict items in format {'href', 'rel'}. Links are stored as a
+    flat tuple of rel, href pairs and resolved as attributes using
+    'rel' as name and href as the value. This makes it possible to
+    access a link via self.resource.rel
     """
+    __slots__ = ('_links',)
+
+    def __init__(self, links=None):
+        flat = []
+        for link in links or []:
+            flat.extend((intern(str(link.get('rel'))), link.get('href')))
+        self._links = tuple(flat)
 
     def name(self, href):
         """
@@ -193,6 +207,10 @@ class ElementResource:
         return "%s(id=%r)" % (self.__class__.__name__, id(self))
 
     def __getattr__(self, link):
+        links = self._links
+        for i in range(0, len(links), 2):
+            if links[i] == link:
+                return links[i + 1]
         raise ResourceNotFound('Resource requested: %r is not '
                                'available on this element.' % link)
 
@@ -210,13 +228,17 @@ class Cache(object):
     When an element is sent for modification, the cached ETag is used
     and an exception will be raised if the server side ETag has changed,
     requiring the request to be made again.
+
+    Element json is held as a copy-on-write view (see
+    :py:mod:`smc.base.views`) so that the parsed json can be shared
+    between readers without copying.
     """
     __slots__ = ('_cache', 'instance')
 
     def __init__(self, instance, json=None, etag=None):
         self.instance = instance
         if json is not None:
-            self._cache = (etag, json)
+            self._cache = (etag, freeze(json))
         else:
             self._cache = None
 
@@ -227,7 +249,7 @@ class Cache(object):
                 FetchElementFailed,
                 href=self.instance.href
             ).read()
-            self._cache = (result.etag, result.json)
+            self._cache = (result.etag, freeze(result.json))
             getattr(self.instance, 'resource')
         return self._cache
 
@@ -265,8 +287,10 @@ class ElementLocator(object):
     Classes deriving from :class:`SubElement` do not have valid entry points in
     the SMC API and will be typically created through a reference link.
 
-    This descriptor is a non data descriptor and can be overridden if 'href'
-    is defined in the instance dict.
+    This descriptor is a non data descriptor. It can only be overridden
+    by 'href' in the instance dict for classes that do not define
+    __slots__; instances of slot based classes have no instance dict and
+    always resolve href through meta.
     """
 
     def __get__(self, instance, cls=None):
@@ -304,7 +328,14 @@ class ElementBase(UnicodeMixin):
     kwargs, href=.... (only partial meta), or meta={.....} (as dict)
 
     If meta is not provided, the meta attribute will be None
+
+    Instance state is held in __slots__ to keep the footprint small when
+    large numbers of elements are held in memory. Subclasses that do not
+    need additional instance attributes should define an empty __slots__.
+    Subclasses that do not define __slots__ will have an instance __dict__
+    as usual.
     """
+    __slots__ = ('meta', '_cache', '_resource')
 
     def __init__(self, **meta):
         meta_as_kw = meta.pop('meta', None)
@@ -315,17 +346,38 @@ class ElementBase(UnicodeMixin):
 
     def _add_cache(self, data, etag=None):
         self.cache = Cache(self, data, etag)
-        
-    @cached_property
+
+    @property
     def cache(self):
-        return Cache(self)
+        try:
+            return self._cache
+        except AttributeError:
+            self._cache = Cache(self)
+            return self._cache
 
-    @cached_property
+    @cache.setter
+    def cache(self, value):
+        self._cache = value
+
+    @cache.deleter
+    def cache(self):
+        del self._cache
+
+    @property
     def resource(self):
-        res = ElementResource()
-        for link in self.data.get('link'):
-            setattr(res, link.get('rel'), link.get('href'))
-        return res
+        try:
+            return self._resource
+        except AttributeError:
+            self._resource = ElementResource(unwrap(self.data.get('link')))
+            return self._resource
+
+    @resource.setter
+    def resource(self, value):
+        self._resource = value
+
+    @resource.deleter
+    def resource(self):
+        del self._resource
 
     @property
     def data(self):
@@ -364,13 +416,24 @@ class ElementBase(UnicodeMixin):
         Update wrapper around cache to handle modifications
         requests and clear element cache. This is called in
         various places to ensure the cache stays current.
+
+        If called within a :py:mod:`smc.base.transaction` and the update
+        is for this elements own data, the change is buffered and sent
+        when the transaction completes.
         """
+        if not kwargs:
+            txn = smc.base.transaction.current()
+            if txn is not None:
+                return txn.enlist(
+                    self, exception[0] if exception else UpdateElementFailed)
+
         if 'href' not in kwargs:
             kwargs.update(href=self.href)
 
         if 'json' not in kwargs:
-            # update from copy of cache before clearing
-            kwargs.update(json=copy.deepcopy(self.data))
+            # update from cache before clearing, unmodified parts of the
+            # cached json are shared rather than copied
+            kwargs.update(json=unwrap(self.data))
 
         # Etag taken from instance
         if 'etag' not in kwargs:
@@ -416,6 +479,7 @@ class Element(ElementBase):
     Base element with common methods shared by inheriting classes
     """
     href = ElementLocator()  # : href of this resource
+    __slots__ = ('_name',)
 
     def __init__(self, name, **meta):
         if meta:
@@ -579,6 +643,7 @@ class SubElement(ElementBase):
     through a reference. They are not 'loaded' directly as are
     classes that inherit from :class:`Element`.
     """
+    __slots__ = ()
 
     def __init__(self, **meta):
         super(SubElement, self).__init__(**meta)
@@ -610,5 +675,7 @@ class Meta(namedtuple('Meta', 'name href type')):
     Meta has the same data structure returned from
     :py:func:`smc.actions.search.element_info_as_json`
     """
+    __slots__ = ()
+
     def __new__(cls, href, name=None, type=None):  # @ReservedAssignment
         return super(Meta, cls).__new__(cls, name, href, type)
@@ -0,0 +1,170 @@
+"""
+Thread pool helpers used by operations that fan out multiple independent
+requests to the SMC API. Requests are I/O bound so a thread pool from the
+standard library (available on both py2 and py3) is used rather than
+processes.
+
+All helpers keep a bounded number of tasks in flight so that large inputs
+(i.e. every host in the SMC) do not queue up the entire workload at once.
+"""
+import threading
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+#: Default number of worker threads when none is specified
+DEFAULT_WORKERS = 8
+
+
+def imap(func, iterable, workers=DEFAULT_WORKERS, window=None):
+    """
+    Generator calling ``func`` for each item in iterable using a pool of
+    worker threads. Results are yielded in the same order as the input.
+    At most ``window`` tasks are submitted ahead of the consumer; the
+    input iterable is only advanced as results are consumed.
+
+    An exception raised by ``func`` is re-raised when its result is
+    reached.
+
+    :param func: callable taking a single item
+    :param iterable: input items
+    :param int workers: number of worker threads
+    :param int window: max tasks in flight (default: 2 * workers)
+    :return: generator of results
+    """
+    workers = max(1, workers)
+    window = max(1, window or workers * 2)
+    pool = ThreadPool(workers)
+    pending = deque()
+    try:
+        for item in iterable:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.close()
+        pool.join()
+
+
+def imap_unordered(func, iterable, workers=DEFAULT_WORKERS, window=None):
+    """
+    Like :func:`imap` but results are yielded as they complete. Each result
+    is a tuple of (item, result, exception) where exception is None on
+    success. Exceptions are not raised so that a single failure does not
+    abort the remaining work.
+
+    :param func: callable taking a single item
+    :param iterable: input items
+    :param int workers: number of worker threads
+    :param int window: max tasks in flight (default: 2 * workers)
+    :return: generator of (item, result, exception)
+    """
+    workers = max(1, workers)
+    window = max(1, window or workers * 2)
+    done = queue.Queue()
+
+    def call(item):
+        try:
+            done.put((item, func(item), None))
+        except Exception as e:  # Reported back to the caller
+            done.put((item, None, e))
+
+    pool = ThreadPool(workers)
+    in_flight = 0
+    try:
+        for item in iterable:
+            pool.apply_async(call, (item,))
+            in_flight += 1
+            if in_flight >= window:
+                yield done.get()
+                in_flight -= 1
+        while in_flight:
+            yield done.get()
+            in_flight -= 1
+    finally:
+        pool.close()
+        pool.join()
+
+
+_DONE = object()
+
+
+def merge(iterables, workers=DEFAULT_WORKERS, buffer=None):
+    """
+    Generator yielding the items of several iterables as they are
+    produced. Each iterable is consumed on a worker thread; items of
+    different iterables are interleaved in the order they arrive and the
+    items of each iterable keep their order. At most ``buffer`` items are
+    held waiting for the consumer; workers block until the consumer
+    catches up.
+
+    An exception raised by an iterable is re-raised when it is reached.
+
+    :param list iterables: iterables to consume
+    :param int workers: number of iterables consumed at once
+    :param int buffer: max items waiting for the consumer (default:
+        2 * workers)
+    :return: generator of items
+    """
+    iterables = list(iterables)
+    items = queue.Queue(max(1, buffer or workers * 2))
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def drain(iterable):
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as e:  # Re-raised to the consumer
+            put((_DONE, e))
+        else:
+            put((_DONE, None))
+
+    pool = ThreadPool(max(1, min(workers, len(iterables))))
+    try:
+        for iterable in iterables:
+            pool.apply_async(drain, (iterable,))
+        remaining = len(iterables)
+        while remaining:
+            item, error = items.get()
+            if item is _DONE:
+                remaining -= 1
+                if error is not None:
+                    raise error
+                continue
+            yield item
+    finally:
+        stop.set()
+        pool.close()
+        pool.join()
+
+
+def run(func, iterable, workers=DEFAULT_WORKERS):
+    """
+    Run ``func`` over all items and wait for completion.
+
+    :return: tuple of two dicts, (results, failures) keyed by the input item
+    :rtype: tuple(dict, dict)
+    """
+    results, failures = {}, {}
+    for item, result, error in imap_unordered(func, iterable, workers):
+        if error is not None:
+            failures[item] = error
+        else:
+            results[item] = result
+    return results, failures
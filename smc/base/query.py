@@ -0,0 +1,259 @@
+"""
+Client side queries over element data.
+
+The SMC can only filter collections by a search string. Queries add
+predicates on any element attribute using lookups in the form
+``attribute__operator=value``, similar to Django::
+
+    from smc.elements.network import Host
+
+    for host in Host.objects.where(comment__icontains='dmz',
+                                   address__in_network='10.0.0.0/8'):
+        print(host.name)
+
+    # Conditions can be chained and combined with a callable
+    query = Host.objects.where(name__startswith='web')
+    query = query.where(lambda host: len(host.data.get('secondary', [])) > 1)
+
+A condition on the element name is sent to the SMC as the collection filter
+so that only elements that may match are returned. The remaining conditions
+are evaluated locally; element data is retrieved concurrently as with
+:py:meth:`smc.base.collection.ElementCollection.prefetch`. Queries also run
+against a mirror in offline mode (see :py:mod:`smc.mirror.mirror`).
+
+Nested attributes are separated by ``__``, for example
+``antivirus__antivirus_enabled=True``. If an attribute is a list, the
+condition is true if any item in the list matches.
+
+Supported operators:
+
+================ ===================================================
+exact            equal (default when no operator is given)
+iexact           equal, case insensitive
+contains         substring
+icontains        substring, case insensitive
+startswith       string prefix (also istartswith)
+endswith         string suffix (also iendswith)
+in               value is one of the given values
+gt, gte, lt, lte comparison
+isnull           attribute is missing or None (value True) or set (False)
+regex            regular expression search
+in_network       address, network or range is inside the given network
+================ ===================================================
+
+If an :py:class:`smc.index.ipindex.IPIndex` is provided with
+:meth:`Query.using`, an ``in_network`` condition is answered from the index
+rather than listing every element of the type.
+"""
+import re
+import smc.compat as compat
+from smc.base.pool import imap, DEFAULT_WORKERS
+from smc.index.ipindex import parse
+
+#: Attributes available from element meta data without retrieving the
+#: element
+META_ATTRIBUTES = ('name', 'href', 'type')
+
+
+def _text(value):
+    return value if isinstance(value, compat.string_types) else str(value)
+
+
+def _casefold(value):
+    return value if value is None else _text(value).lower()
+
+
+def _in_network(network):
+    version, start, end = parse(network)
+
+    def test(value):
+        try:
+            value_version, value_start, value_end = parse(value)
+        except (ValueError, AttributeError):
+            return False
+        return value_version == version and \
+            start <= value_start and value_end <= end
+    return test
+
+
+_OPERATORS = {
+    'exact': lambda value: lambda v: v == value,
+    'iexact': lambda value: lambda v: _casefold(v) == _casefold(value),
+    'contains': lambda value: lambda v: v is not None and value in v,
+    'icontains':
+        lambda value: lambda v: v is not None and
+        _casefold(value) in _casefold(v),
+    'startswith':
+        lambda value: lambda v: v is not None and _text(v).startswith(value),
+    'istartswith':
+        lambda value: lambda v: v is not None and
+        _casefold(v).startswith(_casefold(value)),
+    'endswith':
+        lambda value: lambda v: v is not None and _text(v).endswith(value),
+    'iendswith':
+        lambda value: lambda v: v is not None and
+        _casefold(v).endswith(_casefold(value)),
+    'in': lambda value: lambda v: v in value,
+    'gt': lambda value: lambda v: v is not None and v > value,
+    'gte': lambda value: lambda v: v is not None and v >= value,
+    'lt': lambda value: lambda v: v is not None and v < value,
+    'lte': lambda value: lambda v: v is not None and v <= value,
+    'regex': lambda value: (lambda pattern: lambda v: v is not None and
+                            pattern.search(_text(v)) is not None)(
+                                re.compile(value)),
+    'in_network': _in_network}
+
+#: Operators on the name attribute that can be sent to the SMC as a filter
+_SERVER_FILTERS = {
+    'exact': True, 'iexact': False, 'contains': False, 'icontains': False,
+    'startswith': False, 'istartswith': False, 'endswith': False,
+    'iendswith': False}
+
+
+class Condition(object):
+    """
+    A single compiled lookup, i.e. ``address__in_network='10.0.0.0/8'``.
+
+    :param str lookup: attribute path and optional operator
+    :param value: value to compare with
+    :raises ValueError: invalid value for the operator
+    """
+
+    def __init__(self, lookup, value):
+        path = lookup.split('__')
+        operator = 'exact'
+        if len(path) > 1 and (path[-1] in _OPERATORS or path[-1] == 'isnull'):
+            operator = path.pop()
+        self.path = path
+        self.operator = operator
+        self.value = value
+        if operator == 'isnull':
+            self._test = None
+        else:
+            self._test = _OPERATORS[operator](value)
+
+    @property
+    def needs_data(self):
+        """
+        Whether the element data is required to evaluate the condition
+        """
+        return len(self.path) > 1 or self.path[0] not in META_ATTRIBUTES
+
+    def resolve(self, element):
+        """
+        Value of the attribute for an element
+
+        :return: value, or None if the attribute does not exist
+        """
+        attribute = self.path[0]
+        if not self.needs_data:
+            if attribute == 'type':
+                return element.typeof
+            return getattr(element, attribute)
+        value = element.data
+        for key in self.path:
+            if not hasattr(value, 'get'):
+                return None
+            value = value.get(key)
+        return value
+
+    def __call__(self, element):
+        value = self.resolve(element)
+        if self._test is None:  # isnull
+            return (value is None or value == []) == bool(self.value)
+        if isinstance(value, list) or hasattr(value, 'insert'):
+            return any(self._test(item) for item in value)
+        return self._test(value)
+
+
+class Query(object):
+    """
+    Query over the elements of a collection manager. Obtain a query
+    with ``objects.where()`` on an element class, for example
+    ``Host.objects.where(...)``. See :py:mod:`smc.base.query`.
+
+    :param CollectionManager manager: collection manager of the element
+        class
+    :param int workers: number of concurrent requests used to retrieve
+        element data
+    """
+
+    def __init__(self, manager, workers=DEFAULT_WORKERS):
+        self._manager = manager
+        self._conditions = []
+        self._index = None
+        self.workers = workers
+
+    def where(self, *predicates, **lookups):
+        """
+        Add conditions to the query. All conditions must match.
+
+        :param predicates: callables taking an element and returning bool
+        :param lookups: attribute__operator=value conditions
+        :raises ValueError: invalid value for the operator
+        :return: this query
+        :rtype: Query
+        """
+        for lookup, value in sorted(lookups.items()):
+            self._conditions.append(Condition(lookup, value))
+        self._conditions.extend(predicates)
+        return self
+
+    def using(self, index):
+        """
+        Use an IP index to answer ``in_network`` conditions.
+
+        :param IPIndex index: index built from the elements being queried
+        :return: this query
+        :rtype: Query
+        """
+        self._index = index
+        return self
+
+    def __iter__(self):
+        conditions = list(self._conditions)
+        needs_data = any(getattr(condition, 'needs_data', True)
+                         for condition in conditions)
+        elements = self._from_index()
+        if elements is None:
+            collection = self._manager.iterator(**self._server_filter())
+            if needs_data:
+                collection.prefetch(self.workers)
+            elements = collection
+        elif needs_data:
+            from smc.base.collection import _hydrate
+            elements = imap(_hydrate, elements, self.workers)
+
+        for element in elements:
+            if all(condition(element) for condition in conditions):
+                yield element
+
+    def first(self):
+        """
+        First matching element
+
+        :return: element or None if there are no matches
+        """
+        for element in self:
+            return element
+
+    def _server_filter(self):
+        for condition in self._conditions:
+            if isinstance(condition, Condition) and \
+                    condition.path == ['name'] and \
+                    condition.operator in _SERVER_FILTERS:
+                return {'filter': condition.value,
+                        'exact_match': _SERVER_FILTERS[condition.operator]}
+        return {}
+
+    def _from_index(self):
+        if self._index is None:
+            return None
+        for condition in self._conditions:
+            if isinstance(condition, Condition) and \
+                    condition.operator == 'in_network':
+                typeof = self._manager._cls.typeof
+                return [element for element in
+                        self._index.overlapping(condition.value)
+                        if element.typeof == typeof]
+        return None
@@ -12,6 +12,12 @@ def with_metaclass(mcls):
     def decorator(cls):
         body = vars(cls).copy()
         # clean out class body
+        slots = body.get('__slots__')
+        if slots is not None:
+            if isinstance(slots, str):
+                slots = [slots]
+            for slot in slots:
+                body.pop(slot)
         body.pop('__dict__', None)
         body.pop('__weakref__', None)
         return mcls(cls.__name__, cls.__bases__, body)
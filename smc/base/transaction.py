@@ -0,0 +1,213 @@
+"""
+Transactions provide a unit of work for modifications made to elements.
+
+Methods such as ``modify_attribute``, ``rename``, ``comment`` or the engine
+properties (``enable_antivirus``, ``add_dns_servers``, etc) normally send a
+PUT to the SMC for every call. When called within a transaction, the change
+is applied to the element cache only and the element is registered with the
+transaction. When the transaction exits, a single PUT is sent per element
+with all changes merged, and independent elements are updated in parallel::
+
+    import smc
+    from smc.core.engine import Engine
+    from smc.elements.network import Host
+
+    with smc.transaction():
+        engine = Engine('myfw')
+        engine.add_dns_servers(['8.8.8.8', '8.8.4.4'])
+        engine.enable_antivirus()
+        engine.enable_gti_file_reputation()
+        host = Host('kali')
+        host.comment('updated in transaction')
+        host.rename('kali2')
+
+If any element fails to update, the remaining elements are still committed
+and :py:class:`smc.api.exceptions.TransactionFailed` is raised after all
+updates complete. The exception provides the failures by element href::
+
+    try:
+        with smc.transaction():
+            ...
+    except TransactionFailed as e:
+        for href, error in e.failures.items():
+            print(href, error)
+
+If an exception is raised within the transaction body, no changes are sent
+and the cache of each modified element is cleared.
+
+.. note:: Data is not refreshed from the SMC until the transaction completes,
+          so values calculated by the SMC during an update will not be
+          visible within the transaction body.
+
+Nested transactions are joined to the outermost transaction.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from smc.base.util import merge_dicts
+from smc.base.views import unwrap
+from smc.base.pool import run, DEFAULT_WORKERS
+from smc.api.exceptions import TransactionFailed
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def current():
+    """
+    Return the transaction active in this thread, or None.
+
+    :rtype: Transaction
+    """
+    return getattr(_local, 'transaction', None)
+
+
+def _apply_changes(data, changed):
+    # Copy the top level keys of element data that differ from the json
+    # the data was retrieved with
+    base = getattr(changed, '_base', None)
+    if base is None:
+        merge_dicts(data, changed)
+        return
+    for key in list(changed):
+        if key not in base or unwrap(changed[key]) != base[key]:
+            data[key] = unwrap(changed[key])
+    for key in base:
+        if key not in changed and key in data:
+            del data[key]
+
+
+class Transaction(object):
+    """
+    Unit of work that buffers element updates until exit. Use the
+    :func:`transaction` function (also available as ``smc.transaction``)
+    to obtain an instance.
+
+    :ivar dict results: href returned from the SMC for each updated element,
+        keyed by element href. Populated after commit.
+    :ivar dict failures: exception for each failed element keyed by element
+        href. Populated after commit.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self.results = {}
+        self.failures = {}
+        self._elements = OrderedDict()  # href -> (element, exception)
+        self._aliases = {}  # href -> other instances sharing element data
+        self._joined = False
+
+    def enlist(self, element, exception):
+        """
+        Register an element that was modified within this transaction.
+        If another instance of the same element (by href) was already
+        registered, the top level keys this instance changed are copied to
+        the registered instance, and this instance then shares the data of
+        the registered instance.
+
+        :param ElementBase element: modified element
+        :param exception: exception class to raise on update failure
+        :return: href of element
+        """
+        href = element.href
+        if href in self._elements:
+            registered, _ = self._elements[href]
+            if registered is not element and \
+                    element.cache is not registered.cache:
+                _apply_changes(registered.data, element.data)
+                # Later changes made through this instance are made to
+                # the registered instance data
+                element.cache = registered.cache
+                self._aliases.setdefault(href, []).append(element)
+        else:
+            self._elements[href] = (element, exception)
+        return href
+
+    @property
+    def pending(self):
+        """
+        Elements waiting to be committed
+
+        :rtype: list(ElementBase)
+        """
+        return [element for element, _ in self._elements.values()]
+
+    def commit(self):
+        """
+        Send a single update per modified element. Elements are
+        independent so they are sent in parallel.
+
+        :raises TransactionFailed: one or more elements failed to update
+        :return: None
+        """
+        def update(href):
+            element, exception = self._elements[href]
+            return element.update(exception)
+
+        self.results, self.failures = run(
+            update, list(self._elements), workers=self.workers)
+        self._elements.clear()
+        self._clear_aliases()
+        logger.debug('Transaction committed %s elements, %s failures',
+                     len(self.results), len(self.failures))
+        if self.failures:
+            raise TransactionFailed(
+                'Transaction failed to update {} of {} elements: {}'.format(
+                    len(self.failures),
+                    len(self.failures) + len(self.results),
+                    '; '.join('{}: {}'.format(href, error)
+                              for href, error in self.failures.items())),
+                failures=self.failures)
+
+    def rollback(self):
+        """
+        Discard pending changes. Cached data for each modified element
+        is cleared so that the next access retrieves it from the SMC.
+
+        :return: None
+        """
+        for element, _ in self._elements.values():
+            try:
+                del element.cache
+            except AttributeError:
+                pass
+        self._elements.clear()
+        self._clear_aliases()
+
+    def _clear_aliases(self):
+        for aliases in self._aliases.values():
+            for element in aliases:
+                try:
+                    del element.cache
+                except AttributeError:
+                    pass
+        self._aliases.clear()
+
+    def __enter__(self):
+        active = current()
+        if active is not None:
+            self._joined = True
+            return active
+        _local.transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self._joined:
+            return False
+        _local.transaction = None
+        if exc_type is not None:
+            self.rollback()
+            return False
+        self.commit()
+        return False
+
+
+def transaction(workers=DEFAULT_WORKERS):
+    """
+    Create a transaction context. See :py:mod:`smc.base.transaction`.
+
+    :param int workers: number of elements to update in parallel on exit
+    :rtype: Transaction
+    """
+    return Transaction(workers)
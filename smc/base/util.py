@@ -3,6 +3,7 @@ Utility functions used in different areas of smc-python
 """
 import smc.compat as compat
 import smc.api.exceptions
+from smc.base.views import DictView, ListView
 
 
 def save_to_file(filename, content):
@@ -96,17 +97,17 @@ def merge_dicts(dict1, dict2, append_lists=False):
         new value, append all of the new values onto the original list.
     """
     for key in dict2:
-        if isinstance(dict2[key], dict):
+        if isinstance(dict2[key], (dict, DictView)):
             if key in dict1 and key in dict2:
                 merge_dicts(dict1[key], dict2[key], append_lists)
             else:
                 dict1[key] = dict2[key]
         # If the value is a list and the ``append_lists`` flag is set,
         # append the new values onto the original list
-        elif isinstance(dict2[key], list) and append_lists:
+        elif isinstance(dict2[key], (list, ListView)) and append_lists:
             # The value in dict1 must be a list in order to append new
             # values onto it.
-            if key in dict1 and isinstance(dict1[key], list):
+            if key in dict1 and isinstance(dict1[key], (list, ListView)):
                 dict1[key].extend(dict2[key])
             else:
                 dict1[key] = dict2[key]
@@ -0,0 +1,327 @@
+"""
+Copy-on-write views of element json.
+
+Element data retrieved from the SMC is held in the element cache as the
+parsed json. Rather than handing out the parsed dict (which forces callers
+and element updates to make defensive deep copies), the cache exposes the
+json through :class:`DictView` and :class:`ListView`. Views read directly
+from the shared json and behave like a dict or list. Nothing is copied
+until the first modification: the view (and each view above it) then makes
+a shallow copy of only its own level. Nested dicts and lists that are not
+modified continue to be shared with the original json, which is never
+changed.
+
+Views are a :py:class:`collections.abc.MutableMapping` and
+:py:class:`collections.abc.MutableSequence` rather than a dict and list.
+Nested dicts and lists are always returned as views, so every path to the
+shared json is copy-on-write.
+
+:func:`unwrap` returns the current value of a view as plain json, i.e. to
+serialize it with :py:mod:`json` or to pass it to code that requires a
+dict. Unmodified subtrees are returned as-is without copying and must not
+be modified. This is used when element data is sent to the SMC.
+
+Code that requires a real dict that stays connected to the element data
+(i.e. an object that uses the dict as its ``__dict__``) can obtain one with
+:func:`writable`.
+"""
+import copy
+
+try:
+    from collections.abc import MutableMapping, MutableSequence
+except ImportError:  # Python 2
+    from collections import MutableMapping, MutableSequence
+
+
+def freeze(value, parent=None):
+    """
+    Return a view for dict or list values. Other values are returned
+    unchanged.
+
+    :param value: json value
+    :param parent: view or :func:`writable` container holding the value,
+        if any
+    """
+    if isinstance(value, dict):
+        return DictView(value, parent)
+    if isinstance(value, list):
+        return ListView(value, parent)
+    return value
+
+
+def unwrap(value):
+    """
+    Return json value with views replaced by plain dicts and lists.
+    Parts of the json that were not modified are shared, not copied.
+
+    :param value: view, or json value that may contain views
+    """
+    if isinstance(value, _View):
+        return value._unwrap()
+    if isinstance(value, dict):
+        return dict((key, unwrap(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [unwrap(item) for item in value]
+    return value
+
+
+def writable(value):
+    """
+    Return a plain dict or list for a view that replaces the view within
+    its parent, so changes made to it are part of the element data. Values
+    that are not views are returned unchanged. A view without a parent is
+    returned as a detached copy.
+
+    :param value: view or json value
+    """
+    if isinstance(value, _View):
+        return value._thaw()
+    return value
+
+
+class _WritableDict(dict):
+    # Plain dict from writable(); returned by its parent view as is
+    __slots__ = ()
+
+
+class _WritableList(list):
+    __slots__ = ()
+
+
+def _slot(container, view):
+    # Key of a view, or of the json it was created from, in a dict or list
+    items = container.items() if isinstance(container, dict) \
+        else enumerate(container)
+    for key, value in items:
+        if value is view or value is view._base or (
+                isinstance(value, _View) and value._base is view._base):
+            return key
+    return None
+
+
+class _View(object):
+    """
+    Common behavior of dict and list views. ``_base`` is the shared json
+    and is never modified. ``_own`` is None until the first change, after
+    which it is this views private shallow copy; nested dicts and lists in
+    it are replaced by views when read. Reading nested json before the
+    first change returns a new view each time and allocates nothing else;
+    a view replaces its json in the parent when it is first changed.
+    """
+    __slots__ = ('_base', '_own', '_parent')
+
+    def __init__(self, base, parent=None):
+        self._base = base
+        self._own = None
+        self._parent = parent
+
+    @property
+    def _current(self):
+        return self._base if self._own is None else self._own
+
+    def _get(self, key):
+        if self._own is not None:
+            value = self._own[key]
+            if type(value) in (dict, list):
+                value = self._own[key] = freeze(value, self)
+            return value
+        value = self._base[key]
+        if type(value) in (dict, list):
+            return freeze(value, self)
+        return value
+
+    def _materialize(self):
+        if self._own is not None:
+            return self._own
+        parent = self._parent
+        if isinstance(parent, _View):
+            parent = parent._materialize()
+        if parent is not None:
+            key = _slot(parent, self)
+            if key is not None:
+                current = parent[key]
+                if isinstance(current, _View) and current is not self:
+                    # Another view of the same json was changed first
+                    self._own = current._materialize()
+                    return self._own
+                parent[key] = self
+        self._own = self._copy(self._items())
+        return self._own
+
+    def _thaw(self):
+        own = self._materialize()
+        if isinstance(self, DictView):
+            thawed = _WritableDict((key, self[key]) for key in list(own))
+            children = thawed.values()
+        else:
+            thawed = _WritableList(self[index] for index in range(len(own)))
+            children = thawed
+        for child in children:
+            if isinstance(child, _View):
+                child._parent = thawed
+        parent = self._parent
+        if isinstance(parent, _View):
+            parent = parent._materialize()
+        if parent is not None:
+            key = _slot(parent, self)
+            if key is not None:
+                parent[key] = thawed
+        return thawed
+
+    def _unwrap(self):
+        # Changes made to nested views are copied up to this view, so a
+        # view without a copy of its own is unmodified
+        if self._own is None:
+            return self._base
+        # Nested json of the original that was never read is shared
+        shared = set(id(value) for _, value in self._items()
+                     if type(value) in (dict, list))
+        return self._copy((key, value if id(value) in shared
+                           else unwrap(value))
+                          for key, value in self._own_items())
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(unwrap(self), memo)
+
+    def __reduce__(self):
+        return (type(unwrap(self)), (unwrap(self),))
+
+    def __repr__(self):
+        return repr(unwrap(self))
+
+
+class DictView(_View, MutableMapping):
+    """
+    Copy-on-write view of a json dict. Supports all dict operations.
+    """
+    __slots__ = ()
+
+    def _items(self):
+        return self._base.items()
+
+    def _own_items(self):
+        return list(self._own.items())
+
+    def _copy(self, items):
+        return dict(items)
+
+    def __getitem__(self, key):
+        return self._get(key)
+
+    def get(self, key, default=None):
+        if key in self._current:
+            return self._get(key)
+        return default
+
+    def __contains__(self, key):
+        return key in self._current
+
+    def __iter__(self):
+        return iter(self._current)
+
+    def __len__(self):
+        return len(self._current)
+
+    def __setitem__(self, key, value):
+        self._materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self._materialize()[key]
+
+    def clear(self):
+        self._materialize().clear()
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def copy(self):
+        """
+        Return a shallow copy as a plain dict. Nested dicts and lists
+        are views.
+
+        :rtype: dict
+        """
+        return dict(self)
+
+
+class ListView(_View, MutableSequence):
+    """
+    Copy-on-write view of a json list. Supports all list operations.
+    Slices are returned as plain lists.
+    """
+    __slots__ = ()
+
+    def _items(self):
+        return enumerate(self._base)
+
+    def _own_items(self):
+        return list(enumerate(self._own))
+
+    def _copy(self, items):
+        return [value for _, value in items]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('list index out of range')
+        return self._get(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._get(index)
+
+    def __len__(self):
+        return len(self._current)
+
+    def __setitem__(self, index, value):
+        self._materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    def append(self, value):
+        self._materialize().append(value)
+
+    def extend(self, values):
+        self._materialize().extend(values)
+
+    def sort(self, *args, **kwargs):
+        self._materialize().sort(*args, **kwargs)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, ListView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def copy(self):
+        """
+        Return a shallow copy as a plain list. Nested dicts and lists
+        are views.
+
+        :rtype: list
+        """
+        return list(self)
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
@@ -6,6 +6,11 @@ import smc
 
 PY3 = sys.version_info > (3,)
 
+if PY3:
+    string_types = str
+else:
+    string_types = basestring  # @UndefinedVariable
+
 
 def min_smc_version(version):
     """
@@ -6,6 +6,7 @@ basic settings such as ip address, network, administrative settings etc. These a
 not called directly but used as a reference to the top level interface.
 """
 from collections import Sequence
+from smc.base.views import writable
 
 
 class SubInterface(Sequence):
@@ -48,7 +49,7 @@ class ClusterVirtualInterface(object):
     typeof = 'cluster_virtual_interface'
 
     def __init__(self, data):
-        self.__dict__ = data
+        self.__dict__ = writable(data)
 
     @classmethod
     def create(cls, interface_id, address, network_value,
@@ -119,7 +120,7 @@ class InlineInterface(object):
     typeof = 'inline_interface'
 
     def __init__(self, data):
-        self.__dict__ = data
+        self.__dict__ = writable(data)
 
     @classmethod
     def create(cls, interface_id, logical_interface_ref,
@@ -184,7 +185,7 @@ class CaptureInterface(object):
     typeof = 'capture_interface'
 
     def __init__(self, data):
-        self.__dict__ = data
+        self.__dict__ = writable(data)
 
     @classmethod
     def create(cls, interface_id, logical_interface_ref, **kwargs):
@@ -264,7 +265,7 @@ class NodeInterface(object):
     typeof = 'node_interface'
 
     def __init__(self, data):
-        self.__dict__ = data
+        self.__dict__ = writable(data)
 
     @classmethod
     def create(cls, interface_id, address, network_value,
@@ -12,6 +12,7 @@ class GroupMixin(object):
     Methods associated with handling modification of Group 
     objects for existing elements
     """
+    __slots__ = ()
 
     def update_members(self, members, append=False):
         """
@@ -65,6 +66,7 @@ class Group(GroupMixin, Element):
         Group.create('mygroup', ['member1-href','member2-href'])
     """
     typeof = 'group'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(Group, self).__init__(name, **meta)
@@ -104,6 +106,7 @@ class ServiceGroup(GroupMixin, Element):
         ServiceGroup.create('servicegroup', element=[tcp1.href, udp1.href])
     """
     typeof = 'service_group'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(ServiceGroup, self).__init__(name, **meta)
@@ -139,6 +142,7 @@ class TCPServiceGroup(GroupMixin, Element):
         ServiceGroup.create('servicegroup', element=[tcp1.href, tcp2.href])
     """
     typeof = 'tcp_service_group'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(TCPServiceGroup, self).__init__(name, **meta)
@@ -175,6 +179,7 @@ class UDPServiceGroup(GroupMixin, Element):
         UDPServiceGroup.create('udpsvcgroup', element=[udp1.href, udp2.href])
     """
     typeof = 'udp_service_group'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(UDPServiceGroup, self).__init__(name, **meta)
@@ -206,6 +211,7 @@ class IPServiceGroup(GroupMixin, Element):
 
     """
     typeof = 'ip_service_group'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(IPServiceGroup, self).__init__(name, **meta)
@@ -26,6 +26,7 @@ class Host(Element):
     .. note:: Either ipv4 or ipv6 address is required
     """
     typeof = 'host'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(Host, self).__init__(name, **meta)
@@ -67,6 +68,7 @@ class AddressRange(Element):
 
     """
     typeof = 'address_range'
+    __slots__ = ()
     
     def __init__(self, name, **meta):
         super(AddressRange, self).__init__(name, **meta)
@@ -106,6 +108,7 @@ class Router(Element):
     .. note:: either ipv4 or ipv6 address is required
     """
     typeof = 'router'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(Router, self).__init__(name, **meta)
@@ -153,6 +156,7 @@ class Network(Element):
     .. note:: either an ipv4_network or ipv6_network must be specified
     """
     typeof = 'network'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(Network, self).__init__(name, **meta)
@@ -212,6 +216,7 @@ class DomainName(Element):
         DomainName.create('mydomain.net')
     """
     typeof = 'domain_name'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(DomainName, self).__init__(name, **meta)
@@ -254,6 +259,7 @@ class Expression(Element):
               (network A or network B) and is then used as an parameter to create.
     """
     typeof = 'expression'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(Expression, self).__init__(name, **meta)
@@ -317,6 +323,7 @@ class URLListApplication(Element):
     .. note:: URLListApplication requires SMC API version >= 6.1
     """
     typeof = 'url_list_application'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(URLListApplication, self).__init__(name, **meta)
@@ -379,6 +386,7 @@ class IPList(Element):
 
     """
     typeof = 'ip_list'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(IPList, self).__init__(name, **meta)
@@ -486,6 +494,7 @@ class Zone(Element):
         Zone.create('myzone')
     """
     typeof = 'interface_zone'
+    __slots__ = ()
     
     def __init__(self, name, **meta):
         super(Zone, self).__init__(name, **meta)
@@ -513,6 +522,7 @@ class Country(Element):
     .. note:: Country requires SMC API version >= 6.1
     """
     typeof = 'country'
+    __slots__ = ()
 
 
 class IPCountryGroup(Element):
@@ -522,6 +532,7 @@ class IPCountryGroup(Element):
     .. note:: IP Country Group requires SMC API version >= 6.1
     """
     typeof = 'ip_country_group'
+    __slots__ = ()
 
 class Alias(Element):
     """
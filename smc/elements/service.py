@@ -16,6 +16,7 @@ class TCPService(Element):
         TCPService.create('tcpservice', 5000, comment='my service')
     """
     typeof = 'tcp_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(TCPService, self).__init__(name, **meta)
@@ -64,6 +65,7 @@ class UDPService(Element):
         UDPService('udpservice', 5000, 5005).create()
     """
     typeof = 'udp_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(UDPService, self).__init__(name, **meta)
@@ -103,6 +105,7 @@ class IPService(Element):
         IPService('ipservice', 93).create()
     """
     typeof = 'ip_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(IPService, self).__init__(name, **meta)
@@ -142,6 +145,7 @@ class EthernetService(Element):
 
     """
     typeof = 'ethernet_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(EthernetService, self).__init__(name, **meta)
@@ -174,6 +178,7 @@ class Protocol(Element):
     Add is not possible 
     """
     typeof = 'protocol'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(Protocol, self).__init__(name, **meta)
@@ -185,6 +190,7 @@ class RPCService(Element):
     Represents an RPC service element
     """
     typeof = 'rpc_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(RPCService, self).__init__(name, **meta)
@@ -203,6 +209,7 @@ class ICMPService(Element):
         ICMPService.create(name='api-icmp', icmp_type=3, icmp_code=7)
     """
     typeof = 'icmp_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(ICMPService, self).__init__(name, **meta)
@@ -240,6 +247,7 @@ class ICMPIPv6Service(Element):
         ICMPIPv6Service.create('api-Neighbor Advertisement Message', 139)
     """
     typeof = 'icmp_ipv6_service'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(ICMPIPv6Service, self).__init__(name, **meta)
@@ -272,6 +280,7 @@ class ApplicationSituation(Element):
     into the application itself.
     """
     typeof = 'application_situation'
+    __slots__ = ()
 
     def __init__(self, name, **meta):
         super(ApplicationSituation, self).__init__(name, **meta)
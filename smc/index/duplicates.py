@@ -0,0 +1,147 @@
+"""
+Detect network elements that define the same address, network or range.
+
+:py:func:`smc.actions.search.search_duplicate` returns only the href of each
+duplicate and every entry must then be retrieved separately. The detector
+instead normalizes the address values of Host, Router, Network and
+AddressRange elements (IPv4 and IPv6, including secondary addresses) and
+groups them by value in a hash index in a single pass over element data.
+Values are compared after normalization, so '10.0.0.1' on a host and
+'10.0.0.1/32' on a network are duplicates, as are different spellings of
+the same IPv6 address.
+
+Find duplicates using element data from the SMC (retrieved concurrently)::
+
+    from smc.index.duplicates import find_duplicates
+
+    for cluster in find_duplicates():
+        print(cluster.address)
+        for duplicate in cluster.elements:
+            print('  ', duplicate.type, duplicate.name, duplicate.attribute)
+
+Or from a local mirror, which does not make any requests::
+
+    from smc.mirror.mirror import Mirror
+    from smc.index.duplicates import find_duplicates_in_mirror
+
+    clusters = find_duplicates_in_mirror(Mirror('/tmp/smc.db').store)
+"""
+from collections import namedtuple
+from smc.base.pool import DEFAULT_WORKERS
+from smc.elements.network import Host, Router, Network, AddressRange
+from smc.index.ipindex import parse, format_interval
+
+#: Attributes holding address values by element type. Secondary addresses
+#: are a list.
+ADDRESS_ATTRIBUTES = {
+    Host.typeof: ('address', 'ipv6_address', 'secondary'),
+    Router.typeof: ('address', 'ipv6_address', 'secondary'),
+    Network.typeof: ('ipv4_network', 'ipv6_network'),
+    AddressRange.typeof: ('ip_range',)}
+
+#: Element using a duplicated value and the attribute holding it
+Duplicate = namedtuple('Duplicate', 'href name type attribute')
+
+#: Normalized address value and the elements that define it
+DuplicateCluster = namedtuple('DuplicateCluster', 'address elements')
+
+
+class DuplicateDetector(object):
+    """
+    Hash index of normalized address values. Add element data with
+    :meth:`add` and retrieve the duplicates with :meth:`clusters`.
+
+    :param bool secondary: include secondary addresses of hosts and
+        routers
+    """
+
+    def __init__(self, secondary=True):
+        self.secondary = secondary
+        self._values = {}  # (version, start, end) -> list(Duplicate)
+
+    def add(self, href, name, typeof, data):
+        """
+        Add the address values of an element.
+
+        :param str href: href of element
+        :param str name: name of element
+        :param str typeof: element type, i.e. 'host'
+        :param dict data: element json
+        :return: None
+        """
+        for attribute in ADDRESS_ATTRIBUTES.get(typeof, ()):
+            values = data.get(attribute)
+            if not values:
+                continue
+            if attribute == 'secondary':
+                if not self.secondary:
+                    continue
+            else:
+                values = [values]
+            duplicate = Duplicate(href, name, typeof, attribute)
+            for value in values:
+                try:
+                    key = parse(value)
+                except ValueError:
+                    continue
+                self._values.setdefault(key, []).append(duplicate)
+
+    def add_element(self, element):
+        """
+        Add the address values of an element using its data.
+
+        :param Element element: Host, Router, Network or AddressRange
+        :return: None
+        """
+        self.add(element.href, element.name, element.typeof, element.data)
+
+    def clusters(self):
+        """
+        Values defined by more than one element, sorted by value. An
+        element that defines the same value twice (i.e. as its address
+        and secondary address) is not a duplicate by itself.
+
+        :rtype: list(DuplicateCluster)
+        """
+        clusters = []
+        for key in sorted(self._values):
+            elements = self._values[key]
+            if len(set(duplicate.href for duplicate in elements)) > 1:
+                clusters.append(DuplicateCluster(format_interval(*key),
+                                                 list(elements)))
+        return clusters
+
+
+def find_duplicates(classes=(Host, Router, Network, AddressRange),
+                    secondary=True, workers=DEFAULT_WORKERS):
+    """
+    Find duplicate address values from element data retrieved from the
+    SMC. Elements are retrieved concurrently.
+
+    :param classes: element classes to check
+    :param bool secondary: include secondary addresses
+    :param int workers: number of concurrent requests
+    :rtype: list(DuplicateCluster)
+    """
+    detector = DuplicateDetector(secondary)
+    for clazz in classes:
+        for element in clazz.objects.all().prefetch(workers):
+            detector.add_element(element)
+    return detector.clusters()
+
+
+def find_duplicates_in_mirror(store, types=None, secondary=True):
+    """
+    Find duplicate address values from elements in a mirror.
+
+    :param MirrorStore store: mirror storage
+    :param list types: element types to check; default all types with
+        address values
+    :param bool secondary: include secondary addresses
+    :rtype: list(DuplicateCluster)
+    """
+    detector = DuplicateDetector(secondary)
+    for href, typeof, name, data in store.elements(
+            types or list(ADDRESS_ATTRIBUTES)):
+        detector.add(href, name, typeof, data)
+    return detector.clusters()
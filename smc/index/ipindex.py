@@ -0,0 +1,416 @@
+"""
+In-memory index of the IP addresses, networks and ranges defined by network
+elements. Use the index to answer which elements contain an address or
+network without retrieving and checking every element for each query.
+
+Build an index from the SMC::
+
+    from smc.index.ipindex import IPIndex
+
+    index = IPIndex.build()
+    index.containing('10.1.2.3')     # elements containing the address
+    index.containing('10.1.2.0/24')  # elements containing the whole network
+    index.overlapping('10.1.0.0-10.1.255.255')  # elements sharing any address
+    index.within('10.0.0.0/8')       # elements inside the network
+
+Queries accept an address, a network in CIDR notation or a range in the
+form 'start-end', for IPv4 or IPv6, and return elements as instances of
+:py:class:`smc.base.model.Element`.
+
+Each element contributes one or more intervals: Host and Router addresses
+(including secondary addresses), Network ipv4 and ipv6 networks,
+AddressRange ranges and the entries of an IPList. Intervals are stored as
+integers in a centered interval tree per IP version, so queries take
+logarithmic time plus the number of results.
+
+The index can be updated incrementally with :meth:`IPIndex.add` and
+:meth:`IPIndex.remove`. Changes are applied to the tree lazily; until the
+number of pending changes is large enough to justify rebuilding the tree,
+added intervals are checked linearly and removed elements are skipped.
+"""
+import logging
+from smc.api.exceptions import FetchElementFailed
+from smc.base.model import Element, prepared_request
+from smc.base.pool import DEFAULT_WORKERS
+from smc.elements.network import Host, Router, Network, AddressRange, IPList
+
+logger = logging.getLogger(__name__)
+
+#: Element classes indexed by :meth:`IPIndex.build`
+INDEXED = (Host, Router, Network, AddressRange, IPList)
+
+
+def parse_address(value):
+    """
+    Parse an IPv4 or IPv6 address.
+
+    :param str value: address
+    :raises ValueError: invalid address
+    :return: (version, integer value)
+    :rtype: tuple
+    """
+    value = value.strip()
+    if ':' in value:
+        return 6, _parse_ipv6(value)
+    return 4, _parse_ipv4(value)
+
+
+def parse(value):
+    """
+    Parse an address, network (CIDR) or range ('start-end') into an
+    interval of integer addresses.
+
+    :param str value: address, network or range
+    :raises ValueError: invalid value
+    :return: (version, start, end)
+    :rtype: tuple
+    """
+    value = value.strip()
+    if '-' in value:
+        first, last = value.split('-', 1)
+        version, start = parse_address(first)
+        last_version, end = parse_address(last)
+        if version != last_version or end < start:
+            raise ValueError('Invalid address range: {}'.format(value))
+        return version, start, end
+    if '/' in value:
+        address, prefix = value.split('/', 1)
+        version, start = parse_address(address)
+        bits = 32 if version == 4 else 128
+        prefix = int(prefix)
+        if not 0 <= prefix <= bits:
+            raise ValueError('Invalid network: {}'.format(value))
+        host_mask = (1 << (bits - prefix)) - 1
+        start &= ~host_mask
+        return version, start, start | host_mask
+    version, address = parse_address(value)
+    return version, address, address
+
+
+def _parse_ipv4(value):
+    octets = value.split('.')
+    if len(octets) != 4:
+        raise ValueError('Invalid IPv4 address: {}'.format(value))
+    address = 0
+    for octet in octets:
+        if not octet.isdigit() or int(octet) > 255:
+            raise ValueError('Invalid IPv4 address: {}'.format(value))
+        address = (address << 8) | int(octet)
+    return address
+
+
+def _parse_ipv6(value):
+    value = value.split('%', 1)[0]  # Zone index
+    if value.count('::') > 1:
+        raise ValueError('Invalid IPv6 address: {}'.format(value))
+    head, _, tail = value.partition('::')
+    groups = []
+    for part in (head, tail):
+        words = []
+        for word in part.split(':') if part else []:
+            if '.' in word:  # Embedded IPv4 address
+                ipv4 = _parse_ipv4(word)
+                words.extend((ipv4 >> 16, ipv4 & 0xffff))
+            else:
+                if not 0 < len(word) <= 4:
+                    raise ValueError('Invalid IPv6 address: {}'.format(value))
+                words.append(int(word, 16))
+        groups.append(words)
+    head, tail = groups
+    if '::' in value:
+        if len(head) + len(tail) > 7:
+            raise ValueError('Invalid IPv6 address: {}'.format(value))
+        words = head + [0] * (8 - len(head) - len(tail)) + tail
+    else:
+        words = head
+    if len(words) != 8:
+        raise ValueError('Invalid IPv6 address: {}'.format(value))
+    address = 0
+    for word in words:
+        address = (address << 16) | word
+    return address
+
+
+def format_address(version, value):
+    """
+    Format an integer address as text. IPv6 addresses use the
+    compressed form.
+
+    :param int version: 4 or 6
+    :param int value: address
+    :rtype: str
+    """
+    if version == 4:
+        return '.'.join(str((value >> shift) & 0xff)
+                        for shift in (24, 16, 8, 0))
+    words = [(value >> shift) & 0xffff for shift in range(112, -16, -16)]
+    # Longest run of two or more zero words is replaced by '::'
+    best, best_len, run, run_len = None, 1, None, 0
+    for index, word in enumerate(words):
+        if word:
+            run, run_len = None, 0
+            continue
+        if run is None:
+            run = index
+        run_len += 1
+        if run_len > best_len:
+            best, best_len = run, run_len
+    text = ['{:x}'.format(word) for word in words]
+    if best is None:
+        return ':'.join(text)
+    return '{}::{}'.format(':'.join(text[:best]),
+                           ':'.join(text[best + best_len:]))
+
+
+def format_interval(version, start, end):
+    """
+    Format an interval as an address, network (CIDR) or range.
+
+    :rtype: str
+    """
+    if start == end:
+        return format_address(version, start)
+    size = end - start + 1
+    bits = 32 if version == 4 else 128
+    if size & (size - 1) == 0 and start % size == 0:
+        return '{}/{}'.format(format_address(version, start),
+                              bits - size.bit_length() + 1)
+    return '{}-{}'.format(format_address(version, start),
+                          format_address(version, end))
+
+
+def element_intervals(element):
+    """
+    Addresses, networks and ranges defined by an element. IPList
+    contents are retrieved from the SMC.
+
+    :param Element element: Host, Router, Network, AddressRange or IPList
+    :return: list of (version, start, end)
+    """
+    data = element.data
+    typeof = element.typeof
+    values = []
+    if typeof in (Host.typeof, Router.typeof):
+        values.append(data.get('address'))
+        values.append(data.get('ipv6_address'))
+        values.extend(data.get('secondary') or [])
+    elif typeof == Network.typeof:
+        values.append(data.get('ipv4_network'))
+        values.append(data.get('ipv6_network'))
+    elif typeof == AddressRange.typeof:
+        values.append(data.get('ip_range'))
+    elif typeof == IPList.typeof:
+        values.extend(_iplist_entries(element))
+
+    intervals = []
+    for value in values:
+        if value:
+            try:
+                intervals.append(parse(value))
+            except ValueError:
+                logger.warning('Skipping %r in %s: not an address, network '
+                               'or range', value, element.href)
+    return intervals
+
+
+def _iplist_entries(element):
+    result = prepared_request(
+        FetchElementFailed,
+        href=element.resource.ip_address_list,
+        headers={'accept': 'application/json'}
+    ).read()
+    return (result.json or {}).get('ip', [])
+
+
+class _Node(object):
+    """
+    Node of a centered interval tree. Intervals containing the center
+    are held sorted by start ascending and by end descending.
+    """
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals):
+        points = sorted(interval[0] for interval in intervals)
+        self.center = center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: -interval[1])
+        self.left = _Node(left) if left else None
+        self.right = _Node(right) if right else None
+
+    def overlapping(self, start, end, found):
+        node = self
+        while node is not None:
+            if end < node.center:
+                for interval in node.by_start:
+                    if interval[0] > end:
+                        break
+                    found.append(interval)
+                node = node.left
+            elif start > node.center:
+                for interval in node.by_end:
+                    if interval[1] < start:
+                        break
+                    found.append(interval)
+                node = node.right
+            else:
+                found.extend(node.by_start)
+                if node.left is not None:
+                    node.left.overlapping(start, end, found)
+                node = node.right
+        return found
+
+
+class IPIndex(object):
+    """
+    IP containment index over network elements.
+    See :py:mod:`smc.index.ipindex`.
+    """
+
+    def __init__(self):
+        self._elements = {}  # href -> (generation, meta, intervals)
+        self._generation = 0
+        self._trees = {4: None, 6: None}
+        self._pending = []  # Intervals added since the trees were built
+        self._stale = 0  # Intervals removed since the trees were built
+
+    @classmethod
+    def build(cls, classes=INDEXED, workers=DEFAULT_WORKERS):
+        """
+        Build an index from all elements of the given classes. Element
+        data is retrieved concurrently.
+
+        :param classes: element classes to index
+        :param int workers: number of concurrent requests
+        :rtype: IPIndex
+        """
+        index = cls()
+        for clazz in classes:
+            for element in clazz.objects.all().prefetch(workers):
+                index.add(element)
+        return index
+
+    def add(self, element, intervals=None):
+        """
+        Add or replace an element in the index.
+
+        :param Element element: element to index
+        :param list intervals: (version, start, end) for the element;
+            taken from the element data if None
+        :return: None
+        """
+        if intervals is None:
+            intervals = element_intervals(element)
+        self.remove(element.href)
+        self._generation += 1
+        entries = [(start, end, element.href, self._generation, version)
+                   for version, start, end in intervals]
+        self._elements[element.href] = (
+            self._generation,
+            {'href': element.href, 'name': element.name,
+             'type': element.typeof},
+            entries)
+        self._pending.extend(entries)
+
+    def remove(self, href):
+        """
+        Remove an element from the index by href.
+
+        :param str href: href of element
+        :return: None
+        """
+        removed = self._elements.pop(href, None)
+        if removed is not None:
+            self._stale += len(removed[2])
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __contains__(self, href):
+        return href in self._elements
+
+    def containing(self, value):
+        """
+        Elements that contain every address of the value.
+
+        :param str value: address, network or range
+        :rtype: list(Element)
+        """
+        version, start, end = parse(value)
+        return self._elements_for(
+            interval for interval in self._search(version, start, start)
+            if interval[1] >= end)
+
+    def overlapping(self, value):
+        """
+        Elements that contain any address of the value.
+
+        :param str value: address, network or range
+        :rtype: list(Element)
+        """
+        return self._elements_for(self._search(*parse(value)))
+
+    def within(self, value):
+        """
+        Elements that only contain addresses of the value, i.e. all hosts
+        and networks inside a network.
+
+        :param str value: address, network or range
+        :rtype: list(Element)
+        """
+        version, start, end = parse(value)
+        return self._elements_for(
+            interval for interval in self._search(version, start, end)
+            if interval[0] >= start and interval[1] <= end)
+
+    def _search(self, version, start, end):
+        self._maybe_rebuild()
+        found = []
+        tree = self._trees[version]
+        if tree is not None:
+            tree.overlapping(start, end, found)
+        found.extend(interval for interval in self._pending
+                     if interval[4] == version and
+                     interval[0] <= end and interval[1] >= start)
+        return found
+
+    def _elements_for(self, intervals):
+        hrefs, seen = [], set()
+        for interval in intervals:
+            entry = self._elements.get(interval[2])
+            # Skip intervals of removed or replaced elements
+            if entry is not None and entry[0] == interval[3] and \
+                    interval[2] not in seen:
+                seen.add(interval[2])
+                hrefs.append(interval[2])
+        return [Element.from_meta(**self._elements[href][1])
+                for href in hrefs]
+
+    def _maybe_rebuild(self):
+        changes = len(self._pending) + self._stale
+        if changes > max(64, len(self._elements) ** 0.5):
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuild the interval trees, applying all pending changes. This is
+        done automatically when queried after enough changes.
+
+        :return: None
+        """
+        intervals = {4: [], 6: []}
+        for _, _, entries in self._elements.values():
+            for entry in entries:
+                intervals[entry[4]].append(entry)
+        self._trees = dict(
+            (version, _Node(entries) if entries else None)
+            for version, entries in intervals.items())
+        self._pending = []
+        self._stale = 0
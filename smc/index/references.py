@@ -0,0 +1,313 @@
+"""
+Reference graph of SMC elements.
+
+:py:meth:`smc.base.model.Element.referenced_by` sends one request per
+element. To find references for many elements, build a reference graph
+once. Groups, policies (with their access and NAT rules), engines (with
+their routing and VPN sites) and external gateways are retrieved in
+parallel, and every element href found in their json is recorded as a
+reference::
+
+    from smc.index.references import ReferenceGraph
+
+    graph = ReferenceGraph.build()
+    graph.referenced_by(host)                  # direct references
+    graph.referenced_by(host, transitive=True) # i.e. rules, groups and the
+                                               # policies containing them
+    graph.includes(group, transitive=True)     # all members of nested groups
+
+Rules are recorded as references from the rule; the policy is linked to
+each of its rules so that transitive queries reach the policy. Routing is
+linked from the engine and VPN sites from their gateway.
+
+Results are lists of href. Names and types of crawled elements (groups,
+rules, policies, etc) are available from :meth:`ReferenceGraph.meta`.
+
+The graph can be updated incrementally: :meth:`ReferenceGraph.refresh`
+retrieves an element again and replaces its references, and
+:meth:`ReferenceGraph.apply_changes` applies the changes found by
+:py:class:`smc.mirror.sync.MirrorSync`.
+"""
+import logging
+from collections import deque
+import smc.compat as compat
+from smc.api.exceptions import FetchElementFailed
+from smc.base.collection import ElementCollection
+from smc.base.model import prepared_request
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+#: Element types crawled by :meth:`ReferenceGraph.build`
+CRAWL_TYPES = (
+    'group', 'service_group', 'tcp_service_group', 'udp_service_group',
+    'ip_service_group', 'icmp_service_group',
+    'fw_policy', 'fw_template_policy', 'layer2_policy',
+    'layer2_template_policy', 'ips_policy', 'ips_template_policy',
+    'single_fw', 'single_layer2', 'single_ips', 'virtual_fw', 'virtual_ips',
+    'virtual_fw_layer2', 'fw_cluster', 'master_engine',
+    'external_gateway')
+
+#: Links followed from crawled elements. Links with a rel ending in
+#: '_rules' (policy rules) are also followed.
+FOLLOW_LINKS = ('routing', 'internal_gateway', 'vpn_site')
+
+
+def is_element_href(value):
+    """
+    Whether a json value is a reference to an element.
+    """
+    return isinstance(value, compat.string_types) and \
+        value.startswith('http') and \
+        '/elements/' in value
+
+
+def extract_references(data):
+    """
+    Element hrefs referenced in element json. Resource links of the
+    element are not references and are skipped.
+
+    :param data: element json
+    :return: set of href
+    """
+    found = set()
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict) or hasattr(value, 'keys'):
+            for key in value:
+                if key != 'link':
+                    stack.append(value[key])
+        elif isinstance(value, list) or hasattr(value, 'insert'):
+            stack.extend(value)
+        elif is_element_href(value):
+            found.add(value)
+    return found
+
+
+def _follow(rel):
+    return rel in FOLLOW_LINKS or rel.endswith('_rules')
+
+
+def _read(href):
+    return prepared_request(FetchElementFailed, href=href).read().json
+
+
+class ReferenceGraph(object):
+    """
+    Adjacency index of element references. See
+    :py:mod:`smc.index.references`.
+
+    :param int workers: number of concurrent requests
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self._out = {}  # href -> set of referenced href
+        self._in = {}  # href -> set of referring href
+        self._meta = {}  # href -> meta of crawled elements
+        self._children = {}  # href -> set of href retrieved from its links
+        self._linked = {}  # href -> set of href in its links retrieved
+        # from another element
+
+    @classmethod
+    def build(cls, types=CRAWL_TYPES, workers=DEFAULT_WORKERS):
+        """
+        Build the graph by crawling all elements of the given types.
+
+        :param list types: element types by filter context
+        :param int workers: number of concurrent requests
+        :rtype: ReferenceGraph
+        """
+        graph = cls(workers)
+        hrefs = []
+        for typeof in types:
+            collection = ElementCollection(filter_context=typeof)
+            for meta in collection.iter_items():
+                graph._meta[meta.get('href')] = meta
+                hrefs.append((None, meta.get('href')))
+        graph._crawl(hrefs)
+        return graph
+
+    def _crawl(self, hrefs):
+        # Breadth first, each level is retrieved in parallel. Items are
+        # (parent href, href); parent is set for hrefs found from links.
+        # Each href is retrieved once; an href found again from another
+        # link (or a link cycle) is only recorded as referenced.
+        level, crawled = [], set()
+        for parent, href in hrefs:
+            if href not in crawled:
+                crawled.add(href)
+                level.append((parent, href))
+
+        def queue(parent, href):
+            if href in crawled:
+                self._linked.setdefault(parent, set()).add(href)
+                self._out.setdefault(parent, set()).add(href)
+                self._in.setdefault(href, set()).add(parent)
+            else:
+                crawled.add(href)
+                next_level.append((parent, href))
+
+        while level:
+            parents = dict((href, parent) for parent, href in level)
+            next_level = []
+            for href, data, error in imap_unordered(
+                    _read, list(parents), self.workers):
+                if error is not None:
+                    logger.warning('Reference crawl failed for %s: %s',
+                                   href, error)
+                    continue
+                parent = parents[href]
+                if parent is not None:
+                    self._link_child(parent, href)
+                if isinstance(data, list):  # Collection, i.e. rules
+                    for meta in data:
+                        if meta.get('href'):
+                            self._meta[meta['href']] = meta
+                            queue(href, meta['href'])
+                    continue
+                data = data or {}
+                self.update(href, data)
+                for link in data.get('link', []):
+                    if _follow(link.get('rel', '')):
+                        queue(href, link.get('href'))
+            level = next_level
+
+    def _link_child(self, parent, child):
+        self._children.setdefault(parent, set()).add(child)
+        self._out.setdefault(parent, set()).add(child)
+        self._in.setdefault(child, set()).add(parent)
+
+    def update(self, href, data):
+        """
+        Replace the references of an element with those found in its
+        json. Links to sub elements (i.e. policy rules) are kept.
+
+        :param str href: href of element
+        :param dict data: element json
+        :return: None
+        """
+        if data.get('name') is not None:
+            meta = self._meta.setdefault(href, {'href': href})
+            meta['name'] = data.get('name')
+        references = extract_references(data)
+        references.discard(href)
+        references.update(self._children.get(href, ()))
+        references.update(self._linked.get(href, ()))
+        for old in self._out.get(href, set()) - references:
+            self._in.get(old, set()).discard(href)
+        for new in references:
+            self._in.setdefault(new, set()).add(href)
+        self._out[href] = references
+
+    def remove(self, href):
+        """
+        Remove an element and the sub elements retrieved from its links.
+
+        :param str href: href of element
+        :return: None
+        """
+        for child in self._children.pop(href, ()):
+            self.remove(child)
+        self._linked.pop(href, None)
+        for referenced in self._out.pop(href, ()):
+            self._in.get(referenced, set()).discard(href)
+        for referrer in self._in.get(href, ()):
+            children = self._children.get(referrer)
+            if children is not None:
+                children.discard(href)
+            self._linked.get(referrer, set()).discard(href)
+            self._out.get(referrer, set()).discard(href)
+        self._in.pop(href, None)
+        self._meta.pop(href, None)
+
+    def refresh(self, element):
+        """
+        Retrieve an element again and replace its references. Sub
+        elements (i.e. policy rules) are retrieved again as well.
+
+        :param element: element or href
+        :return: None
+        """
+        href = getattr(element, 'href', element)
+        for child in self._children.pop(href, ()):
+            self.remove(child)
+        self._linked.pop(href, None)
+        self._crawl([(None, href)])
+
+    def apply_changes(self, changes):
+        """
+        Apply changes from :py:class:`smc.mirror.sync.MirrorSync`.
+        Deleted elements are removed and added or modified elements
+        of crawled types are refreshed.
+
+        :param changes: iterable of :py:class:`smc.mirror.sync.Change`
+        :return: None
+        """
+        for change in changes:
+            if change.action == 'deleted':
+                self.remove(change.href)
+            elif change.type in CRAWL_TYPES:
+                self._meta[change.href] = {
+                    'href': change.href, 'name': change.name,
+                    'type': change.type}
+                self.refresh(change.href)
+
+    def meta(self, href):
+        """
+        Meta data (href, name, type) of a crawled element
+
+        :return: dict or None if the element was not crawled
+        """
+        return self._meta.get(href)
+
+    def referenced_by(self, element, transitive=False):
+        """
+        Elements referencing the element.
+
+        :param element: element or href
+        :param bool transitive: include elements referencing the
+            referrers, i.e. groups containing a group or the policy of
+            a rule
+        :return: list of href
+        """
+        return self._walk(self._in, getattr(element, 'href', element),
+                          transitive)
+
+    def includes(self, element, transitive=False):
+        """
+        Elements referenced by the element, i.e. group members, or the
+        rules of a policy and the elements used in them.
+
+        :param element: element or href
+        :param bool transitive: include elements referenced by the
+            referenced elements
+        :return: list of href
+        """
+        return self._walk(self._out, getattr(element, 'href', element),
+                          transitive)
+
+    def is_referenced(self, element):
+        """
+        Whether any element references the element
+
+        :param element: element or href
+        :rtype: bool
+        """
+        return bool(self._in.get(getattr(element, 'href', element)))
+
+    def __contains__(self, href):
+        return href in self._out or href in self._in
+
+    def _walk(self, edges, href, transitive):
+        if not transitive:
+            return sorted(edges.get(href, ()))
+        seen = set()
+        queue = deque([href])
+        while queue:
+            for neighbour in edges.get(queue.popleft(), ()):
+                if neighbour not in seen and neighbour != href:
+                    seen.add(neighbour)
+                    queue.append(neighbour)
+        return sorted(seen)
@@ -0,0 +1,384 @@
+"""
+Local text index over element names, comments and category tags. Searches
+are answered in memory without a request to the SMC, which makes the index
+suitable for autocomplete and other interactive lookups.
+
+Build the index from collection listings::
+
+    from smc.elements.network import Host, Network
+    from smc.index.text import TextIndex
+
+    index = TextIndex()
+    index.refresh([Host, Network])
+
+    index.prefix('web-')            # names starting with 'web-'
+    index.substring('prod')         # names containing 'prod'
+    index.tokens('dmz web')         # names containing both words
+    index.tokens('pci', fields=('comment', 'category'))
+
+Names are available from the collection listing. Comments require the
+element data and are retrieved concurrently when the index is created with
+``comments=True``. Category tags are retrieved with one request per
+category when created with ``categories=True``.
+
+Prefix searches use a sorted list of values, substring searches use a
+trigram index and token searches use an inverted index of words, so each
+search takes time proportional to the number of results rather than the
+number of elements. The index can be updated incrementally with
+:meth:`TextIndex.add` and :meth:`TextIndex.remove`, and
+:meth:`TextIndex.refresh` adds, removes and renames elements by comparing
+the current collection listing with the index. When comments are indexed,
+refresh revalidates each element with a conditional GET using the ETag
+seen when it was indexed, so changed comments are picked up while
+unchanged elements return 304 (Not Modified) without content.
+
+Searches are case insensitive.
+"""
+import bisect
+import logging
+import re
+from smc.api.exceptions import FetchElementFailed
+from smc.base.model import Element, prepared_request
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+#: Fields that can be indexed
+FIELDS = ('name', 'comment', 'category')
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(value):
+    """
+    Split text into lower case words
+
+    :rtype: list(str)
+    """
+    return _WORD.findall(value.lower()) if value else []
+
+
+def _trigrams(value):
+    return set(value[i:i + 3] for i in range(len(value) - 2))
+
+
+class _FieldIndex(object):
+    """
+    Index of a single field. Holds sorted (value, href) pairs for prefix
+    search, word to href sets for token search and trigram to href sets
+    for substring search. Values are lower case. Sorted lists are sorted
+    on demand, and removed entries are dropped from them when they are
+    next sorted, so that adding or removing many elements is not
+    quadratic.
+    """
+    __slots__ = ('values', 'sorted', 'words', 'word_list', 'grams', 'dirty',
+                 'removed', 'removed_words')
+
+    def __init__(self):
+        self.values = {}  # href -> list of lower case values
+        self.sorted = []  # sorted (value, href)
+        self.words = {}  # word -> set(href)
+        self.word_list = []  # sorted words
+        self.grams = {}  # trigram -> set(href)
+        self.dirty = False
+        self.removed = set()  # (value, href) still in sorted
+        self.removed_words = set()  # words still in word_list
+
+    def _sort(self):
+        if self.dirty:
+            if self.removed:
+                self.sorted = [entry for entry in self.sorted
+                               if entry not in self.removed]
+                self.removed.clear()
+            if self.removed_words:
+                self.word_list = [word for word in self.word_list
+                                  if word not in self.removed_words]
+                self.removed_words.clear()
+            self.sorted.sort()
+            self.word_list.sort()
+            self.dirty = False
+
+    def add(self, href, values):
+        values = [value.lower() for value in values if value]
+        self.values[href] = values
+        for value in values:
+            if (value, href) in self.removed:
+                self.removed.discard((value, href))
+            else:
+                self.sorted.append((value, href))
+            for word in tokenize(value):
+                hrefs = self.words.get(word)
+                if hrefs is None:
+                    hrefs = self.words[word] = set()
+                    if word in self.removed_words:
+                        self.removed_words.discard(word)
+                    else:
+                        self.word_list.append(word)
+                hrefs.add(href)
+            self.dirty = True
+            for gram in _trigrams(value):
+                self.grams.setdefault(gram, set()).add(href)
+
+    def remove(self, href):
+        for value in self.values.pop(href, ()):
+            self.removed.add((value, href))
+            self.dirty = True
+            for word in tokenize(value):
+                hrefs = self.words.get(word)
+                if hrefs is not None:
+                    hrefs.discard(href)
+                    if not hrefs:
+                        del self.words[word]
+                        self.removed_words.add(word)
+            for gram in _trigrams(value):
+                hrefs = self.grams.get(gram)
+                if hrefs is not None:
+                    hrefs.discard(href)
+                    if not hrefs:
+                        del self.grams[gram]
+
+    def prefix(self, text):
+        self._sort()
+        index = bisect.bisect_left(self.sorted, (text,))
+        while index < len(self.sorted) and \
+                self.sorted[index][0].startswith(text):
+            yield self.sorted[index][1]
+            index += 1
+
+    def word_prefix(self, text):
+        self._sort()
+        hrefs = set()
+        index = bisect.bisect_left(self.word_list, text)
+        while index < len(self.word_list) and \
+                self.word_list[index].startswith(text):
+            hrefs.update(self.words[self.word_list[index]])
+            index += 1
+        return hrefs
+
+    def substring(self, text):
+        if len(text) < 3:
+            return set(href for href, values in self.values.items()
+                       if any(text in value for value in values))
+        candidates = None
+        for gram in _trigrams(text):
+            hrefs = self.grams.get(gram)
+            if not hrefs:
+                return set()
+            candidates = set(hrefs) if candidates is None \
+                else candidates & hrefs
+        return set(href for href in candidates
+                   if any(text in value for value in self.values[href]))
+
+
+class TextIndex(object):
+    """
+    Text index over element names, comments and category tags.
+    See :py:mod:`smc.index.text`.
+
+    :param bool comments: retrieve element data to index comments
+    :param bool categories: retrieve category tags assigned to elements
+    :param int workers: number of concurrent requests when retrieving
+        comments or categories
+    """
+
+    def __init__(self, comments=False, categories=False,
+                 workers=DEFAULT_WORKERS):
+        self.comments = comments
+        self.categories = categories
+        self.workers = workers
+        self._meta = {}  # href -> meta
+        self._etags = {}  # href -> ETag of indexed element data
+        self._fields = dict((field, _FieldIndex()) for field in FIELDS)
+
+    def __len__(self):
+        return len(self._meta)
+
+    def __contains__(self, href):
+        return href in self._meta
+
+    def add(self, meta, comment=None, categories=None):
+        """
+        Add or replace an element in the index.
+
+        :param dict meta: element meta data with href, name and type
+        :param str comment: element comment
+        :param list categories: names of category tags of the element
+        :return: None
+        """
+        href = meta.get('href')
+        self.remove(href)
+        self._meta[href] = {'href': href, 'name': meta.get('name'),
+                            'type': meta.get('type')}
+        self._fields['name'].add(href, [meta.get('name')])
+        self._fields['comment'].add(href, [comment])
+        self._fields['category'].add(href, categories or [])
+
+    def add_element(self, element):
+        """
+        Add or replace an element using its current data for the comment.
+
+        :param Element element: element to index
+        :return: None
+        """
+        self.add({'href': element.href, 'name': element.name,
+                  'type': element.typeof},
+                 comment=element.data.get('comment'),
+                 categories=self._fields['category'].values.get(element.href))
+        self._etags[element.href] = element.etag
+
+    def remove(self, href):
+        """
+        Remove an element from the index.
+
+        :param str href: href of element
+        :return: None
+        """
+        self._etags.pop(href, None)
+        if self._meta.pop(href, None) is not None:
+            for field in self._fields.values():
+                field.remove(href)
+
+    def refresh(self, classes):
+        """
+        Update the index from the collection listing of each element
+        class. New elements are added, deleted elements are removed and
+        renamed elements are updated. If comments are indexed, every
+        element is revalidated by ETag and the comment of each new or
+        changed element is indexed again. Category tags of updated
+        elements are kept, and all tags are reloaded if categories are
+        enabled.
+
+        :param list classes: element classes, i.e. [Host, Network]
+        :return: None
+        """
+        for clazz in classes:
+            listing = dict((meta.get('href'), meta)
+                           for meta in clazz.objects.all().iter_items())
+            for href, meta in list(self._meta.items()):
+                if meta.get('type') == clazz.typeof and href not in listing:
+                    self.remove(href)
+            if self.comments:
+                for meta, data in self._load_changed(listing.values()):
+                    self._replace(meta, data.get('comment'))
+            else:
+                for href, meta in listing.items():
+                    if href not in self._meta or \
+                            self._meta[href].get('name') != meta.get('name'):
+                        self._replace(meta)
+        if self.categories:
+            self._load_categories()
+
+    def _replace(self, meta, comment=None):
+        href = meta.get('href')
+        etag = self._etags.get(href)
+        self.add(meta, comment, self._fields['category'].values.get(href))
+        if etag is not None:
+            self._etags[href] = etag
+
+    def _load_changed(self, metas):
+        # (meta, data) of elements that are new or whose ETag changed
+        def read(meta):
+            href = meta.get('href')
+            etag = self._etags.get(href) if href in self._meta else None
+            return prepared_request(
+                FetchElementFailed, href=href,
+                headers={'if-none-match': etag} if etag else None).read()
+
+        changed = []
+        for meta, result, error in imap_unordered(
+                read, list(metas), self.workers):
+            href = meta.get('href')
+            if error is not None:
+                logger.warning('Failed to retrieve %s for the text index: '
+                               '%s', href, error)
+                # Index new elements from the listing without a comment
+                # and ETag, so they are retrieved again by the next refresh
+                if href not in self._meta:
+                    changed.append((meta, {}))
+            elif result.code != 304:
+                changed.append((meta, result.json or {}))
+                self._etags[href] = result.etag
+        return changed
+
+    def _load_categories(self):
+        from smc.elements.other import Category
+        assigned = {}
+        for category, members, error in imap_unordered(
+                lambda category: category.search_elements(),
+                list(Category.objects.all()), self.workers):
+            if error is None:
+                for member in members:
+                    assigned.setdefault(member.href, []).append(category.name)
+        field = self._fields['category']
+        for href in self._meta:
+            tags = assigned.get(href, [])
+            if sorted(tag.lower() for tag in tags) != \
+                    sorted(field.values.get(href, [])):
+                field.remove(href)
+                field.add(href, tags)
+
+    def prefix(self, text, field='name', limit=None):
+        """
+        Elements with a field value starting with text, sorted by value.
+
+        :param str text: prefix to search
+        :param str field: 'name', 'comment' or 'category'
+        :param int limit: maximum number of results
+        :rtype: list(Element)
+        """
+        hrefs, seen = [], set()
+        for href in self._fields[field].prefix(text.lower()):
+            if href not in seen:
+                seen.add(href)
+                hrefs.append(href)
+                if limit is not None and len(hrefs) >= limit:
+                    break
+        return self._elements(hrefs, sort=False)
+
+    def substring(self, text, field='name', limit=None):
+        """
+        Elements with a field value containing text.
+
+        :param str text: text to search
+        :param str field: 'name', 'comment' or 'category'
+        :param int limit: maximum number of results
+        :rtype: list(Element)
+        """
+        return self._elements(
+            self._fields[field].substring(text.lower()), limit=limit)
+
+    def tokens(self, query, fields=('name',), limit=None):
+        """
+        Elements containing every word of the query in any of the fields.
+        The last word matches as a prefix so partially typed input can be
+        searched.
+
+        :param str query: words to search
+        :param tuple fields: fields to search
+        :param int limit: maximum number of results
+        :rtype: list(Element)
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        result = None
+        for position, word in enumerate(words):
+            hrefs = set()
+            for field in fields:
+                index = self._fields[field]
+                if position == len(words) - 1:
+                    hrefs.update(index.word_prefix(word))
+                else:
+                    hrefs.update(index.words.get(word, ()))
+            result = hrefs if result is None else result & hrefs
+            if not result:
+                return []
+        return self._elements(result, limit=limit)
+
+    def _elements(self, hrefs, sort=True, limit=None):
+        metas = [self._meta[href] for href in hrefs]
+        if sort:
+            metas.sort(key=lambda meta: (meta.get('name') or '').lower())
+        if limit is not None:
+            metas = metas[:limit]
+        return [Element.from_meta(**meta) for meta in metas]
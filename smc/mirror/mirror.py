@@ -0,0 +1,282 @@
+"""
+Mirror pulls elements from the SMC into a local SQLite store so that
+reporting and analysis can run without querying the SMC for every element.
+
+Pull element types into a mirror file::
+
+    from smc import session
+    from smc.mirror.mirror import Mirror
+
+    session.login(url='http://1.1.1.1:8082', api_key='xxxxxxxxxxxxxxxxx')
+    mirror = Mirror('/tmp/smc.db')
+    mirror.pull(['host', 'network', 'address_range', 'group'])
+    mirror.pull(['fw_policy'], follow=['fw_ipv4_access_rules',
+                                       'fw_ipv4_nat_rules'])
+    mirror.pull(['single_fw'], follow=['physical_interface'])
+    session.logout()
+
+Each element is stored with its ETag. Links named in ``follow`` are also
+retrieved for each pulled element; if the link is a collection, the listing
+and every element in it are stored (i.e. the rules of a policy).
+
+To bring the mirror up to date later, use :meth:`Mirror.sync` which only
+downloads elements that were added or changed. See :py:mod:`smc.mirror.sync`.
+
+Once pulled, the mirror can be used in read-only offline mode. While offline,
+all requests made by model classes and collections are served from the
+mirror, no SMC session is required::
+
+    mirror = Mirror('/tmp/smc.db')
+    with mirror.offline():
+        for host in Host.objects.all():
+            print(host.name, host.data.get('address'))
+        policy = FirewallPolicy('mypolicy')
+        for rule in policy.fw_ipv4_access_rules.all():
+            print(rule.name, rule.sources.all_as_href())
+
+In offline mode, collection filters are applied to the element name only
+and modifications raise the exception of the calling method, for example
+:py:class:`smc.api.exceptions.UpdateElementFailed`.
+"""
+import logging
+from contextlib import contextmanager
+import smc
+from smc.api.common import fetch_entry_point
+from smc.api.exceptions import FetchElementFailed, SMCOperationFailure
+from smc.api.web import SMCResult, counters
+from smc.api.session import load_class_mappings
+from smc.base.collection import _context_filters
+from smc.base.model import prepared_request
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+from smc.mirror.store import MirrorStore
+from smc.mirror.sync import MirrorSync
+
+logger = logging.getLogger(__name__)
+
+#: Element types represented by the SMC context filters. Context filters
+#: that are not listed are not restricted by type in offline mode.
+context_filters = {
+    'network_elements': (
+        'host', 'network', 'address_range', 'router', 'group', 'ip_list',
+        'domain_name', 'expression', 'alias', 'interface_zone', 'country',
+        'ip_country_group', 'url_list_application'),
+    'services': (
+        'tcp_service', 'udp_service', 'ip_service', 'icmp_service',
+        'icmp_ipv6_service', 'ethernet_service', 'rpc_service', 'protocol',
+        'service_group', 'tcp_service_group', 'udp_service_group',
+        'ip_service_group', 'icmp_service_group')}
+
+
+class Mirror(object):
+    """
+    Local mirror of SMC elements.
+
+    :param str path: path to SQLite database file; default ':memory:'
+    """
+
+    def __init__(self, path=':memory:'):
+        self.store = MirrorStore(path)
+        self._saved = None
+
+    def pull(self, types, follow=None, workers=DEFAULT_WORKERS):
+        """
+        Pull all elements of the given types into the mirror. Elements
+        are retrieved in parallel.
+
+        :param list types: element types by entry point name, i.e. 'host'
+        :param list follow: link names to retrieve from each element,
+            i.e. 'fw_ipv4_access_rules'
+        :param int workers: number of concurrent requests
+        :raises FetchElementFailed: failed to list an element type
+        :return: number of elements stored
+        :rtype: int
+        """
+        self.save_session()
+        stored = 0
+        for typeof in types:
+            href = fetch_entry_point(typeof)
+            listing = prepared_request(
+                FetchElementFailed, href=href).read().json or []
+            self.store.put_listing(href, listing)
+            stored += self._pull_hrefs(
+                [meta.get('href') for meta in listing], follow, workers)
+        return stored
+
+    def _pull_hrefs(self, hrefs, follow, workers):
+        stored = 0
+        linked = []
+        batch = []
+        for href, result, error in imap_unordered(_read, hrefs, workers):
+            if error is not None:
+                logger.warning('Mirror pull failed for %s: %s', href, error)
+                continue
+            batch.append((href, result.json, result.etag, None))
+            if len(batch) >= 500:
+                self.store.put_many(batch)
+                stored += len(batch)
+                batch = []
+            for link in result.json.get('link', []):
+                if follow and link.get('rel') in follow:
+                    linked.append(link.get('href'))
+        self.store.put_many(batch)
+        stored += len(batch)
+
+        members = []
+        for href, result, error in imap_unordered(_read, linked, workers):
+            if error is not None:
+                logger.warning('Mirror pull failed for %s: %s', href, error)
+            elif isinstance(result.json, list):
+                self.store.put_listing(href, result.json)
+                members.extend(meta.get('href') for meta in result.json
+                               if meta.get('href'))
+            elif result.json:
+                self.store.put(href, result.json, result.etag)
+                stored += 1
+        if members:
+            stored += self._pull_hrefs(members, None, workers)
+        return stored
+
+    def sync(self, types, workers=DEFAULT_WORKERS):
+        """
+        Incrementally synchronize element types that were previously
+        pulled. See :py:mod:`smc.mirror.sync`.
+
+        :param list types: element types by filter context, i.e. 'host'
+        :param int workers: number of concurrent requests
+        :return: changes applied to the mirror
+        :rtype: list(smc.mirror.sync.Change)
+        """
+        self.save_session()
+        return MirrorSync(self.store, workers).run(types)
+
+    def save_session(self):
+        """
+        Save the URL, API version and entry points of the current session
+        into the mirror. This is required for offline mode and is done
+        automatically when pulling.
+
+        :return: None
+        """
+        session = smc.session
+        self.store.set_info('url', session.url)
+        self.store.set_info('api_version', session.api_version)
+        self.store.set_info('entry_point', session.cache.api_entry)
+
+    def enable_offline(self):
+        """
+        Serve all requests from the mirror. The current session state is
+        saved and restored by :meth:`disable_offline`.
+
+        :return: None
+        """
+        if self._saved is not None:
+            return
+        session = smc.session
+        self._saved = (session._url, session._connection,
+                       session.cache.api_version, session.cache.api_entry)
+        session._url = self.store.get_info('url')
+        session._connection = MirrorConnection(self.store)
+        session.cache.api_version = self.store.get_info('api_version')
+        session.cache.api_entry = self.store.get_info('entry_point')
+        load_class_mappings()
+
+    def disable_offline(self):
+        """
+        Restore the session saved when offline mode was enabled.
+
+        :return: None
+        """
+        if self._saved is not None:
+            session = smc.session
+            session._url, session._connection, session.cache.api_version, \
+                session.cache.api_entry = self._saved
+            self._saved = None
+
+    @contextmanager
+    def offline(self):
+        """
+        Context manager for read-only offline mode.
+        """
+        self.enable_offline()
+        try:
+            yield self
+        finally:
+            self.disable_offline()
+
+
+def _read(href):
+    return prepared_request(FetchElementFailed, href=href).read()
+
+
+class MirrorConnection(object):
+    """
+    Connection that serves GET requests from a :class:`MirrorStore`. Used
+    in place of :py:class:`smc.api.web.SMCAPIConnection` in offline mode.
+
+    :param MirrorStore store: mirror storage
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def send_request(self, method, request):
+        if method != 'GET' or request.filename:
+            raise _failure(
+                'SMC mirror is read only, {} request to {} is not supported '
+                'in offline mode.'.format(method, request.href), 405)
+
+        counters.update(read=1)
+        params = request.params or {}
+        if 'filter_context' in params or 'filter' in params:
+            return _result(self.query(params))
+
+        element = self.store.get(request.href)
+        if element is not None:
+            result = _result(element[1])
+            result.etag = element[0]
+            return result
+
+        listing = self.store.get_listing(request.href)
+        if listing is not None:
+            return _result(listing)
+
+        raise _failure('Not found in SMC mirror: {}'.format(request.href))
+
+    def query(self, params):
+        """
+        Answer a collection query from the mirror. Filters match the
+        element name. Paging by limit and offset is supported.
+
+        :param dict params: request query parameters
+        :return: list of element meta data
+        """
+        types = []
+        for typeof in (params.get('filter_context') or '').split(','):
+            if typeof in context_filters:
+                types.extend(context_filters[typeof])
+            elif typeof and typeof not in _context_filters:
+                types.append(typeof)
+        if params.get('filter_context') and not types:
+            types = None  # Unmapped context filter, do not restrict by type
+
+        names = params.get('filter')
+        if names and not isinstance(names, list):
+            names = [names]
+        return self.store.find(
+            types=types, names=names,
+            exact_match=bool(params.get('exact_match')),
+            limit=params.get('limit'), offset=params.get('offset', 0))
+
+
+def _result(json):
+    result = SMCResult()
+    result.code = 200
+    result.json = json
+    return result
+
+
+def _failure(msg, code=404):
+    failure = SMCOperationFailure()
+    failure.code = failure.smcresult.code = code
+    failure.smcresult.msg = msg
+    return failure
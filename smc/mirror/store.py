@@ -0,0 +1,271 @@
+"""
+SQLite backed storage for a local mirror of SMC elements.
+
+Elements are stored by href with the element type, name, ETag and raw
+json. The type, name and etag columns are indexed. Sub collection
+listings (i.e. the rules of a policy or interfaces of an engine) are
+stored as the raw json list returned by the SMC for the collection href.
+Session information such as the API entry points are stored so that the
+mirror can be used without a connection to the SMC. Changes found when
+synchronizing are recorded in a change feed with an increasing sequence
+number.
+
+The store can be shared between threads; access is serialized.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS elements ('
+    'href TEXT PRIMARY KEY, type TEXT, name TEXT, etag TEXT, '
+    'json TEXT, updated REAL)',
+    'CREATE INDEX IF NOT EXISTS elements_type ON elements (type)',
+    'CREATE INDEX IF NOT EXISTS elements_name ON elements (name)',
+    'CREATE INDEX IF NOT EXISTS elements_etag ON elements (etag)',
+    'CREATE TABLE IF NOT EXISTS listings ('
+    'href TEXT PRIMARY KEY, json TEXT, updated REAL)',
+    'CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE IF NOT EXISTS changes ('
+    'seq INTEGER PRIMARY KEY AUTOINCREMENT, time REAL, action TEXT, '
+    'href TEXT, type TEXT, name TEXT)')
+
+
+def element_type(data):
+    """
+    Element type from the self link of element json
+
+    :param dict data: element json
+    :rtype: str or None
+    """
+    for link in data.get('link', []):
+        if link.get('rel') == 'self':
+            return link.get('type')
+
+
+class MirrorStore(object):
+    """
+    Element storage in a SQLite database.
+
+    :param str path: database path, default ':memory:'
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            for statement in _SCHEMA:
+                self._db.execute(statement)
+            self._db.commit()
+
+    def put(self, href, data, etag=None, typeof=None):
+        """
+        Add or replace an element.
+
+        :param str href: href of element
+        :param dict data: element json
+        :param str etag: ETag of element
+        :param str typeof: element type; taken from the self link if None
+        :return: None
+        """
+        self.put_many([(href, data, etag, typeof)])
+
+    def put_many(self, elements):
+        """
+        Add or replace elements in a single transaction.
+
+        :param elements: iterable of (href, json, etag, type) tuples
+        :return: None
+        """
+        now = time.time()
+        rows = [(href, typeof or element_type(data), data.get('name'), etag,
+                 json.dumps(data), now)
+                for href, data, etag, typeof in elements]
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO elements '
+                '(href, type, name, etag, json, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+
+    def get(self, href):
+        """
+        Get element by href
+
+        :return: (etag, json) or None if element is not in the mirror
+        :rtype: tuple
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT etag, json FROM elements WHERE href = ?',
+                (href,)).fetchone()
+        if row:
+            return row[0], json.loads(row[1])
+
+    def delete(self, *hrefs):
+        """
+        Delete elements by href. Listings stored under the href are
+        also removed.
+
+        :return: None
+        """
+        rows = [(href,) for href in hrefs]
+        with self._lock:
+            self._db.executemany('DELETE FROM elements WHERE href = ?', rows)
+            self._db.executemany('DELETE FROM listings WHERE href = ?', rows)
+            self._db.commit()
+
+    def etags(self, typeof):
+        """
+        Stored ETags by href for the element type.
+
+        :param str typeof: element type
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self._db.execute(
+                'SELECT href, etag FROM elements WHERE type = ?', (typeof,)))
+
+    def find(self, types=None, names=None, exact_match=True, limit=None,
+             offset=0):
+        """
+        Find element meta data by type and name. When exact_match is
+        False, names are a case insensitive substring match.
+
+        :param list types: element types, or None for all types
+        :param list names: names to match, or None for all names
+        :param bool exact_match: exact or substring name match
+        :param int limit: maximum number of results, or None for all
+        :param int offset: number of results to skip
+        :return: list of dict with href, name and type
+        """
+        clauses, args = [], []
+        if types:
+            clauses.append('type IN ({})'.format(','.join('?' * len(types))))
+            args.extend(types)
+        if names:
+            if exact_match:
+                clauses.append(
+                    'name IN ({})'.format(','.join('?' * len(names))))
+                args.extend(names)
+            else:
+                clauses.append('({})'.format(
+                    ' OR '.join(["name LIKE ? ESCAPE '\\'"] * len(names))))
+                args.extend('%{}%'.format(
+                    name.replace('\\', '\\\\').replace('%', '\\%')
+                    .replace('_', '\\_')) for name in names)
+        query = 'SELECT href, name, type FROM elements'
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY rowid'
+        if limit is not None or offset:
+            query += ' LIMIT ? OFFSET ?'
+            args.extend((-1 if limit is None else limit, offset))
+        with self._lock:
+            return [{'href': href, 'name': name, 'type': typeof}
+                    for href, name, typeof in self._db.execute(query, args)]
+
+    def elements(self, types=None):
+        """
+        All stored elements of the given types.
+
+        :param list types: element types, or None for all types
+        :return: list of (href, type, name, json)
+        """
+        query = 'SELECT href, type, name, json FROM elements'
+        args = []
+        if types:
+            query += ' WHERE type IN ({})'.format(','.join('?' * len(types)))
+            args.extend(types)
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        return [(href, typeof, name, json.loads(data))
+                for href, typeof, name, data in rows]
+
+    def put_listing(self, href, data):
+        """
+        Store the json list returned from a sub collection href.
+
+        :return: None
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO listings (href, json, updated) '
+                'VALUES (?, ?, ?)', (href, json.dumps(data), time.time()))
+            self._db.commit()
+
+    def get_listing(self, href):
+        """
+        :return: json list stored for href or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT json FROM listings WHERE href = ?',
+                (href,)).fetchone()
+        if row:
+            return json.loads(row[0])
+
+    def set_info(self, key, value):
+        """
+        Store a json serializable value by key
+
+        :return: None
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)',
+                (key, json.dumps(value)))
+            self._db.commit()
+
+    def get_info(self, key, default=None):
+        """
+        :return: value stored for key, or default
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value FROM info WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def add_changes(self, changes):
+        """
+        Append to the change feed.
+
+        :param changes: iterable of :py:class:`smc.mirror.sync.Change`
+        :return: None
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT INTO changes (time, action, href, type, name) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(now, change.action, change.href, change.type, change.name)
+                 for change in changes])
+            self._db.commit()
+
+    def changes(self, since=0):
+        """
+        Read the change feed after a sequence number.
+
+        :param int since: last sequence number seen by the caller
+        :return: list of (seq, time, action, href, type, name)
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT seq, time, action, href, type, name FROM changes '
+                'WHERE seq > ? ORDER BY seq', (since,)).fetchall()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM elements').fetchone()[0]
+
+    def close(self):
+        """
+        Close the database
+
+        :return: None
+        """
+        with self._lock:
+            self._db.close()
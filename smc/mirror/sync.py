@@ -0,0 +1,137 @@
+"""
+Incremental synchronization of a mirror with the SMC.
+
+After an initial :py:meth:`smc.mirror.mirror.Mirror.pull`, the mirror can be
+kept current without downloading every element again. For each element type,
+the element listing is retrieved by ``filter_context`` and compared to the
+mirror by href to find added and deleted elements. Elements that exist in
+both are revalidated with a conditional GET using the stored ETag; the SMC
+returns 304 (Not Modified) for unchanged elements so only changed elements
+are downloaded. Requests are sent in parallel with a bounded number of
+workers.
+
+Each change is yielded as a :class:`Change` and appended to the change feed
+of the mirror store::
+
+    from smc.mirror.mirror import Mirror
+    from smc.mirror.sync import MirrorSync
+
+    mirror = Mirror('/tmp/smc.db')
+    for change in MirrorSync(mirror.store, workers=16).run(['host', 'group']):
+        print(change.action, change.type, change.name)
+
+Consumers that poll the change feed can read changes after the last
+sequence number they processed::
+
+    for seq, when, action, href, typeof, name in mirror.store.changes(since=42):
+        ...
+
+.. note:: Only elements with an entry point are synchronized. Listings
+          stored by following links (i.e. policy rules) are refreshed by
+          pulling the parent element again.
+"""
+import logging
+from collections import namedtuple
+from smc.api.exceptions import FetchElementFailed
+from smc.base.model import prepared_request
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+#: Change found by synchronization. Action is one of 'added', 'modified'
+#: or 'deleted'.
+Change = namedtuple('Change', 'action href type name')
+
+
+class MirrorSync(object):
+    """
+    Synchronize a :py:class:`smc.mirror.store.MirrorStore` with the SMC.
+
+    :param MirrorStore store: mirror storage
+    :param int workers: maximum number of concurrent requests
+    :ivar dict failures: exception by href for elements that could not be
+        retrieved during the last run. These are left unchanged in the
+        mirror and retried on the next run.
+    """
+
+    def __init__(self, store, workers=DEFAULT_WORKERS):
+        self.store = store
+        self.workers = workers
+        self.failures = {}
+
+    def run(self, types):
+        """
+        Synchronize the element types and return the changes.
+
+        :param list types: element types by filter context, i.e. 'host'
+        :raises FetchElementFailed: failed to list an element type
+        :rtype: list(Change)
+        """
+        return list(self.changes(types))
+
+    def changes(self, types):
+        """
+        Generator synchronizing the element types. Changes are applied to
+        the store and yielded as they are found.
+
+        :param list types: element types by filter context, i.e. 'host'
+        :raises FetchElementFailed: failed to list an element type
+        :return: generator of :class:`Change`
+        """
+        self.failures = {}
+        for typeof in types:
+            for change in self._sync_type(typeof):
+                yield change
+
+    def _sync_type(self, typeof):
+        listing = prepared_request(
+            FetchElementFailed,
+            params={'filter_context': typeof}
+        ).read().json or []
+        remote = dict((meta.get('href'), meta) for meta in listing
+                      if meta.get('type', typeof) == typeof)
+        local = self.store.etags(typeof)
+
+        deleted = [href for href in local if href not in remote]
+        if deleted:
+            self.store.delete(*deleted)
+            changes = [Change('deleted', href, typeof, None)
+                       for href in deleted]
+            self.store.add_changes(changes)
+            for change in changes:
+                yield change
+
+        def revalidate(href):
+            etag = local.get(href)
+            if etag is None:
+                return prepared_request(FetchElementFailed, href=href).read()
+            return prepared_request(
+                FetchElementFailed,
+                href=href,
+                headers={'if-none-match': etag}
+            ).read()
+
+        batch, changes = [], []
+        for href, result, error in imap_unordered(
+                revalidate, list(remote), self.workers):
+            if error is not None:
+                logger.warning('Mirror sync failed for %s: %s', href, error)
+                self.failures[href] = error
+                continue
+            if result.code == 304 or not result.json:
+                continue
+            batch.append((href, result.json, result.etag, typeof))
+            changes.append(Change(
+                'modified' if href in local else 'added',
+                href, typeof, result.json.get('name')))
+            if len(batch) >= 500:
+                for change in self._flush(batch, changes):
+                    yield change
+                batch, changes = [], []
+        for change in self._flush(batch, changes):
+            yield change
+
+    def _flush(self, batch, changes):
+        self.store.put_many(batch)
+        self.store.add_changes(changes)
+        return changes
@@ -0,0 +1,226 @@
+"""
+NAT simulator computing the translation of flows by the IPv4 NAT rules of a
+firewall policy, for large batches of flows at once (i.e. to validate a
+migration against traffic logs). Like :py:mod:`smc.policy.simulator`, the
+NAT simulator requires NumPy.
+
+Compile the NAT rules of a policy and translate flows given as arrays of
+source address, destination address, IP protocol and destination port::
+
+    from smc.policy.layer3 import FirewallPolicy
+    from smc.policy.nat_simulator import NATSimulator
+
+    simulator = NATSimulator.compile(FirewallPolicy('Corporate'))
+    result = simulator.translate(src=['10.0.0.1', '192.168.1.5'],
+                                 dst=['8.8.8.8', '203.0.113.10'],
+                                 proto=[17, 6],
+                                 port=[53, 443])
+    result.row    # row of the matching NAT rule, -1 if none
+    result.src    # translated source addresses as integers
+    result.dst    # translated destination addresses as integers
+    result.port   # translated destination ports
+
+    simulator.translate_one('192.168.1.5', '203.0.113.10', 6, 443)
+
+The first matching NAT rule applies. A matching rule without NAT options
+leaves the flow unchanged (a NAT exclusion); flows without a matching rule
+are also unchanged. Disabled rules are skipped.
+
+Translations:
+
+================ ========================================================
+static_src_nat   the source address is mapped from the original value to
+                 the translated value, preserving the offset of the
+                 address in the original network or range
+dynamic_src_nat  the source address is replaced by the first address of
+                 the translated value. The source port assigned by the
+                 engine is not simulated.
+static_dst_nat   the destination address is mapped as for static source
+                 NAT; a destination port inside the original port range
+                 is mapped to the translated port range
+================ ========================================================
+
+If the translated network or range is smaller than the original, offsets
+beyond its size map to its last address. Original and translated values
+can be addresses, networks or ranges given directly, or network elements.
+"""
+from collections import namedtuple
+from smc.base.pool import DEFAULT_WORKERS
+from smc.index.ipindex import parse, format_address
+from smc.policy.simulator import PolicySimulator, resolve_elements, \
+    addresses, _require_numpy, np
+from smc.policy.table import RuleTable
+
+#: Translated flows. Each attribute is an array with one value per flow.
+Translation = namedtuple('Translation', 'row src dst port')
+
+#: No translation, static (offset) translation and dynamic translation
+#: of an address
+_NONE, _STATIC, _DYNAMIC = 0, 1, 2
+
+
+def _interval(value, values):
+    # IPv4 (start, end) of an original or translated value
+    if not value:
+        return None
+    if value.get('ip_descriptor'):
+        try:
+            version, start, end = parse(value['ip_descriptor'])
+        except ValueError:
+            return None
+        return (start, end) if version == 4 else None
+    for version, start, end in values.get(value.get('element'), ()):
+        if version == 4:
+            return start, end
+    return None
+
+
+def _port_range(value):
+    try:
+        return int(value['min_port']), int(value['max_port'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def nat_elements(table):
+    """
+    Hrefs of elements used as original or translated NAT values
+
+    :param RuleTable table: rules
+    :rtype: set
+    """
+    hrefs = set()
+    for nat in table.nat:
+        for option in (nat or {}).values():
+            values = [option.get('original_value'),
+                      option.get('translated_value')] + \
+                list(option.get('translation_values') or [])
+            for value in values:
+                if value and value.get('element'):
+                    hrefs.add(value['element'])
+    return hrefs
+
+
+class NATSimulator(PolicySimulator):
+    """
+    First match simulation of the IPv4 NAT rules of a policy. See
+    :py:mod:`smc.policy.nat_simulator`. Create with :meth:`compile`.
+
+    :param RuleTable table: rules of the policy
+    :param dict values: values of elements by href, see
+        :py:func:`smc.policy.simulator.resolve_elements`; must include
+        elements used in NAT options
+    :param set unresolved: hrefs of elements that could not be resolved
+    :param str section: rule section to simulate
+    :raises ImportError: NumPy is not installed
+    """
+
+    def __init__(self, table, values, unresolved=(),
+                 section='fw_ipv4_nat_rules'):
+        super(NATSimulator, self).__init__(
+            table, values, unresolved, section)
+        # One entry per table row and a last entry for flows without a
+        # match (row -1)
+        size = len(table) + 1
+        self._src_kind = np.zeros(size, dtype=np.int8)
+        self._dst_kind = np.zeros(size, dtype=np.int8)
+        self._src_map = np.zeros((3, size), dtype=np.int64)
+        self._dst_map = np.zeros((3, size), dtype=np.int64)
+        self._port_map = np.full((3, size), -1, dtype=np.int64)
+        for row in table.rows(section):
+            self._compile(row, table.nat[row] or {}, values)
+
+    def _terminal(self, row):
+        return not self.table.is_disabled[row]
+
+    def _compile(self, row, nat, values):
+        static = nat.get('static_src_nat')
+        if static:
+            original = _interval(static.get('original_value'), values)
+            translated = _interval(static.get('translated_value'), values)
+            if original and translated:
+                self._src_kind[row] = _STATIC
+                self._src_map[:, row] = (original[0],) + translated
+        dynamic = nat.get('dynamic_src_nat')
+        if dynamic:
+            for value in dynamic.get('translation_values') or []:
+                translated = _interval(value, values)
+                if translated:
+                    self._src_kind[row] = _DYNAMIC
+                    self._src_map[:, row] = (0,) + translated
+                    break
+        static = nat.get('static_dst_nat')
+        if static:
+            original = static.get('original_value') or {}
+            translated = static.get('translated_value') or {}
+            original_address = _interval(original, values)
+            translated_address = _interval(translated, values)
+            if original_address and translated_address:
+                self._dst_kind[row] = _STATIC
+                self._dst_map[:, row] = \
+                    (original_address[0],) + translated_address
+            original_ports = _port_range(original)
+            translated_ports = _port_range(translated)
+            if original_ports and translated_ports:
+                self._port_map[:, row] = \
+                    original_ports + translated_ports[:1]
+
+    @classmethod
+    def compile(cls, policy, workers=DEFAULT_WORKERS):
+        """
+        Load and compile the IPv4 NAT rules of a policy.
+
+        :param FirewallPolicy policy: policy to simulate
+        :param int workers: number of concurrent requests
+        :raises ImportError: NumPy is not installed
+        :rtype: NATSimulator
+        """
+        _require_numpy()
+        table = RuleTable.load(
+            policy, sections=['fw_ipv4_nat_rules'], workers=workers)
+        values, unresolved = resolve_elements(
+            set(table.hrefs[1:]) | nat_elements(table), workers)
+        return cls(table, values, unresolved)
+
+    @staticmethod
+    def _map(value, kind, mapping):
+        original, first, last = mapping
+        offset = np.clip(value - original, 0, last - first)
+        offset = np.where(kind == _DYNAMIC, 0, offset)
+        return np.where(kind == _NONE, value, first + offset)
+
+    def translate(self, src, dst, proto, port):
+        """
+        Translate flows.
+
+        :param src: source addresses, as text or integers
+        :param dst: destination addresses, as text or integers
+        :param proto: IP protocol numbers
+        :param port: destination ports, or ICMP types
+        :return: matching rule rows and translated values
+        :rtype: Translation
+        """
+        src, dst = addresses(src), addresses(dst)
+        port = np.asarray(port, dtype=np.int64)
+        rows = self.match(src, dst, proto, port)
+        src = self._map(src, self._src_kind[rows], self._src_map[:, rows])
+        dst = self._map(dst, self._dst_kind[rows], self._dst_map[:, rows])
+        first, last, translated = self._port_map[:, rows]
+        mapped = (first >= 0) & (port >= first) & (port <= last)
+        port = np.where(mapped, translated + port - first, port)
+        return Translation(rows, src, dst, port)
+
+    def translate_one(self, src, dst, proto, port):
+        """
+        Translate a single flow.
+
+        :return: (row, source, destination, port) with addresses as text;
+            row is None if no NAT rule matches
+        :rtype: tuple
+        """
+        result = self.translate([src], [dst], [proto], [port])
+        row = int(result.row[0])
+        return (row if row >= 0 else None,
+                format_address(4, int(result.src[0])),
+                format_address(4, int(result.dst[0])),
+                int(result.port[0]))
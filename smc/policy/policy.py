@@ -19,11 +19,34 @@ overidden.
           also optional on earlier versions but if longer running operations are 
           needed, calling open() will lock the policy from test_external modifications
           until save() is called.
+
+Flattening a policy merges the rules inherited from its template (and the
+template's own template) with the rules of the policy, giving the rules of
+each rule section in the order the engine evaluates them::
+
+    policy = FirewallPolicy('Corporate')
+    for section, rules in policy.flatten().items():
+        for rule in rules:
+            print(section, rule.origin, rule.data.get('name'))
+
+The rules of a template are retrieved once and kept in
+:data:`template_cache`, so flattening many policies based on the same
+template only retrieves the template the first time. Call
+:meth:`TemplateCache.clear` after changing a template.
 """
+import threading
+from collections import namedtuple, OrderedDict
 from smc.api.exceptions import TaskRunFailed, PolicyCommandFailed,\
-    ResourceNotFound
+    ResourceNotFound, FetchElementFailed
 from smc.administration.tasks import task_handler, Task
 from smc.base.model import Element, prepared_request, lookup_class
+from smc.base.pool import imap, DEFAULT_WORKERS
+from smc.policy.table import rule_sections
+
+#: Rule of a flattened policy. Origin is the href of the policy or template
+#: defining the rule; data is the rule json and must not be modified, as
+#: rules of templates are shared between policies.
+EffectiveRule = namedtuple('EffectiveRule', 'origin href data')
 
 
 class Policy(Element):
@@ -153,6 +176,28 @@ class Policy(Element):
         """
         return Element.from_href(self.data.get('template'))
 
+    def flatten(self, insert_points=False, workers=DEFAULT_WORKERS):
+        """
+        Rules of each rule section in effective order, with the rules of
+        the policy in place of the insert point of its template. Rules of
+        templates are taken from :data:`template_cache`; rules of the
+        policy are retrieved concurrently.
+
+        :param bool insert_points: keep insert points that are not filled
+            by the policy
+        :param int workers: number of concurrent requests
+        :raises FetchElementFailed: failed to retrieve a rule
+        :return: list of :py:data:`EffectiveRule` by section name
+        :rtype: OrderedDict
+        """
+        sections = _flatten(self, workers)
+        if insert_points:
+            return sections
+        return OrderedDict(
+            (section, [rule for rule in rules
+                       if not is_insert_point(rule.data)])
+            for section, rules in sections.items())
+
     @property
     def inspection_policy(self):
         """
@@ -182,3 +227,108 @@ class InspectionPolicy(Policy):
     def export(self): pass  # Not valid for inspection policy
 
     def upload(self): pass  # Not valid for inspection policy
+
+
+def is_insert_point(data):
+    """
+    Whether rule json is a template insert point, the position where the
+    rules of policies based on the template are inserted.
+
+    :param dict data: rule json
+    :rtype: bool
+    """
+    return bool(data.get('insert_point')) or \
+        (data.get('type') or '').endswith('insert_point')
+
+
+def _read(href):
+    return prepared_request(FetchElementFailed, href=href).read().json
+
+
+def _rules(policy, workers):
+    # Rules of each rule section of a policy, without inherited rules
+    sections = rule_sections(policy)
+    listings = list(imap(
+        _read, [href for _, href in sections], workers))
+    hrefs = [[entry.get('href') for entry in listing or []]
+             for listing in listings]
+    rules = iter(imap(_read, [href for section in hrefs
+                              for href in section], workers))
+    return OrderedDict(
+        (section, [EffectiveRule(policy.href, href, next(rules) or {})
+                   for href in section_hrefs])
+        for (section, _), section_hrefs in zip(sections, hrefs))
+
+
+def _flatten(policy, workers):
+    sections = _rules(policy, workers)
+    template = policy.data.get('template')
+    if not template:
+        return sections
+    inherited = template_cache.get(template, workers)
+    merged = OrderedDict()
+    for section, rules in inherited.items():
+        own = sections.get(section, [])
+        for index, rule in enumerate(rules):
+            if is_insert_point(rule.data):
+                merged[section] = rules[:index] + own + rules[index + 1:]
+                break
+        else:
+            merged[section] = rules + own
+    for section, rules in sections.items():
+        if section not in merged:
+            merged[section] = rules
+    return merged
+
+
+class TemplateCache(object):
+    """
+    Flattened rules of template policies by href, shared by all policies
+    of the process. Each template is retrieved once, on first use; threads
+    flattening policies with the same template concurrently wait for the
+    first retrieval rather than repeat it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # href -> [lock, rules by section]
+
+    def get(self, href, workers=DEFAULT_WORKERS):
+        """
+        Flattened rules of a template, including insert points.
+
+        :param str href: href of template policy
+        :param int workers: number of concurrent requests
+        :raises FetchElementFailed: failed to retrieve a rule
+        :return: list of :py:data:`EffectiveRule` by section name
+        :rtype: OrderedDict
+        """
+        with self._lock:
+            entry = self._entries.setdefault(href, [threading.Lock(), None])
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = _flatten(Element.from_href(href), workers)
+        return entry[1]
+
+    def discard(self, href):
+        """
+        Remove a template from the cache, i.e. after changing its rules.
+
+        :param str href: href of template policy
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(href, None)
+
+    def clear(self):
+        """
+        Remove all templates from the cache.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+#: Template rules shared by all policies, see :py:class:`TemplateCache`
+template_cache = TemplateCache()
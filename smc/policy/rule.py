@@ -70,7 +70,8 @@ Examples of rule operations::
     IPv4Rule(name=discard at bottom) discard at bottom discard
 
 """
-from smc.base.model import Element, SubElement, prepared_request
+from smc.base.model import Element, SubElement, Meta, prepared_request
+from smc.actions.search import NameResolver, NOT_FOUND, AMBIGUOUS, ERROR
 from smc.elements.other import LogicalInterface
 from smc.vpn.policy import VPNPolicy
 from smc.api.exceptions import ElementNotFound, MissingRequiredInput,\
@@ -88,6 +89,8 @@ class Rule(object):
         for rule in policy.fw_ipv4_nat_rules.all():
             print(rule.name, rule.comment, rule.is_disabled)       
     """
+    __slots__ = ()
+
     @property
     def name(self):
         """
@@ -222,6 +225,82 @@ class Rule(object):
         """
         return self.data.get('tag')
 
+    def import_rules(self, rules, add_pos=1, resolver=None):
+        """
+        Create an ordered batch of rules in this rule collection. Each
+        rule is a dict of keyword arguments for ``create`` of the rule
+        type. Rules are inserted as a block starting at ``add_pos``, in
+        the order provided, unless a rule specifies its own ``add_pos``,
+        or ``after`` or ``before`` with a rule tag as for ``create``;
+        following rules are then inserted after it. Use from the rule
+        collection of a policy::
+
+            policy = FirewallPolicy('migrated')
+            policy.fw_ipv4_access_rules.import_rules([
+                {'name': 'web', 'sources': 'any', 'services': 'any',
+                 'destinations': [Host('web-1'), Host('web-2')]},
+                {'name': 'deny', 'sources': 'any', 'destinations': 'any',
+                 'services': 'any', 'action': 'discard'}],
+                add_pos=10)
+
+        The rule list of the policy is retrieved once and kept in a
+        local position index that is updated after each insert. Elements
+        used in sources, destinations and services that have not been
+        located yet (i.e. Host('web-1')) are resolved concurrently in one
+        pass before the first rule is created; elements that cannot be
+        found are skipped as with ``create``. The rule list is retrieved
+        again after a rule is created with ``after`` or ``before`` to find
+        the position of the new rule.
+
+        :param list rules: rule definitions as dict
+        :param int add_pos: position of the first rule, starting with 1.
+            Rules are added at the bottom if greater than the number of
+            rules.
+        :param NameResolver resolver: resolver to reuse between imports
+        :raises ValueError: a rule specifies ``after`` or ``before`` and
+            ``create`` of the rule type does not support them (i.e. layer 2
+            and NAT rules); no rules are created
+        :raises FetchElementFailed: an element used by the rules could not
+            be located because of a lookup failure; no rules are created
+        :raises CreateRuleFailed: rule creation failure. Rules created
+            before the failure are not removed.
+        :return: href of new rules, in the order provided
+        :rtype: list(str)
+        """
+        rules = [dict(rule) for rule in rules]
+        create = self.create.__code__
+        if 'after' not in create.co_varnames[:create.co_argcount]:
+            for rule in rules:
+                if rule.get('after') is not None or \
+                        rule.get('before') is not None:
+                    raise ValueError(
+                        'Rule {} uses after or before, which {} rules do '
+                        'not support; use add_pos'.format(
+                            rule.get('name'), self.typeof))
+        _resolve_rule_elements(rules, resolver)
+        positions = RulePositions(self.href)
+        position = add_pos
+        created = []
+        for rule in rules:
+            pos = rule.pop('add_pos', None)
+            after, before = rule.pop('after', None), rule.pop('before', None)
+            if pos is None and (after is not None or before is not None):
+                # Placed by the SMC relative to the tagged rule
+                href = self.__class__(href=self.href).create(
+                    after=after, before=before, **rule)
+                positions.reload()
+                position = positions.position(href)
+                created.append(href)
+            else:
+                if pos is not None:
+                    position = pos
+                href, position = positions.link(position)
+                created.append(positions.insert(
+                    position,
+                    self.__class__(href=href).create(**rule)))
+            position += 1
+        return created
+
     #@property
     # def time_range(self):
     #    """
@@ -290,13 +369,15 @@ class IPv4Rule(Rule, SubElement):
         sources='any'
     """
     typeof = 'fw_ipv4_access_rule'
+    __slots__ = ()
+
+    actions = ('allow', 'discard', 'continue',
+               'refuse', 'jump', 'apply_vpn',
+               'enforce_vpn', 'forward_vpn',
+               'blacklist')
 
     def __init__(self, **meta):
         super(IPv4Rule, self).__init__(**meta)
-        self.actions = ['allow', 'discard', 'continue',
-                        'refuse', 'jump', 'apply_vpn',
-                        'enforce_vpn', 'forward_vpn',
-                        'blacklist']
 
     def create(self, name, sources=None, destinations=None,
                services=None, action='allow', log_options=None,
@@ -401,11 +482,13 @@ class IPv4Layer2Rule(Rule, SubElement):
                                                services='any')
     """
     typeof = 'layer2_ipv4_access_rule'
+    __slots__ = ()
+
+    actions = ('allow', 'continue', 'discard',
+               'refuse', 'jump', 'blacklist')
 
     def __init__(self, **meta):
         super(IPv4Layer2Rule, self).__init__(**meta)
-        self.actions = ['allow', 'continue', 'discard',
-                        'refuse', 'jump', 'blacklist']
 
     def create(self, name, sources=None, destinations=None,
                services=None, action='allow', is_disabled=False,
@@ -476,10 +559,12 @@ class EthernetRule(Rule, SubElement):
                                             action='discard')
     """
     typeof = 'ethernet_rule'
+    __slots__ = ()
+
+    actions = ('allow', 'discard')
 
     def __init__(self, **meta):
         super(EthernetRule, self).__init__(**meta)
-        self.actions = ['allow', 'discard']
 
     def create(self, name, sources=None, destinations=None,
                services=None, action='allow', is_disabled=False,
@@ -544,6 +629,7 @@ class IPv6Rule(IPv4Rule):
               attempting to push policy.
     """
     typeof = 'fw_ipv6_access_rule'
+    __slots__ = ()
 
     def __init__(self, **meta):
         super(IPv6Rule, self).__init__(**meta)
@@ -571,6 +657,128 @@ def _add_position(pos, rules_href):
     return rules_href
 
 
+class RulePositions(object):
+    """
+    Local index of rule positions in a rule collection. The rule list is
+    retrieved once; the add_before and add_after links of a rule are
+    retrieved when the rule is first used as an insert position. Call
+    :meth:`insert` after a rule is created to keep the index current.
+
+    :param str rules_href: href of the rule collection
+    """
+
+    def __init__(self, rules_href):
+        self.rules_href = rules_href
+        self._links = {}  # rule href -> {rel: href}
+        self.reload()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def reload(self):
+        """
+        Retrieve the rule list again, i.e. after a rule was created at a
+        position chosen by the SMC.
+
+        :return: None
+        """
+        self.rules = [entry.get('href') for entry in prepared_request(
+            FetchElementFailed, href=self.rules_href).read().json or []]
+
+    def position(self, href):
+        """
+        Position of a rule, starting with 1. Rules that are not in the
+        index are at the bottom.
+
+        :param str href: href of rule
+        :rtype: int
+        """
+        try:
+            return self.rules.index(href) + 1
+        except ValueError:
+            return len(self.rules) + 1
+
+    def _link(self, rule, rel):
+        links = self._links.get(rule)
+        if links is None:
+            data = prepared_request(
+                FetchElementFailed, href=rule).read().json or {}
+            links = self._links[rule] = dict(
+                (link.get('rel'), link.get('href'))
+                for link in data.get('link', []))
+        return links.get(rel)
+
+    def link(self, pos):
+        """
+        Href to create a rule at a position, starting with 1. Positions
+        greater than the number of rules add the rule at the bottom.
+
+        :return: href and the position the rule will have
+        :rtype: tuple(str, int)
+        """
+        pos = max(1, pos)
+        if not self.rules:
+            return self.rules_href, 1
+        if pos <= len(self.rules):
+            return self._link(self.rules[pos - 1], 'add_before'), pos
+        return self._link(self.rules[-1], 'add_after'), len(self.rules) + 1
+
+    def insert(self, pos, href):
+        """
+        Record a rule created at a position.
+
+        :param int pos: position returned by :meth:`link`
+        :param str href: href of the new rule
+        :return: href
+        """
+        self.rules.insert(pos - 1, href)
+        return href
+
+
+def _resolve_rule_elements(rules, resolver=None):
+    """
+    Locate the elements used in rule definitions that do not have an
+    href yet, using one concurrent name lookup per element type.
+    Elements that are not found are removed from the definition.
+
+    :raises FetchElementFailed: lookup of an element failed
+    """
+    unresolved = {}  # typeof -> list of elements
+    for rule in rules:
+        for field in ('sources', 'destinations', 'services'):
+            for element in rule.get(field) or []:
+                if isinstance(element, Element) and not element.meta and \
+                        getattr(element, 'typeof', None):
+                    unresolved.setdefault(element.typeof, []).append(element)
+    if not unresolved:
+        return
+    resolver = resolver or NameResolver()
+    missing = set()
+    for typeof, elements in unresolved.items():
+        found = resolver.resolve([element.name for element in elements],
+                                 typeof)
+        for element in elements:
+            href = found.get(element.name)
+            if href is ERROR:
+                raise FetchElementFailed(
+                    'Failed to locate {} {}: {}'.format(
+                        typeof, element.name,
+                        resolver.error(element.name, typeof)))
+            if href is AMBIGUOUS:  # First match, as when located by name
+                href = resolver.candidates(element.name, typeof)[0]
+            if href is NOT_FOUND:
+                missing.add(id(element))
+            else:
+                element.meta = Meta(name=element.name, href=href,
+                                    type=element.typeof)
+    if missing:
+        for rule in rules:
+            for field in ('sources', 'destinations', 'services'):
+                if isinstance(rule.get(field), list):
+                    rule[field] = [element for element in rule[field]
+                                   if id(element) not in missing]
+
+
 def _rule_l2_common(logical_interfaces):
     """
     Common values for layer 2 ethernet / IPS rule parameters.
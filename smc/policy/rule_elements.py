@@ -1,6 +1,143 @@
+import threading
+from collections import OrderedDict
 from smc.base.model import Element, ElementCreator
 from smc.api.exceptions import ElementNotFound
 from smc.base.util import element_resolver
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+
+
+_local = threading.local()
+
+
+def current_cache():
+    """
+    Return the element cache of the walk active in this thread, or None.
+
+    :rtype: ElementCache
+    """
+    caches = getattr(_local, 'caches', None)
+    return caches[-1] if caches else None
+
+
+class ElementCache(object):
+    """
+    Bounded cache of elements by href for one walk over rules. Rules of a
+    policy typically use the same elements many times; resolving the
+    sources, destinations and services of rules through the cache
+    retrieves each element once per walk. When full, the least recently
+    used element is dropped.
+
+    Use the cache as a context manager; :py:meth:`RuleElement.all` resolves
+    elements through it within the block. Prefetch the elements of many
+    rules concurrently before walking them::
+
+        rules = list(policy.fw_ipv4_access_rules.all())
+        with ElementCache() as cache:
+            cache.prefetch_rules(rules)
+            for rule in rules:
+                for source in rule.sources.all():  # from cache
+                    ...
+
+    A cache can also be passed to :py:meth:`RuleElement.all` directly.
+    Elements are shared by every lookup of the same href in the walk; start
+    a new walk to see elements modified since.
+
+    :param int maxsize: maximum number of elements kept
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._elements = OrderedDict()
+
+    def __enter__(self):
+        if getattr(_local, 'caches', None) is None:
+            _local.caches = []
+        _local.caches.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _local.caches.remove(self)
+        return False
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __contains__(self, href):
+        return href in self._elements
+
+    def _add(self, href, element):
+        with self._lock:
+            self._elements.pop(href, None)
+            self._elements[href] = element
+            while len(self._elements) > self.maxsize:
+                self._elements.popitem(last=False)
+
+    def get(self, href):
+        """
+        Element for an href, retrieved if not cached
+
+        :param str href: href of element
+        :return: element, or None if the element was not found
+        :rtype: Element
+        """
+        with self._lock:
+            element = self._elements.pop(href, None)
+            if element is not None:
+                self._elements[href] = element  # Most recently used
+                return element
+        element = Element.from_href(href)
+        if element is not None:
+            self._add(href, element)
+        return element
+
+    def prefetch(self, hrefs, workers=DEFAULT_WORKERS):
+        """
+        Retrieve elements that are not cached, concurrently. Each distinct
+        href is retrieved once. Only the last ``maxsize`` elements are
+        kept if more are retrieved.
+
+        :param hrefs: hrefs of elements
+        :param int workers: number of concurrent requests
+        :return: number of elements retrieved
+        :rtype: int
+        """
+        missing = [href for href in OrderedDict.fromkeys(hrefs)
+                   if href and href not in self._elements]
+        count = 0
+        for href, element, error in imap_unordered(
+                Element.from_href, missing, workers):
+            if error is None and element is not None:
+                self._add(href, element)
+                count += 1
+        return count
+
+    def prefetch_rules(self, rules, workers=DEFAULT_WORKERS):
+        """
+        Prefetch the elements used in the sources, destinations and
+        services of rules.
+
+        :param list rules: rules, i.e. from ``policy.fw_ipv4_access_rules``
+        :param int workers: number of concurrent requests
+        :return: number of elements retrieved
+        :rtype: int
+        """
+        hrefs = []
+        for rule in rules:
+            for name in ('sources', 'destinations', 'services'):
+                field = getattr(rule, name, None)
+                if field is not None:
+                    hrefs.extend(field.data.get(field.typeof) or [])
+        return self.prefetch(hrefs, workers)
+
+    def clear(self):
+        """
+        Remove all elements from the cache.
+
+        :return: None
+        """
+        with self._lock:
+            self._elements.clear()
 
 
 class RuleElement(object):
@@ -109,7 +246,7 @@ class RuleElement(object):
         if not self.is_any and not self.is_none:
             return [element for element in self.data[self.typeof]]
 
-    def all(self):
+    def all(self, cache=None):
         """
         Return all destinations for this rule. Elements returned
         are of the object type for the given element for further
@@ -120,11 +257,22 @@ class RuleElement(object):
             for sources in rule.sources.all():
                 print('My source: %s' % sources)
 
+        Elements are resolved through the element cache of the current
+        walk (see :py:class:`ElementCache`), so elements used in many rules
+        are only retrieved once. Without a walk, each href is retrieved once
+        per call.
+
+        :param ElementCache cache: cache to resolve elements through; default
+            the cache of the current walk
         :return: elements by resolved object type
         :rtype: list(Element)
         """
         if not self.is_any and not self.is_none:
-            return [Element.from_href(href)
+            if cache is None:
+                cache = current_cache()
+            if cache is None:
+                cache = ElementCache()
+            return [cache.get(href)
                     for href in self.data[self.typeof]]
         return []
 
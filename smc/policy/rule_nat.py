@@ -7,6 +7,8 @@ from smc.base.util import element_resolver
 
 
 class NATRule(Rule):
+    __slots__ = ()
+
     @property
     def used_on(self):
         """
@@ -445,6 +447,7 @@ class IPv4NATRule(NATRule, SubElement):
 
     """
     typeof = 'fw_ipv4_nat_rule'
+    __slots__ = ()
 
     def __init__(self, **meta):
         super(IPv4NATRule, self).__init__(**meta)
@@ -532,6 +535,7 @@ class IPv6NATRule(IPv4NATRule):
     being deployed to an engine and the rule will be ignored.
     """
     typeof = 'fw_ipv6_nat_rule'
+    __slots__ = ()
 
     def __init__(self, **meta):
         super(IPv6NATRule, self).__init__(**meta)
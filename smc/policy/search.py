@@ -0,0 +1,161 @@
+"""
+Search rules across policies concurrently.
+
+:py:meth:`smc.policy.policy.Policy.search_rule` searches a single policy.
+:class:`PolicySearch` runs the search on many policies in parallel (all
+firewall, layer 2 and IPS policies by default) and yields each matching
+rule once, as results arrive::
+
+    from smc.policy.search import PolicySearch
+
+    search = PolicySearch(workers=16)
+    for match in search.search_rule('@2097174.0', 'allow-dns'):
+        print(match.policy.name, match.rule.name)
+
+Find the rules using an element in any policy, including rules using a
+group that contains the element::
+
+    from smc.elements.network import Host
+
+    for match in search.references(Host('web-1')):
+        print(match.policy.name, match.rule.name)
+
+Policies that fail to be searched are logged and recorded in
+:attr:`PolicySearch.failures`; the other results are still returned.
+"""
+import logging
+from collections import namedtuple
+from smc.api.exceptions import FetchElementFailed
+from smc.api.common import fetch_entry_point
+from smc.base.model import prepared_request, lookup_class
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+from smc.policy.layer3 import FirewallPolicy
+from smc.policy.layer2 import Layer2Policy
+from smc.policy.ips import IPSPolicy
+
+logger = logging.getLogger(__name__)
+
+#: Policy classes searched by default
+POLICY_CLASSES = (FirewallPolicy, Layer2Policy, IPSPolicy)
+
+#: Group types followed when searching references
+GROUP_TYPES = ('group', 'service_group', 'tcp_service_group',
+               'udp_service_group', 'ip_service_group', 'icmp_service_group')
+
+#: Rule found by a search and the policy containing it
+RuleMatch = namedtuple('RuleMatch', 'policy rule')
+
+#: Rule types returned by search_rule that map to another class
+_RULE_CLASSES = {
+    'ips_ethernet_rule': 'ethernet_rule',
+    'ips_ipv4_access_rule': 'layer2_ipv4_access_rule'}
+
+
+def _rule(meta):
+    typeof = meta.get('type')
+    return lookup_class(_RULE_CLASSES.get(typeof, typeof))(**meta)
+
+
+def _is_rule(meta):
+    return (meta.get('type') or '').endswith(('_rule', '_rule_section'))
+
+
+def _references(href):
+    return prepared_request(
+        FetchElementFailed,
+        href=fetch_entry_point('references_by_element'),
+        json={'value': href}
+    ).create().json or []
+
+
+class PolicySearch(object):
+    """
+    Rule search over many policies. See :py:mod:`smc.policy.search`.
+
+    :param list policies: policies to search; default all policies of
+        :data:`POLICY_CLASSES`
+    :param int workers: maximum number of concurrent requests
+    :ivar dict failures: exception by policy (or element href for
+        reference searches) for searches that failed during the last run
+    """
+
+    def __init__(self, policies=None, workers=DEFAULT_WORKERS):
+        self._policies = policies
+        self.workers = workers
+        self.failures = {}
+
+    @property
+    def policies(self):
+        """
+        Policies searched
+
+        :rtype: list(Policy)
+        """
+        if self._policies is None:
+            self._policies = [policy for clazz in POLICY_CLASSES
+                              for policy in clazz.objects.all()]
+        return self._policies
+
+    def search_rule(self, *search):
+        """
+        Search every policy for rules by tag or name. Each term is searched
+        separately in each policy.
+
+        :param str search: search strings
+        :return: generator of :py:data:`RuleMatch` in the order results
+            arrive; each rule is returned once
+        """
+        self.failures = {}
+        seen = set()
+        queries = [(policy, term) for policy in self.policies
+                   for term in search]
+        for (policy, term), rules, error in imap_unordered(
+                lambda query: query[0].search_rule(query[1]),
+                queries, self.workers):
+            if error is not None:
+                logger.warning('Rule search for %r failed in %s: %s',
+                               term, policy.name, error)
+                self.failures[policy] = error
+                continue
+            for rule in rules:
+                if rule.href not in seen:
+                    seen.add(rule.href)
+                    yield RuleMatch(policy, rule)
+
+    def references(self, element, groups=True):
+        """
+        Rules of the searched policies that use an element.
+
+        :param element: element or href
+        :param bool groups: also return rules using groups that contain the
+            element, including nested groups. Groups are searched
+            concurrently.
+        :return: generator of :py:data:`RuleMatch` in the order results
+            arrive; each rule is returned once
+        """
+        self.failures = {}
+        policies = dict((policy.href, policy) for policy in self.policies)
+        seen, searched = set(), set()
+        level = [getattr(element, 'href', element)]
+        while level:
+            searched.update(level)
+            next_level = []
+            for href, references, error in imap_unordered(
+                    _references, level, self.workers):
+                if error is not None:
+                    logger.warning('Reference search failed for %s: %s',
+                                   href, error)
+                    self.failures[href] = error
+                    continue
+                for meta in references:
+                    reference = meta.get('href')
+                    if _is_rule(meta):
+                        policy = policies.get(reference.rsplit('/', 2)[0])
+                        if policy is not None and reference not in seen:
+                            seen.add(reference)
+                            yield RuleMatch(policy, _rule(meta))
+                    elif groups and meta.get('type') in GROUP_TYPES and \
+                            reference not in searched:
+                        searched.add(reference)
+                        next_level.append(reference)
+            level = next_level
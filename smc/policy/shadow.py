@@ -0,0 +1,357 @@
+"""
+Detect access rules that can never match or that conflict with other rules.
+
+Rules are evaluated in order and the first matching rule wins. The
+analysis resolves the sources, destinations and services of each rule to
+sets of address and port intervals and compares each rule with the rules
+before it:
+
+============ =============================================================
+shadowed     every flow matching the rule is matched by earlier rules,
+             and at least one of them has a different action. The rule
+             never matches and removing it would not change the policy,
+             but its action suggests it was meant to.
+redundant    every flow matching the rule is matched by earlier rules with
+             the same action. The rule can be removed.
+correlated   the rule overlaps an earlier rule with a different action
+             without either containing the other; the order of the two
+             rules decides the action for the common flows.
+============ =============================================================
+
+Run the analysis on a policy::
+
+    from smc.policy.layer3 import FirewallPolicy
+    from smc.policy.shadow import analyze_policy
+
+    for finding in analyze_policy(FirewallPolicy('Corporate')):
+        print(finding.kind, finding.rule.name,
+              [rule.name for rule in finding.covering])
+
+A rule is found shadowed or redundant when a single earlier rule contains
+it, or when earlier rules that contain it in two dimensions together cover
+it in the third (i.e. two rules for the same destination and service with
+source networks 10.0.0.0/9 and 10.128.0.0/9 cover a rule for 10.0.0.0/8).
+Coverage that needs several rules differing in more than one dimension is
+not detected.
+
+Rules using elements that cannot be resolved (see
+:py:func:`smc.policy.simulator.resolve_elements`) are only used to cover
+other rules, never reported, since the unresolved elements may match more
+flows. Disabled rules, rule sections and 'continue' and 'jump' rules are
+ignored.
+
+Earlier rules are found by indexing the sources, destinations and
+services of all rules separately. Each index returns the rules that may
+overlap a value as a bitset of rule positions; the bitsets of the three
+dimensions are intersected, so each rule is only compared with the rules
+that may overlap it in every dimension. Rules overlapping everything in one dimension (i.e.
+rules with any source) do not make the comparisons grow with the square of
+the number of rules. The comparison stops at the first earlier rule that
+contains the rule.
+"""
+import bisect
+from collections import namedtuple
+from smc.base.pool import DEFAULT_WORKERS
+from smc.policy.simulator import NON_TERMINAL, resolve_elements, \
+    rule_addresses, rule_services
+from smc.policy.table import RuleTable, rule_sections
+
+#: Rule row and its values in a :py:class:`RuleTable` as used in findings
+RuleRef = namedtuple('RuleRef', 'row href name tag action')
+
+#: Result of the analysis. Kind is 'shadowed', 'redundant' or 'correlated';
+#: covering holds the earlier rules involved
+Finding = namedtuple('Finding', 'kind rule covering')
+
+
+def merge(intervals):
+    """
+    Sort intervals and merge overlapping or adjacent intervals.
+
+    :param list intervals: (start, end)
+    :rtype: list
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def covers(outer, inner):
+    """
+    Whether merged intervals contain every interval of inner.
+
+    :param list outer: merged (start, end)
+    :param list inner: (start, end)
+    :rtype: bool
+    """
+    starts = [start for start, _ in outer]
+    for start, end in inner:
+        index = bisect.bisect_right(starts, start) - 1
+        if index < 0 or outer[index][1] < end:
+            return False
+    return True
+
+
+def overlaps(first, second):
+    """
+    Whether two merged interval lists share any value.
+
+    :rtype: bool
+    """
+    i = j = 0
+    while i < len(first) and j < len(second):
+        if first[i][1] < second[j][0]:
+            i += 1
+        elif second[j][1] < first[i][0]:
+            j += 1
+        else:
+            return True
+    return False
+
+
+class _Rule(object):
+    __slots__ = ('row', 'order', 'action', 'fields', 'complete')
+
+    def __init__(self, row, order, action, fields, complete):
+        self.row = row
+        self.order = order
+        self.action = action
+        self.fields = fields  # (sources, destinations, services), merged
+        self.complete = complete
+
+
+def _positions(bits):
+    # Positions of the set bits, ascending
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class _Dimension(object):
+    """
+    Rules by the intervals of one dimension. Overlapping rules are
+    returned as a bitset of rule positions: an interval overlaps a query
+    when it starts before the query end and ends after the query start.
+    The rules of the intervals sorted by start and by end are combined
+    into prefix and suffix bitsets every :attr:`STEP` intervals.
+
+    A rule with several intervals is also returned when one interval
+    starts before the query end and another ends after the query start,
+    so the result may include rules that do not overlap the query.
+    """
+    STEP = 32
+
+    def __init__(self, rules, dimension):
+        intervals = {}
+        for rule in rules:
+            bit = 1 << rule.order
+            for interval in rule.fields[dimension]:
+                intervals[interval] = intervals.get(interval, 0) | bit
+        by_start = sorted(intervals.items(), key=lambda item: item[0][0])
+        by_end = sorted(intervals.items(), key=lambda item: item[0][1])
+        self.starts = [interval[0] for interval, _ in by_start]
+        self.start_bits = [bits for _, bits in by_start]
+        self.ends = [interval[1] for interval, _ in by_end]
+        self.end_bits = [bits for _, bits in by_end]
+        # prefix[j]: rules of the first j * STEP intervals by start
+        # suffix[j]: rules of the intervals by end from j * STEP
+        self.prefix, bits = [0], 0
+        for index, value in enumerate(self.start_bits, 1):
+            bits |= value
+            if not index % self.STEP:
+                self.prefix.append(bits)
+        self.suffix, bits = [0], 0
+        for index in range(len(self.end_bits) - 1, -1, -1):
+            bits |= self.end_bits[index]
+            if not index % self.STEP:
+                self.suffix.append(bits)
+        self.suffix.reverse()
+        self.all = self.suffix[0]
+
+    def _starting_before(self, end):
+        count = bisect.bisect_right(self.starts, end)
+        if count == len(self.starts):
+            return self.all
+        step = count // self.STEP
+        bits = self.prefix[step]
+        for value in self.start_bits[step * self.STEP:count]:
+            bits |= value
+        return bits
+
+    def _ending_after(self, start):
+        index = bisect.bisect_left(self.ends, start)
+        if not index:
+            return self.all
+        step = -(-index // self.STEP)
+        bits = self.suffix[step]
+        for value in self.end_bits[index:step * self.STEP]:
+            bits |= value
+        return bits
+
+    def overlapping(self, intervals):
+        """
+        Rules overlapping any of the intervals.
+
+        :param list intervals: (start, end)
+        :return: bitset of rule positions, including the rules that
+            overlap the intervals
+        :rtype: int
+        """
+        bits = 0
+        for start, end in intervals:
+            bits |= self._starting_before(end) & self._ending_after(start)
+        return bits
+
+
+class ShadowAnalyzer(object):
+    """
+    Shadowed, redundant and correlated rule detection over a rule table.
+    See :py:mod:`smc.policy.shadow`.
+
+    :param RuleTable table: rules
+    :param dict values: element values by href, see
+        :py:func:`smc.policy.simulator.resolve_elements`
+    :param set unresolved: hrefs of elements that were not resolved
+    """
+
+    def __init__(self, table, values, unresolved=()):
+        self.table = table
+        self.values = values
+        self.unresolved = set(unresolved)
+
+    def _rules(self, section):
+        table = self.table
+        version = 6 if 'ipv6' in section else 4
+        rules = []
+        for row in table.rows(section):
+            action = table.action[row]
+            if table.is_disabled[row] or action is None or \
+                    action in NON_TERMINAL:
+                continue
+            fields = (
+                merge(rule_addresses(
+                    table, self.values, 'sources', row, version)),
+                merge(rule_addresses(
+                    table, self.values, 'destinations', row, version)),
+                merge(rule_services(table, self.values, row)))
+            complete = not any(
+                table.hrefs[value] in self.unresolved
+                for field in ('sources', 'destinations', 'services')
+                for value in table.ids(field, row))
+            if all(fields):  # A rule with an empty field never matches
+                rules.append(_Rule(row, len(rules), action, fields,
+                                   complete))
+        return rules
+
+    def _ref(self, rule):
+        table = self.table
+        return RuleRef(rule.row, table.href[rule.row], table.name[rule.row],
+                       table.tag[rule.row], rule.action)
+
+    def analyze(self, sections=None):
+        """
+        Analyze rule sections.
+
+        :param list sections: names of rule sections; default all access
+            rule sections of the table
+        :return: findings in rule order
+        :rtype: list(Finding)
+        """
+        findings = []
+        for section in sections or [
+                name for name in self.table.sections
+                if name.endswith('access_rules')]:
+            findings.extend(self._analyze(self._rules(section)))
+        return findings
+
+    def _analyze(self, rules):
+        if not rules:
+            return []
+        dimensions = [_Dimension(rules, dimension)
+                      for dimension in range(3)]
+        findings = []
+        for rule in rules:
+            bits = (1 << rule.order) - 1
+            for dimension, index in enumerate(dimensions):
+                if bits:
+                    bits &= index.overlapping(rule.fields[dimension])
+            if not bits:
+                continue
+            earlier, covering = [], None
+            for order in _positions(bits):
+                other = rules[order]
+                if not all(overlaps(other.fields[dimension],
+                                    rule.fields[dimension])
+                           for dimension in range(3)):
+                    continue
+                if rule.complete and self._contains(other, rule):
+                    covering = [other]
+                    break
+                earlier.append(other)
+            if not earlier and covering is None:
+                continue
+            if covering is None and rule.complete:
+                covering = self._covering(rule, earlier)
+            if covering:
+                same = all(other.action == rule.action for other in covering)
+                findings.append(Finding(
+                    'redundant' if same else 'shadowed', self._ref(rule),
+                    [self._ref(other) for other in covering]))
+                continue
+            correlated = [
+                other for other in earlier
+                if other.action != rule.action and
+                not self._contains(other, rule) and
+                not self._contains(rule, other)]
+            if correlated:
+                findings.append(Finding(
+                    'correlated', self._ref(rule),
+                    [self._ref(other) for other in correlated]))
+        return findings
+
+    @staticmethod
+    def _contains(outer, inner):
+        return all(covers(outer.fields[dimension], inner.fields[dimension])
+                   for dimension in range(3))
+
+    @staticmethod
+    def _covering(rule, earlier):
+        # None of the earlier rules contains the rule. Rules containing the
+        # rule in two dimensions may cover it together in the third
+        for dimension in range(3):
+            others = [d for d in range(3) if d != dimension]
+            candidates = [
+                other for other in earlier
+                if all(covers(other.fields[d], rule.fields[d])
+                       for d in others)]
+            if len(candidates) > 1 and covers(
+                    merge([interval for other in candidates
+                           for interval in other.fields[dimension]]),
+                    rule.fields[dimension]):
+                return [other for other in candidates
+                        if overlaps(other.fields[dimension],
+                                    rule.fields[dimension])]
+        return None
+
+
+def analyze_policy(policy, sections=None, workers=DEFAULT_WORKERS):
+    """
+    Load a policy and find shadowed, redundant and correlated rules.
+
+    :param Policy policy: policy to analyze
+    :param list sections: names of access rule sections; default all
+    :param int workers: number of concurrent requests
+    :rtype: list(Finding)
+    """
+    if sections is None:
+        sections = [name for name, _ in rule_sections(policy)
+                    if name.endswith('access_rules')]
+    table = RuleTable.load(policy, sections=sections, workers=workers)
+    values, unresolved = resolve_elements(table.hrefs[1:], workers)
+    return ShadowAnalyzer(table, values, unresolved).analyze(sections)
@@ -0,0 +1,383 @@
+"""
+Policy simulator answering which rule of a firewall policy matches a flow,
+for large batches of flows at once (i.e. from traffic logs).
+
+The simulator requires NumPy, which is not installed with smc-python::
+
+    pip install numpy
+
+Compile a policy, then match flows given as arrays of source address,
+destination address, IP protocol and destination port::
+
+    from smc.policy.layer3 import FirewallPolicy
+    from smc.policy.simulator import PolicySimulator
+
+    simulator = PolicySimulator.compile(FirewallPolicy('Corporate'))
+    rows = simulator.match(src=['10.0.0.1', '10.0.0.2'],
+                           dst=['192.168.1.10', '8.8.8.8'],
+                           proto=[6, 17],
+                           port=[443, 53])
+    for row in rows:
+        if row >= 0:
+            print(simulator.table.name[row], simulator.table.action[row])
+
+    simulator.match_one('10.0.0.1', '192.168.1.10', 6, 443)
+
+Addresses can be given as text or as integers; integer arrays avoid
+parsing and are much faster for large batches. The result holds the row of
+the matching rule in :attr:`PolicySimulator.table` (a
+:py:class:`smc.policy.table.RuleTable`) for each flow, or -1 if no rule
+matches. For ICMP flows (protocol 1) the port is the ICMP type.
+
+Compiling loads the rules with :py:class:`smc.policy.table.RuleTable`,
+retrieves the network and service elements used by the rules concurrently
+and expands groups. Hosts, routers, networks, address ranges and IP lists
+are supported for sources and destinations; TCP, UDP, IP and ICMP services
+for services. Elements of other types (i.e. zones, aliases, domain names or
+applications) do not match any flow and are listed in
+:attr:`PolicySimulator.unresolved`, along with the groups containing them.
+
+Rules are evaluated in order and the first matching rule wins. Disabled
+rules, rule sections and rules with the 'continue' or 'jump' action are not
+terminal and are skipped. Only IPv4 access rules are simulated.
+
+Each dimension (source, destination, service) is split into elementary
+intervals at the boundaries of all rule values, and each interval holds a
+bit set of the rules matching it. Matching a flow is then a binary search
+per dimension and the first bit set in the intersection of three bit sets.
+"""
+import logging
+from smc.api.exceptions import FetchElementFailed
+from smc.base.model import Element, prepared_request
+from smc.base.pool import imap_unordered, DEFAULT_WORKERS
+from smc.index.ipindex import element_intervals, parse_address
+from smc.policy.table import RuleTable, ANY
+
+try:
+    import numpy as np
+except ImportError:  # Optional, required by PolicySimulator
+    np = None
+
+logger = logging.getLogger(__name__)
+
+#: Group element types; members are in the 'element' attribute
+GROUP_TYPES = ('group', 'service_group', 'tcp_service_group',
+               'udp_service_group', 'ip_service_group', 'icmp_service_group')
+
+#: Network element types with address values
+NETWORK_TYPES = ('host', 'router', 'network', 'address_range', 'ip_list')
+
+#: Protocol numbers of port based services
+PORT_PROTOCOLS = {'tcp_service': 6, 'udp_service': 17}
+
+#: Actions that do not end rule matching
+NON_TERMINAL = ('continue', 'jump')
+
+#: Number of flows matched at a time; bounds temporary memory
+CHUNK_SIZE = 65536
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('The policy simulator requires NumPy. Install '
+                          'it with: pip install numpy')
+
+
+def _read(href):
+    return prepared_request(FetchElementFailed, href=href).read().json
+
+
+def _type_of(href):
+    return href.rstrip('/').split('/')[-2]
+
+
+def _port(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def element_values(typeof, href, data):
+    """
+    Values of a network or service element.
+
+    :param str typeof: element type
+    :param str href: href of element
+    :param dict data: element json
+    :return: list of (version, start, end) for network elements and
+        (protocol, first port, last port) for services, or None if
+        the element type is not supported
+    """
+    if typeof in NETWORK_TYPES:
+        element = Element.from_meta(href=href, type=typeof,
+                                    name=data.get('name'))
+        element._add_cache(data)
+        return element_intervals(element)
+    if typeof in PORT_PROTOCOLS:
+        first = _port(data.get('min_dst_port'), 0)
+        last = _port(data.get('max_dst_port'), None)
+        return [(PORT_PROTOCOLS[typeof], first,
+                 last if last is not None and last >= first else first)]
+    if typeof == 'ip_service':
+        protocol = _port(data.get('protocol_number'), None)
+        return [(protocol, 0, 0xffff)] if protocol is not None else None
+    if typeof == 'icmp_service':
+        icmp_type = _port(data.get('icmp_type'), None)
+        if icmp_type is None:
+            return [(1, 0, 0xffff)]
+        return [(1, icmp_type, icmp_type)]
+    return None
+
+
+def resolve_elements(hrefs, workers=DEFAULT_WORKERS):
+    """
+    Retrieve elements concurrently and expand groups, including nested
+    groups, to the values of their members.
+
+    :param hrefs: element hrefs
+    :param int workers: number of concurrent requests
+    :return: dict of href to list of values (see :func:`element_values`)
+        and the set of hrefs that could not be resolved, including groups
+        with a member that could not be resolved
+    :rtype: tuple(dict, set)
+    """
+    data = {}
+    level = set(hrefs)
+    while level:
+        members = set()
+        for href, json, error in imap_unordered(_read, list(level), workers):
+            if error is not None:
+                logger.warning('Failed to retrieve %s: %s', href, error)
+            data[href] = json
+            if json and _type_of(href) in GROUP_TYPES:
+                members.update(json.get('element') or [])
+        level = members - set(data)
+
+    values, unresolved = {}, set()
+
+    def expand(href, visiting):
+        if href in values:
+            return values[href]
+        json = data.get(href)
+        typeof = _type_of(href)
+        result = None
+        if json is not None:
+            if typeof in GROUP_TYPES:
+                visiting.add(href)
+                result = []
+                for member in json.get('element') or []:
+                    if member not in visiting:
+                        result.extend(expand(member, visiting))
+                        if member in unresolved:
+                            unresolved.add(href)
+                visiting.discard(href)
+            else:
+                result = element_values(typeof, href, json)
+        if result is None:
+            unresolved.add(href)
+            result = []
+        values[href] = result
+        return result
+
+    for href in hrefs:
+        expand(href, set())
+    return values, unresolved
+
+
+def rule_addresses(table, values, field, row, version=4):
+    """
+    Address intervals of a rule field.
+
+    :param RuleTable table: rules
+    :param dict values: element values, see :func:`resolve_elements`
+    :param str field: 'sources' or 'destinations'
+    :param int row: row of rule
+    :param int version: IP version, 4 or 6
+    :return: list of (start, end)
+    """
+    ids = table.ids(field, row)
+    if ANY in ids:
+        return [(0, (1 << (32 if version == 4 else 128)) - 1)]
+    return [(start, end) for value in ids
+            for value_version, start, end in
+            values.get(table.hrefs[value], ())
+            if value_version == version]
+
+
+def rule_services(table, values, row):
+    """
+    Service intervals of a rule. Protocol and port are combined in one
+    value, ``protocol << 16 | port``.
+
+    :param RuleTable table: rules
+    :param dict values: element values, see :func:`resolve_elements`
+    :param int row: row of rule
+    :return: list of (start, end)
+    """
+    ids = table.ids('services', row)
+    if ANY in ids:
+        return [(0, 0xffffff)]
+    return [((protocol << 16) | first, (protocol << 16) | last)
+            for value in ids
+            for protocol, first, last in values.get(table.hrefs[value], ())]
+
+
+def addresses(values):
+    """
+    Convert IPv4 addresses to an integer array.
+
+    :param values: addresses as text or integers
+    :rtype: numpy.ndarray
+    """
+    _require_numpy()
+    array = np.asarray(values)
+    if array.dtype.kind in 'iu':
+        return array.astype(np.int64)
+    return np.array([parse_address(value)[1] for value in array.tolist()],
+                    dtype=np.int64)
+
+
+class _Dimension(object):
+    """
+    Elementary intervals of one dimension with a bit set of the
+    matching rules for each interval.
+    """
+    __slots__ = ('points', 'bits')
+
+    def __init__(self, rule_intervals, words):
+        points = set([0])
+        for intervals in rule_intervals:
+            for first, last in intervals:
+                points.add(first)
+                points.add(last + 1)
+        self.points = np.array(sorted(points), dtype=np.int64)
+        size = len(self.points)
+        self.bits = np.zeros((size, words), dtype=np.uint64)
+        for rule, intervals in enumerate(rule_intervals):
+            if not intervals:
+                continue
+            word, bit = divmod(rule, 64)
+            bounds = np.array(intervals, dtype=np.int64)
+            change = np.zeros(size + 1, dtype=np.int32)
+            np.add.at(change, np.searchsorted(self.points, bounds[:, 0]), 1)
+            np.add.at(change, np.searchsorted(self.points, bounds[:, 1] + 1),
+                      -1)
+            covered = np.cumsum(change[:size]) > 0
+            self.bits[covered, word] |= np.uint64(1 << bit)
+
+    def lookup(self, values):
+        return np.searchsorted(self.points, values, side='right') - 1
+
+
+class PolicySimulator(object):
+    """
+    First match simulation of the IPv4 access rules of a policy. See
+    :py:mod:`smc.policy.simulator`. Create with :meth:`compile`.
+
+    :param RuleTable table: rules of the policy
+    :param dict values: values of elements by href, see
+        :func:`resolve_elements`
+    :param set unresolved: hrefs of elements that could not be resolved
+    :param str section: rule section to simulate
+    :raises ImportError: NumPy is not installed
+    """
+
+    def __init__(self, table, values, unresolved=(),
+                 section='fw_ipv4_access_rules'):
+        _require_numpy()
+        self.table = table
+        #: Hrefs of elements that were not resolved and groups with
+        #: members that were not resolved
+        self.unresolved = set(unresolved)
+        rows, sources, destinations, services = [], [], [], []
+        for row in table.rows(section):
+            if not self._terminal(row):
+                continue
+            rows.append(row)
+            sources.append(rule_addresses(table, values, 'sources', row))
+            destinations.append(
+                rule_addresses(table, values, 'destinations', row))
+            services.append(rule_services(table, values, row))
+        words = max(1, (len(rows) + 63) // 64)
+        self._rows = np.array(rows + [-1], dtype=np.int64)
+        self._source = _Dimension(sources, words)
+        self._destination = _Dimension(destinations, words)
+        self._service = _Dimension(services, words)
+        self._words = words
+
+    def _terminal(self, row):
+        # Whether a rule ends matching when it matches a flow
+        table = self.table
+        return not table.is_disabled[row] and \
+            table.action[row] is not None and \
+            table.action[row] not in NON_TERMINAL
+
+    @classmethod
+    def compile(cls, policy, workers=DEFAULT_WORKERS):
+        """
+        Load and compile a policy.
+
+        :param FirewallPolicy policy: policy to simulate
+        :param int workers: number of concurrent requests
+        :raises ImportError: NumPy is not installed
+        :rtype: PolicySimulator
+        """
+        _require_numpy()
+        table = RuleTable.load(
+            policy, sections=['fw_ipv4_access_rules'], workers=workers)
+        values, unresolved = resolve_elements(table.hrefs[1:], workers)
+        return cls(table, values, unresolved)
+
+    def match(self, src, dst, proto, port):
+        """
+        Rule matching each flow.
+
+        :param src: source addresses, as text or integers
+        :param dst: destination addresses, as text or integers
+        :param proto: IP protocol numbers
+        :param port: destination ports, or ICMP types
+        :return: row of the matching rule in :attr:`table` for each flow,
+            -1 if no rule matches
+        :rtype: numpy.ndarray
+        """
+        src, dst = addresses(src), addresses(dst)
+        service = (np.asarray(proto, dtype=np.int64) << 16) | \
+            np.asarray(port, dtype=np.int64)
+        result = np.full(len(src), len(self._rows) - 1, dtype=np.int64)
+        for start in range(0, len(src), CHUNK_SIZE):
+            end = start + CHUNK_SIZE
+            self._match(self._source.lookup(src[start:end]),
+                        self._destination.lookup(dst[start:end]),
+                        self._service.lookup(service[start:end]),
+                        result[start:end])
+        return self._rows[result]
+
+    def _match(self, source, destination, service, result):
+        pending = np.arange(len(source))
+        for word in range(self._words):
+            bits = self._source.bits[source, word] & \
+                self._destination.bits[destination, word] & \
+                self._service.bits[service, word]
+            found = bits != 0
+            if found.any():
+                bits = bits[found]
+                lowest = bits & (~bits + np.uint64(1))
+                result[pending[found]] = word * 64 + \
+                    np.log2(lowest.astype(np.float64)).astype(np.int64)
+                keep = ~found
+                pending, source, destination, service = (
+                    pending[keep], source[keep], destination[keep],
+                    service[keep])
+                if not len(pending):
+                    break
+
+    def match_one(self, src, dst, proto, port):
+        """
+        Rule matching a single flow.
+
+        :return: row of the matching rule, or None
+        :rtype: int
+        """
+        row = int(self.match([src], [dst], [proto], [port])[0])
+        return row if row >= 0 else None
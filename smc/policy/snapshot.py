@@ -0,0 +1,398 @@
+"""
+Policy snapshots for comparing versions of a policy.
+
+A snapshot records a content hash of every rule in each rule section of a
+policy. Take a snapshot, save it, and compare it with a later snapshot to
+find the rules that were added, removed, modified or moved::
+
+    from smc.policy.layer3 import FirewallPolicy
+    from smc.policy.snapshot import PolicySnapshot
+
+    snapshot = PolicySnapshot.take(FirewallPolicy('Corporate'))
+    snapshot.save('/tmp/corporate.json')
+    ...
+    previous = PolicySnapshot.load('/tmp/corporate.json')
+    current = previous.refresh()
+    for change in previous.diff(current):
+        print(change.action, change.section, change.name)
+
+Rule hashes ignore fields that change without a change to the rule (links
+and the rule rank). :meth:`PolicySnapshot.refresh` revalidates each rule
+with a conditional GET using the ETag recorded in the snapshot; unchanged
+rules return 304 (Not Modified) without content and keep their hash, so
+only changed rules are downloaded again.
+
+The rule hashes of each section form a Merkle tree. Rules are grouped into
+nodes at boundaries chosen by the rule hash rather than by position, so
+adding or removing a rule only changes the nodes on its path and not the
+nodes that follow it. Snapshots with equal root hashes are equal. A diff
+only descends into nodes whose hash is not found in the other tree, so
+added, removed and modified rules are found in time proportional to the
+number of changes (times the depth of the tree) rather than the number of
+rules. Node hashes do not depend on the position of the node, so the
+blocks of rules under unchanged nodes and the changed rules are also
+compared by their position in the earlier tree; blocks and rules out of
+order, including whole blocks of rules that changed places, are reported
+as moved. Only the nodes visited by the diff are compared, so finding
+moves takes time proportional to the number of changes as well.
+"""
+import hashlib
+import json
+from collections import namedtuple
+from smc.api.exceptions import FetchElementFailed
+from smc.base.model import prepared_request
+from smc.base.pool import imap, DEFAULT_WORKERS
+from smc.policy.table import rule_sections
+
+#: Rule fields that are not part of the rule content
+VOLATILE_FIELDS = ('link', 'rank')
+
+#: Average number of children of a node in the section hash tree
+FANOUT = 16
+
+#: Difference between snapshots. Action is one of 'added', 'removed',
+#: 'modified' or 'moved'; href and name are None when a whole section was
+#: added or removed.
+RuleChange = namedtuple('RuleChange', 'action section href name')
+
+#: Rule recorded in a snapshot
+RuleEntry = namedtuple('RuleEntry', 'href etag digest name')
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _strip(value):
+    if isinstance(value, dict):
+        return dict((key, _strip(item)) for key, item in value.items()
+                    if key not in VOLATILE_FIELDS)
+    if isinstance(value, list):
+        return [_strip(item) for item in value]
+    return value
+
+
+def rule_digest(data):
+    """
+    Content hash of rule json, ignoring :data:`VOLATILE_FIELDS`.
+
+    :param dict data: rule json
+    :rtype: str
+    """
+    return _sha1(json.dumps(_strip(data), sort_keys=True,
+                            separators=(',', ':')))
+
+
+def _boundary(digest):
+    return int(digest[:8], 16) % FANOUT == 0
+
+
+class SectionTree(object):
+    """
+    Merkle tree over the rules of a section. Level 0 holds one hash per
+    rule (of the rule href and content); each higher level groups the
+    hashes below it into nodes, ending a node after a hash selected by
+    :func:`_boundary`, until a single root remains.
+
+    :param list rules: :py:data:`RuleEntry` in rule order
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        level = [_sha1(rule.href + '\0' + rule.digest) for rule in self.rules]
+        self.levels = [level]
+        self.children = [None]  # per level, child range of each node
+        while len(level) > 1:
+            nodes, ranges, start = [], [], 0
+            for index, digest in enumerate(level):
+                if _boundary(digest) or index == len(level) - 1:
+                    nodes.append(_sha1(''.join(level[start:index + 1])))
+                    ranges.append((start, index + 1))
+                    start = index + 1
+            if len(nodes) == len(level):  # No grouping, end the tree
+                nodes = [_sha1(''.join(level))]
+                ranges = [(0, len(level))]
+            level = nodes
+            self.levels.append(level)
+            self.children.append(ranges)
+        # Range of rules under each node, by node hash
+        self.digests = dict(
+            (digest, (index, index + 1))
+            for index, digest in enumerate(self.levels[0]))
+        spans = [(index, index + 1) for index in range(len(self.rules))]
+        for level in range(1, len(self.levels)):
+            spans = [(spans[start][0], spans[end - 1][1])
+                     for start, end in self.children[level]]
+            self.digests.update(zip(self.levels[level], spans))
+        self.positions = dict(
+            (rule.href, index) for index, rule in enumerate(self.rules))
+
+    @property
+    def root(self):
+        """
+        Root hash, or None for an empty section
+        """
+        return self.levels[-1][0] if self.rules else None
+
+    def _changed_leaves(self, other):
+        # Leaves under nodes with a hash that is not in the other tree
+        frontier = [(len(self.levels) - 1, 0)] if self.rules else []
+        leaves = []
+        while frontier:
+            level, index = frontier.pop()
+            if self.levels[level][index] in other.digests and level:
+                continue
+            if level == 0:
+                leaves.append(index)
+            elif level == 1:
+                leaves.extend(range(*self.children[level][index]))
+            else:
+                start, end = self.children[level][index]
+                frontier.extend((level - 1, child)
+                                for child in range(start, end))
+        return sorted(set(leaves))
+
+    def diff(self, other, section=None):
+        """
+        Changes from this tree to another.
+
+        :param SectionTree other: later version of the section
+        :param str section: section name set on the changes
+        :rtype: list(RuleChange)
+        """
+        if self.root == other.root:
+            return []
+        old = [self.rules[index] for index in self._changed_leaves(other)]
+        new = [other.rules[index] for index in other._changed_leaves(self)]
+        changes = []
+        for rule in old:
+            if rule.href not in other.positions:
+                changes.append(
+                    RuleChange('removed', section, rule.href, rule.name))
+        modified = set()
+        for rule in new:
+            position = self.positions.get(rule.href)
+            if position is None:
+                changes.append(
+                    RuleChange('added', section, rule.href, rule.name))
+            elif self.rules[position].digest != rule.digest:
+                modified.add(rule.href)
+                changes.append(
+                    RuleChange('modified', section, rule.href, rule.name))
+        changes.extend(self._moved(other, section, modified))
+        return changes
+
+    def _segments(self, other):
+        # Rules of the other tree, in order, as blocks under nodes that are
+        # also in this tree and single rules under changed nodes. Each is
+        # (start, end, position in this tree); added rules are left out.
+        frontier = [(len(other.levels) - 1, 0)] if other.rules else []
+        segments = []
+        while frontier:
+            level, index = frontier.pop()
+            digest = other.levels[level][index]
+            span = self.digests.get(digest)
+            if span is not None:
+                start, end = other.digests[digest]
+                segments.append((start, end, span[0]))
+            elif level == 0:
+                position = self.positions.get(other.rules[index].href)
+                if position is not None:
+                    segments.append((index, index + 1, position))
+            else:
+                start, end = other.children[level][index]
+                frontier.extend((level - 1, child)
+                                for child in range(end - 1, start - 1, -1))
+        return segments
+
+    def _moved(self, other, section, modified):
+        # Blocks and rules that are out of order; those in the heaviest run
+        # in the same order (by number of rules) were not moved. Unchanged
+        # nodes are found by hash wherever they are, so order is compared
+        # by position.
+        segments = self._segments(other)
+        order = [position for _, _, position in segments]
+        if all(a < b for a, b in zip(order, order[1:])):
+            return []
+        # Weight by rules in the segment; among runs with as many rules,
+        # prefer to leave out modified rules, which are reported as
+        # modified rather than moved. Blocks under unchanged nodes have no
+        # modified rules.
+        scale = len(other.rules) + 1
+        in_order = _heaviest_increasing(order, [
+            (end - start) * scale -
+            (end - start == 1 and other.rules[start].href in modified)
+            for start, end, _ in segments])
+        return [RuleChange('moved', section, rule.href, rule.name)
+                for index, (start, end, _) in enumerate(segments)
+                if index not in in_order
+                for rule in other.rules[start:end]
+                if rule.href not in modified]
+
+
+def _heaviest_increasing(values, weights):
+    # Indexes of a strictly increasing subsequence of values with the
+    # largest sum of weights. Maximum weight by value rank is kept in a
+    # Fenwick tree.
+    ranks = dict((value, rank) for rank, value in
+                 enumerate(sorted(values), 1))
+    tree = [(0, None)] * (len(values) + 1)
+    previous = [None] * len(values)
+    best = (0, None)
+    for index, value in enumerate(values):
+        rank = ranks[value] - 1
+        found = (0, None)
+        while rank:
+            found = max(found, tree[rank], key=lambda entry: entry[0])
+            rank -= rank & -rank
+        previous[index] = found[1]
+        entry = (found[0] + weights[index], index)
+        best = max(best, entry, key=lambda entry: entry[0])
+        rank = ranks[value]
+        while rank <= len(values):
+            tree[rank] = max(tree[rank], entry, key=lambda entry: entry[0])
+            rank += rank & -rank
+    result = set()
+    index = best[1]
+    while index is not None:
+        result.add(index)
+        index = previous[index]
+    return result
+
+
+class PolicySnapshot(object):
+    """
+    Rule hashes of a policy by section. See :py:mod:`smc.policy.snapshot`.
+
+    :param str href: href of policy
+    :param str name: name of policy
+    :param list sections: (section name, section href, list of
+        :py:data:`RuleEntry`)
+    """
+
+    def __init__(self, href, name, sections):
+        self.href = href
+        self.name = name
+        self.sections = []
+        self.trees = {}
+        for section, section_href, rules in sections:
+            self.sections.append((section, section_href))
+            self.trees[section] = SectionTree(rules)
+
+    @property
+    def root(self):
+        """
+        Hash of the section names and their root hashes. Snapshots with
+        the same root hash have the same rules.
+        """
+        return _sha1(''.join('{}:{};'.format(section, self.trees[section].root)
+                             for section, _ in self.sections))
+
+    @classmethod
+    def take(cls, policy, workers=DEFAULT_WORKERS):
+        """
+        Take a snapshot of a policy. Rules are retrieved concurrently.
+
+        :param Policy policy: policy
+        :param int workers: number of concurrent requests
+        :raises FetchElementFailed: failed to retrieve a rule
+        :rtype: PolicySnapshot
+        """
+        return cls._snapshot(policy.href, policy.name, rule_sections(policy),
+                             {}, workers)
+
+    def refresh(self, workers=DEFAULT_WORKERS):
+        """
+        Take a new snapshot of the same policy. Rules whose ETag has not
+        changed are not downloaded again.
+
+        :param int workers: number of concurrent requests
+        :raises FetchElementFailed: failed to retrieve a rule
+        :rtype: PolicySnapshot
+        """
+        known = dict((rule.href, rule) for tree in self.trees.values()
+                     for rule in tree.rules)
+        return self._snapshot(self.href, self.name, self.sections, known,
+                              workers)
+
+    @classmethod
+    def _snapshot(cls, href, name, sections, known, workers):
+        def listing(section_href):
+            return prepared_request(
+                FetchElementFailed, href=section_href).read().json or []
+
+        def read(rule_href):
+            rule = known.get(rule_href)
+            headers = {'if-none-match': rule.etag} if rule and rule.etag \
+                else None
+            result = prepared_request(
+                FetchElementFailed, href=rule_href, headers=headers).read()
+            if result.code == 304:
+                return rule
+            data = result.json or {}
+            return RuleEntry(rule_href, result.etag, rule_digest(data),
+                             data.get('name'))
+
+        listings = list(imap(
+            listing, [section_href for _, section_href in sections], workers))
+        hrefs = [[entry.get('href') for entry in entries]
+                 for entries in listings]
+        rules = iter(imap(read, [rule for section in hrefs
+                                 for rule in section], workers))
+        return cls(href, name, [
+            (section, section_href, [next(rules) for _ in section_rules])
+            for (section, section_href), section_rules in zip(sections, hrefs)])
+
+    def diff(self, other):
+        """
+        Changes from this snapshot to another snapshot of the policy.
+
+        :param PolicySnapshot other: later snapshot
+        :rtype: list(RuleChange)
+        """
+        if self.root == other.root:
+            return []
+        changes = []
+        for section, _ in self.sections:
+            if section not in other.trees:
+                changes.append(RuleChange('removed', section, None, None))
+            else:
+                changes.extend(self.trees[section].diff(
+                    other.trees[section], section))
+        for section, _ in other.sections:
+            if section not in self.trees:
+                changes.append(RuleChange('added', section, None, None))
+        return changes
+
+    def save(self, path):
+        """
+        Save the snapshot to a file as json.
+
+        :param str path: file name
+        :return: None
+        """
+        with open(path, 'w') as snapshot:
+            json.dump({
+                'href': self.href,
+                'name': self.name,
+                'sections': [
+                    {'name': section, 'href': section_href,
+                     'rules': [list(rule)
+                               for rule in self.trees[section].rules]}
+                    for section, section_href in self.sections]},
+                snapshot)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a snapshot saved with :meth:`save`.
+
+        :param str path: file name
+        :rtype: PolicySnapshot
+        """
+        with open(path) as snapshot:
+            data = json.load(snapshot)
+        return cls(data.get('href'), data.get('name'), [
+            (section.get('name'), section.get('href'),
+             [RuleEntry(*rule) for rule in section.get('rules', [])])
+            for section in data.get('sections', [])])
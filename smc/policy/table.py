@@ -0,0 +1,297 @@
+"""
+Columnar table of the rules of a policy.
+
+Iterating ``policy.fw_ipv4_access_rules`` and reading ``rule.data`` retrieves
+one rule at a time. :meth:`RuleTable.load` retrieves every rule section of a
+policy (IPv4 and IPv6 access and NAT rules for a firewall policy) and the
+rules in them concurrently, and stores the fields used for analysis in
+columns rather than as one object per rule::
+
+    from smc.policy.layer3 import FirewallPolicy
+    from smc.policy.table import RuleTable
+    from smc.elements.network import Host
+
+    table = RuleTable.load(FirewallPolicy('Corporate'))
+    print(len(table), table.sections)
+
+    # Rules using a host in any field
+    for row in table.referencing(Host('web-1').href):
+        print(table.section(row), table.position[row], table.name[row])
+
+    # Columns can be scanned directly
+    disabled = [row for row, flag in enumerate(table.is_disabled) if flag]
+
+A row is the offset of a rule in the table; rules are stored in section
+order, then in rule order within the section. Each column is a list or
+array with one value per row:
+
+============= ====================================================
+section_id    index of the section in :attr:`RuleTable.sections`
+position      position of the rule in its section, starting with 1
+href          rule href
+name          rule name
+tag           rule tag
+action        rule action, i.e. 'allow', or None for NAT rules and
+              rule sections
+is_disabled   1 if the rule is disabled
+comment       rule comment or None
+nat           NAT options of a NAT rule (dynamic_src_nat,
+              static_src_nat and static_dst_nat), or None
+============= ====================================================
+
+Sources, destinations and services are held as lists of integer ids in
+one flat array per field. Ids index :attr:`RuleTable.hrefs`, where each href
+is stored once. The id :data:`ANY` means the field is set to any, and an
+empty list means none. Use :meth:`RuleTable.ids` or
+:meth:`RuleTable.values` to read them for a row.
+"""
+import bisect
+from array import array
+from smc.api.exceptions import FetchElementFailed
+from smc.base.model import prepared_request
+from smc.base.pool import imap, DEFAULT_WORKERS
+
+#: Id of the value 'any' in source, destination and service columns
+ANY = 0
+
+#: Fields held as lists of href ids, with the key used in rule json
+REFERENCE_FIELDS = (
+    ('sources', 'src'),
+    ('destinations', 'dst'),
+    ('services', 'service'))
+
+#: NAT options of NAT rules
+NAT_OPTIONS = ('dynamic_src_nat', 'static_src_nat', 'static_dst_nat')
+
+
+def _read(href):
+    return prepared_request(FetchElementFailed, href=href).read().json
+
+
+def rule_sections(policy):
+    """
+    Rule sections of a policy, i.e. fw_ipv4_access_rules
+
+    :param Policy policy: policy element
+    :return: list of (name, href)
+    """
+    return [(link.get('rel'), link.get('href'))
+            for link in policy.data.get('link', [])
+            if link.get('rel', '').endswith('_rules')]
+
+
+class _References(object):
+    """
+    Lists of ids for one field in compressed sparse row form. The ids
+    of row n are ``ids[offsets[n]:offsets[n + 1]]``.
+    """
+    __slots__ = ('ids', 'offsets')
+
+    def __init__(self):
+        self.ids = array('i')
+        self.offsets = array('i', [0])
+
+    def append(self, ids):
+        self.ids.extend(ids)
+        self.offsets.append(len(self.ids))
+
+    def __getitem__(self, row):
+        return self.ids[self.offsets[row]:self.offsets[row + 1]]
+
+    def rows(self, value):
+        # Rows holding an id; offsets are sorted so each position maps
+        # to its row by bisection
+        found = []
+        for position, current in enumerate(self.ids):
+            if current == value:
+                row = bisect.bisect_right(self.offsets, position) - 1
+                if not found or found[-1] != row:
+                    found.append(row)
+        return found
+
+
+class RuleTable(object):
+    """
+    Rules of a policy in columns. See :py:mod:`smc.policy.table`.
+    Create with :meth:`load`, or add rule json with :meth:`append`.
+    """
+
+    def __init__(self):
+        self.sections = []
+        self.hrefs = ['any']  # id -> href, see ANY
+        self._ids = {'any': ANY}
+        self._strings = {}
+        self.section_id = array('B')
+        self.position = array('i')
+        self.href = []
+        self.name = []
+        self.tag = []
+        self.action = []
+        self.is_disabled = array('b')
+        self.comment = []
+        self.nat = []
+        self._references = dict(
+            (field, _References()) for field, _ in REFERENCE_FIELDS)
+        self._rows = {}  # rule href -> row
+
+    @classmethod
+    def load(cls, policy, sections=None, workers=DEFAULT_WORKERS):
+        """
+        Load the rules of a policy. Rule sections and rules are
+        retrieved concurrently.
+
+        :param Policy policy: policy to load
+        :param list sections: names of rule sections to load, i.e.
+            ['fw_ipv4_access_rules']; default all sections
+        :param int workers: number of concurrent requests
+        :raises FetchElementFailed: failed to retrieve a rule
+        :rtype: RuleTable
+        """
+        table = cls()
+        found = [(name, href) for name, href in rule_sections(policy)
+                 if sections is None or name in sections]
+        listings = list(imap(_read, [href for _, href in found], workers))
+        rules = []
+        for (name, _), listing in zip(found, listings):
+            for position, entry in enumerate(listing or [], 1):
+                rules.append((name, position, entry.get('href')))
+        for (name, position, href), data in zip(
+                rules, imap(_read, [rule[2] for rule in rules], workers)):
+            table.append(name, position, href, data or {})
+        return table
+
+    def _intern(self, value):
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+    def _id(self, href):
+        value = self._ids.get(href)
+        if value is None:
+            value = self._ids[href] = len(self.hrefs)
+            self.hrefs.append(href)
+        return value
+
+    def append(self, section, position, href, data):
+        """
+        Add a rule.
+
+        :param str section: name of rule section
+        :param int position: position of the rule in the section
+        :param str href: href of rule
+        :param dict data: rule json
+        :return: row of the rule
+        :rtype: int
+        """
+        if section not in self.sections:
+            self.sections.append(section)
+        row = len(self.href)
+        self.section_id.append(self.sections.index(section))
+        self.position.append(position)
+        self.href.append(href)
+        self.name.append(data.get('name'))
+        self.tag.append(data.get('tag'))
+        self.action.append(self._intern(
+            (data.get('action') or {}).get('action')))
+        self.is_disabled.append(1 if data.get('is_disabled') else 0)
+        self.comment.append(data.get('comment'))
+        options = data.get('options') or {}
+        self.nat.append(dict(
+            (option, options[option]) for option in NAT_OPTIONS
+            if option in options) or None)
+        for field, key in REFERENCE_FIELDS:
+            value = data.get(field) or {}
+            if value.get('any'):
+                ids = [ANY]
+            else:
+                ids = [self._id(reference)
+                       for reference in value.get(key) or []]
+            self._references[field].append(ids)
+        self._rows[href] = row
+        return row
+
+    def __len__(self):
+        return len(self.href)
+
+    def section(self, row):
+        """
+        Name of the rule section of a row
+
+        :rtype: str
+        """
+        return self.sections[self.section_id[row]]
+
+    def rows(self, section):
+        """
+        Rows of a rule section
+
+        :param str section: name of section, i.e. 'fw_ipv4_access_rules'
+        :rtype: list(int)
+        """
+        if section not in self.sections:
+            return []
+        value = self.sections.index(section)
+        return [row for row, current in enumerate(self.section_id)
+                if current == value]
+
+    def row_of(self, href):
+        """
+        Row of a rule by href
+
+        :return: row or None if the rule is not in the table
+        """
+        return self._rows.get(href)
+
+    def ids(self, field, row):
+        """
+        Href ids of a reference field for a row.
+
+        :param str field: 'sources', 'destinations' or 'services'
+        :param int row: row of rule
+        :rtype: array
+        """
+        return self._references[field][row]
+
+    def values(self, field, row):
+        """
+        Values of a reference field for a row, as href. 'any' is
+        returned as the single value 'any'.
+
+        :param str field: 'sources', 'destinations' or 'services'
+        :param int row: row of rule
+        :rtype: list(str)
+        """
+        return [self.hrefs[value] for value in self.ids(field, row)]
+
+    def referencing(self, href, fields=('sources', 'destinations',
+                                        'services')):
+        """
+        Rows of rules using an element in any of the fields.
+
+        :param str href: href of element
+        :param tuple fields: reference fields to search
+        :rtype: list(int)
+        """
+        value = self._ids.get(href)
+        if value is None or value == ANY:
+            return []
+        rows = set()
+        for field in fields:
+            rows.update(self._references[field].rows(value))
+        return sorted(rows)
+
+    def row(self, row):
+        """
+        All values of a row as a dict
+
+        :param int row: row of rule
+        :rtype: dict
+        """
+        result = {'section': self.section(row)}
+        for column in ('position', 'href', 'name', 'tag', 'action',
+                       'comment', 'nat'):
+            result[column] = getattr(self, column)[row]
+        result['is_disabled'] = bool(self.is_disabled[row])
+        for field, _ in REFERENCE_FIELDS:
+            result[field] = self.values(field, row)
+        return result
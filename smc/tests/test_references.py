@@ -0,0 +1,67 @@
+"""
+Tests for smc.index.references. Element json is read from an in memory
+store rather than the SMC.
+"""
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from smc.index.references import ReferenceGraph
+
+ELEMENTS = 'http://smc/6.2/elements/'
+ENGINE = ELEMENTS + 'single_fw/1'
+GATEWAY = ENGINE + '/internal_gateway/1'
+SITE = GATEWAY + '/vpn_site/1'
+ROUTING = ENGINE + '/routing'
+HOST = ELEMENTS + 'host/1'
+
+
+def links(*links):
+    return [{'rel': rel, 'href': href} for rel, href in links]
+
+
+class ReferenceCrawlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.elements = {
+            ENGINE: {'name': 'fw', 'link': links(
+                ('internal_gateway', GATEWAY), ('routing', ROUTING))},
+            GATEWAY: {'name': 'gw', 'link': links(('vpn_site', SITE))},
+            # Links back to the engine and to the routing of the engine
+            SITE: {'name': 'site', 'site_element': [HOST], 'link': links(
+                ('routing', ENGINE), ('routing', ROUTING))},
+            ROUTING: {'name': 'routing'}}
+        self.reads = []
+        patcher = mock.patch('smc.index.references._read', self.read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, href):
+        self.reads.append(href)
+        return self.elements[href]
+
+    def test_each_href_read_once(self):
+        graph = ReferenceGraph()
+        graph._crawl([(None, ENGINE)])
+        self.assertEqual(sorted(self.reads),
+                         sorted([ENGINE, GATEWAY, SITE, ROUTING]))
+        self.assertIn(SITE, graph.referenced_by(HOST))
+        self.assertIn(ENGINE, graph.includes(SITE))
+        self.assertIn(ROUTING, graph.includes(SITE))
+        self.assertIn(ENGINE, graph.referenced_by(HOST, transitive=True))
+
+    def test_refresh_keeps_links(self):
+        graph = ReferenceGraph()
+        graph._crawl([(None, ENGINE)])
+        graph.update(SITE, self.elements[SITE])
+        self.assertIn(ENGINE, graph.includes(SITE))
+        graph.remove(GATEWAY)
+        self.assertIsNone(graph.meta(SITE))
+        self.assertEqual(graph.meta(ENGINE)['name'], 'fw')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Tests for Rule.import_rules. Requests to the SMC are replaced by an in
+memory rule list.
+"""
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from smc.actions.search import NameResolver, ERROR
+from smc.api.exceptions import FetchElementFailed
+from smc.base.collection import create_collection
+from smc.elements.network import Host
+from smc.policy.rule import IPv4Rule, IPv4Layer2Rule
+
+RULES = 'http://smc/6.2/elements/fw_policy/1/fw_ipv4_access_rule'
+
+
+class FakeRules(object):
+    """
+    Rule list of a policy. Rules are created at the add_before and
+    add_after links of a rule, or after and before a rule by tag.
+    """
+
+    def __init__(self, count):
+        self.rules = [self.href(number) for number in range(count)]
+        self.created = 0
+
+    @staticmethod
+    def href(number):
+        return '{}/{}'.format(RULES, number)
+
+    @staticmethod
+    def tag(href):
+        return '@{}.0'.format(href.rsplit('/', 1)[-1])
+
+    def __call__(self, *exception, **kwargs):
+        fake = self
+        href, params = kwargs.get('href'), kwargs.get('params')
+
+        class Result(object):
+            def __init__(self, json=None, href=None):
+                self.json = json
+                self.href = href
+
+        class Request(object):
+            def read(self):
+                if href == RULES:
+                    return Result([{'href': rule} for rule in fake.rules])
+                return Result({'link': [
+                    {'rel': 'add_before', 'href': href + '#before'},
+                    {'rel': 'add_after', 'href': href + '#after'}]})
+
+            def create(self):
+                fake.created += 1
+                new = fake.href(100 + fake.created)
+                tags = dict((fake.tag(rule), index)
+                            for index, rule in enumerate(fake.rules))
+                if href == RULES and params:
+                    if 'after' in params:
+                        index = tags[params['after']] + 1
+                    else:
+                        index = tags[params['before']]
+                elif href == RULES:
+                    index = 0
+                else:
+                    rule, rel = href.split('#')
+                    index = fake.rules.index(rule) + (rel == 'after')
+                fake.rules.insert(index, new)
+                return Result(href=new)
+
+        return Request()
+
+
+def rule(name, **kwargs):
+    values = dict(name=name, sources='any', destinations='any',
+                  services='any')
+    values.update(kwargs)
+    return values
+
+
+class ImportRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = FakeRules(5)
+        patcher = mock.patch('smc.policy.rule.prepared_request', self.smc)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.collection = create_collection(RULES, IPv4Rule)
+
+    def test_block_at_position(self):
+        created = self.collection.import_rules(
+            [rule('a'), rule('b')], add_pos=2)
+        self.assertEqual(self.smc.rules[1:3], created)
+
+    def test_after_and_before(self):
+        anchor = self.smc.href(3)
+        created = self.collection.import_rules([
+            rule('a'), rule('b', after=FakeRules.tag(anchor)), rule('c'),
+            rule('d', before=FakeRules.tag(self.smc.href(1)))])
+        rules = self.smc.rules
+        self.assertEqual(rules[0], created[0])
+        self.assertEqual(rules[rules.index(anchor) + 1:][:2], created[1:3])
+        self.assertEqual(rules[rules.index(self.smc.href(1)) - 1],
+                         created[3])
+
+    def test_after_not_supported(self):
+        collection = create_collection(RULES, IPv4Layer2Rule)
+        with self.assertRaises(ValueError):
+            collection.import_rules([rule('a'), rule('b', after='@1.0')])
+        self.assertEqual(self.smc.created, 0)
+
+    def test_failed_lookup(self):
+        failing = set(['web-2'])
+
+        def search(name, filter_context=None):
+            if name in failing:
+                raise FetchElementFailed('unavailable')
+            return mock.Mock(json=[{'href': 'http://smc/host/' + name}])
+
+        resolver = NameResolver()
+        with mock.patch('smc.actions.search.fetch_href_by_name', search):
+            with self.assertRaises(FetchElementFailed):
+                self.collection.import_rules([rule(
+                    'web', sources=[Host('web-1'), Host('web-2')])],
+                    resolver=resolver)
+            self.assertEqual(self.smc.created, 0)
+            self.assertIs(resolver.resolve(['web-2'], 'host')['web-2'],
+                          ERROR)
+            # Failed lookups are not cached
+            failing.clear()
+            self.assertEqual(resolver.resolve(['web-2'], 'host'),
+                             {'web-2': 'http://smc/host/web-2'})
+            self.assertIsNone(resolver.error('web-2', 'host'))
+
+
+if __name__ == '__main__':
+    unittest.main()
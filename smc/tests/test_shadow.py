@@ -0,0 +1,91 @@
+"""
+Tests for smc.policy.shadow. Rule tables and element values are built
+directly, without requests to the SMC.
+"""
+import unittest
+
+from smc.policy.shadow import ShadowAnalyzer
+from smc.policy.table import RuleTable
+
+ELEMENTS = 'http://smc/6.2/elements/'
+SECTION = 'fw_ipv4_access_rules'
+
+
+def network(name):
+    return ELEMENTS + 'network/' + name
+
+
+def service(name):
+    return ELEMENTS + 'tcp_service/' + name
+
+
+class ShadowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = RuleTable()
+        self.values = {}
+
+    def network(self, name, start, end):
+        self.values[network(name)] = [(4, start, end)]
+        return network(name)
+
+    def service(self, name, *ports):
+        self.values[service(name)] = [(6, start, end) for start, end in ports]
+        return service(name)
+
+    def rule(self, name, action, sources=None, destinations=None,
+             services=None):
+        def field(key, hrefs):
+            return {key: hrefs} if hrefs else {'any': True}
+        position = len(self.table.rows(SECTION)) + 1 \
+            if SECTION in self.table.sections else 1
+        self.table.append(SECTION, position, 'rule/' + name, {
+            'name': name, 'action': {'action': action},
+            'sources': field('src', sources),
+            'destinations': field('dst', destinations),
+            'services': field('service', services)})
+
+    def findings(self):
+        return [(finding.kind, finding.rule.name,
+                 [rule.name for rule in finding.covering])
+                for finding in ShadowAnalyzer(
+                    self.table, self.values).analyze()]
+
+    def test_findings(self):
+        net_a = self.network('a', 0x0A000000, 0x0AFFFFFF)
+        net_a1 = self.network('a1', 0x0A000000, 0x0A7FFFFF)
+        net_a2 = self.network('a2', 0x0A800000, 0x0AFFFFFF)
+        net_b = self.network('b', 0xC0A80000, 0xC0A8FFFF)
+        http = self.service('http', (80, 80))
+        web = self.service('web', (80, 443))
+        self.rule('r1', 'allow', [net_a1], [net_b], [web])
+        self.rule('r2', 'allow', [net_a2], [net_b], [web])
+        self.rule('r3', 'allow', [net_a], [net_b], [http])
+        self.rule('r4', 'discard', [net_a], [net_b], [http])
+        self.rule('r5', 'discard', None, [net_b], [http])
+        self.assertEqual(self.findings(), [
+            ('redundant', 'r3', ['r1', 'r2']),
+            ('shadowed', 'r4', ['r3']),
+            ('correlated', 'r5', ['r1', 'r2'])])
+
+    def test_rule_in_gap_of_other_rule(self):
+        # The services of r1 start before and end after the service of r2,
+        # but r1 does not overlap it
+        self.service('split', (20, 21), (80, 80))
+        self.service('ssh', (22, 22))
+        self.rule('r1', 'allow', services=[service('split')])
+        self.rule('r2', 'discard', services=[service('ssh')])
+        self.assertEqual(self.findings(), [])
+
+    def test_any_source_rules(self):
+        for i in range(200):
+            destination = self.network(str(i), i * 256, i * 256 + 255)
+            self.rule('r%d' % i, 'allow' if i % 3 else 'discard',
+                      None if i % 2 else [self.network('s', 1, 1)],
+                      [destination])
+        self.rule('last', 'discard', destinations=[network('7')])
+        self.assertEqual(self.findings(), [('shadowed', 'last', ['r7'])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for smc.policy.snapshot section trees. Trees are built from rule
+entries directly, without requests to the SMC.
+"""
+import unittest
+
+from smc.policy.snapshot import SectionTree, RuleEntry, FANOUT, _sha1
+
+SECTION = 'http://smc/6.2/elements/fw_policy/1/fw_ipv4_access_rule/'
+
+
+def rules(count):
+    return [RuleEntry(SECTION + str(i), None, _sha1('rule %d' % i),
+                      'rule %d' % i)
+            for i in range(count)]
+
+
+def boundaries(tree):
+    # Positions after which a level 1 node ends
+    return [end for _, end in tree.children[1]]
+
+
+def actions(changes):
+    return sorted((change.action, change.name) for change in changes)
+
+
+class SectionTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = rules(400)
+        self.tree = SectionTree(self.rules)
+
+    def test_equal_trees(self):
+        self.assertEqual(self.tree.diff(SectionTree(list(self.rules))), [])
+
+    def test_added_removed_modified(self):
+        changed = list(self.rules)
+        added = RuleEntry(SECTION + 'new', None, _sha1('new'), 'new')
+        changed.insert(200, added)
+        removed = changed.pop(50)
+        changed[300] = changed[300]._replace(digest=_sha1('changed'))
+        self.assertEqual(
+            actions(self.tree.diff(SectionTree(changed))),
+            [('added', 'new'), ('modified', changed[300].name),
+             ('removed', removed.name)])
+
+    def test_moves_compared_by_changed_nodes(self):
+        # Rules under unchanged nodes are compared as blocks
+        changed = list(self.rules)
+        changed[200] = changed[200]._replace(digest=_sha1('changed'))
+        other = SectionTree(changed)
+        self.assertLess(len(self.tree._segments(other)), 3 * FANOUT)
+        self.assertEqual(actions(self.tree.diff(other)),
+                         [('modified', 'rule 200')])
+
+    def test_moved_rule(self):
+        changed = list(self.rules)
+        changed.insert(350, changed.pop(10))
+        self.assertEqual(actions(self.tree.diff(SectionTree(changed))),
+                         [('moved', 'rule 10')])
+
+    def test_swapped_blocks(self):
+        # Swap two blocks ending at node boundaries, so every node of the
+        # new tree exists in the old tree and only the order differs
+        ends = boundaries(self.tree)
+        self.assertTrue(len(ends) > 3)
+        first, second = ends[0], ends[1]
+        changed = (self.rules[first:second] + self.rules[:first] +
+                   self.rules[second:])
+        other = SectionTree(changed)
+        self.assertNotEqual(self.tree.root, other.root)
+        changes = self.tree.diff(other)
+        self.assertTrue(changes)
+        self.assertEqual(set(change.action for change in changes),
+                         set(['moved']))
+        moved = set(change.href for change in changes)
+        smaller = min(self.rules[:first], self.rules[first:second], key=len)
+        self.assertEqual(moved, set(rule.href for rule in smaller))
+
+
+if __name__ == '__main__':
+    unittest.main()
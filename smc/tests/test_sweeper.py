@@ -0,0 +1,78 @@
+"""
+Tests for smc.administration.sweeper. The HTTP session of the connection
+is replaced by a fake that records the requests sent.
+"""
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from smc.administration.sweeper import Sweeper, SweepPlan
+from smc.api.web import SMCAPIConnection
+
+HREF = 'http://smc/6.2/elements/host/1'
+
+
+class Response(object):
+    def __init__(self, status_code, etag=None):
+        self.status_code = status_code
+        self.headers = {'ETag': etag} if etag else {}
+        self.text = ''
+        self.encoding = None
+
+
+class FakeSession(object):
+    """
+    HTTP session holding the current ETag of each element. A delete with
+    an other ETag fails with a conflict.
+    """
+
+    def __init__(self, etags):
+        self.etags = etags
+        self.deletes = []
+
+    def get(self, href, **kwargs):
+        return Response(200, self.etags[href])
+
+    def delete(self, href, headers=None):
+        etag = (headers or {}).get('if-match')
+        self.deletes.append((href, etag))
+        if etag != self.etags[href]:
+            return Response(409)
+        del self.etags[href]
+        return Response(204)
+
+
+class SweeperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.http = FakeSession({HREF: 'current'})
+        session = mock.Mock(timeout=None, cache=None, session=self.http)
+        patcher = mock.patch('smc.api.common.session',
+                             mock.Mock(connection=SMCAPIConnection(session)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sweep(self, etag):
+        plan = SweepPlan([[{'href': HREF, 'name': 'a', 'type': 'host',
+                            'etag': etag}]])
+        return list(Sweeper(graph=mock.Mock()).sweep(plan))
+
+    def test_delete_with_planned_etag(self):
+        result, = self.sweep('current')
+        self.assertEqual(result.status, 'deleted')
+        self.assertEqual(self.http.deletes, [(HREF, 'current')])
+
+    def test_stale_etag_fails(self):
+        result, = self.sweep('planned')
+        self.assertEqual(result.status, 'failed')
+        self.assertIsNotNone(result.error)
+        # Not retried with the current ETag
+        self.assertEqual(self.http.deletes, [(HREF, 'planned')])
+        self.assertIn(HREF, self.http.etags)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for smc.index.text. Collection listings and element data are read
+from memory rather than the SMC.
+"""
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+from smc.api.exceptions import FetchElementFailed
+from smc.index.text import TextIndex
+
+HOSTS = 'http://smc/6.2/elements/host/'
+
+
+class FakeHosts(object):
+    """
+    Host class with a collection listing and element data by href.
+    Reads of hrefs in ``failing`` raise FetchElementFailed.
+    """
+    typeof = 'host'
+
+    def __init__(self):
+        self.elements = {}  # href -> (etag, json)
+        self.failing = set()
+        self.objects = self
+
+    def set(self, number, name, comment):
+        href = HOSTS + str(number)
+        etag = str(hash((name, comment)))
+        self.elements[href] = (etag, {'name': name, 'comment': comment})
+
+    def all(self):
+        return self
+
+    def iter_items(self):
+        return [{'href': href, 'name': json['name'], 'type': 'host'}
+                for href, (_, json) in self.elements.items()]
+
+    def __call__(self, *exception, **kwargs):
+        href, headers = kwargs.get('href'), kwargs.get('headers') or {}
+        hosts = self
+
+        class Result(object):
+            code = 200
+
+        class Request(object):
+            def read(self):
+                if href in hosts.failing:
+                    raise FetchElementFailed('unavailable')
+                result = Result()
+                result.etag, result.json = hosts.elements[href]
+                if headers.get('if-none-match') == result.etag:
+                    result.code, result.json = 304, None
+                return result
+
+        return Request()
+
+
+class TextIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = FakeHosts()
+        patcher = mock.patch('smc.index.text.prepared_request', self.hosts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = TextIndex(comments=True)
+
+    def names(self, elements):
+        return sorted(element.name for element in elements)
+
+    def test_failed_read_indexes_listing(self):
+        self.hosts.set(1, 'web-1', 'dmz server')
+        self.hosts.failing.add(HOSTS + '1')
+        self.index.refresh([self.hosts])
+        self.assertEqual(self.names(self.index.prefix('web')), ['web-1'])
+        self.assertEqual(self.index.tokens('dmz', fields=('comment',)), [])
+        # Retried by the next refresh
+        self.hosts.failing.clear()
+        self.index.refresh([self.hosts])
+        self.assertEqual(
+            self.names(self.index.tokens('dmz', fields=('comment',))),
+            ['web-1'])
+
+    def test_refresh_changed_comments(self):
+        for number in range(2000):
+            self.hosts.set(number, 'host-%d' % number, 'old')
+        self.index.refresh([self.hosts])
+        for number in range(0, 2000, 2):
+            self.hosts.set(number, 'host-%d' % number, 'new comment')
+        self.index.refresh([self.hosts])
+        self.assertEqual(len(self.index.prefix('new', field='comment')), 1000)
+        self.assertEqual(len(self.index.prefix('old', field='comment')), 1000)
+        self.assertEqual(len(self.index.prefix('host-')), 2000)
+        self.assertEqual(len(self.index.tokens('comment',
+                                               fields=('comment',))), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for smc.base.transaction. Requests to the SMC are replaced by an in
+memory store of element json.
+"""
+import copy
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:  # Python 2
+    import mock
+
+import smc
+from smc.elements.network import Host
+
+HREF = 'http://smc/6.2/elements/host/1'
+
+
+class FakeSMC(object):
+    """
+    Element json by href. Records each update sent.
+    """
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.updates = []
+
+    def __call__(self, *exception, **kwargs):
+        smc_ = self
+        href = kwargs.get('href')
+
+        class Result(object):
+            def __init__(self, json=None):
+                self.json = json
+                self.etag = 'etag'
+                self.href = href
+                self.msg = None
+
+        class Request(object):
+            def read(self):
+                return Result(copy.deepcopy(smc_.elements[href]))
+
+            def update(self):
+                smc_.updates.append((href, copy.deepcopy(kwargs['json'])))
+                smc_.elements[href] = copy.deepcopy(kwargs['json'])
+                return Result()
+
+        return Request()
+
+
+class TransactionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.smc = FakeSMC({HREF: {
+            'name': 'a', 'address': '1.1.1.1', 'comment': 'old'}})
+        patcher = mock.patch('smc.base.model.prepared_request', self.smc)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def host(self):
+        return Host('a', href=HREF, type='host')
+
+    def test_single_update_per_element(self):
+        with smc.transaction():
+            host = self.host()
+            host.comment('new')
+            host.modify_attribute(address='2.2.2.2')
+        self.assertEqual(len(self.smc.updates), 1)
+        self.assertEqual(self.smc.elements[HREF]['comment'], 'new')
+        self.assertEqual(self.smc.elements[HREF]['address'], '2.2.2.2')
+
+    def test_second_instance_keeps_earlier_changes(self):
+        with smc.transaction():
+            self.host().comment('new')
+            self.host().modify_attribute(address='2.2.2.2')
+        self.assertEqual(len(self.smc.updates), 1)
+        _, json = self.smc.updates[0]
+        self.assertEqual(json['comment'], 'new')
+        self.assertEqual(json['address'], '2.2.2.2')
+
+    def test_second_instance_shares_data_after_enlist(self):
+        with smc.transaction():
+            first, second = self.host(), self.host()
+            first.comment('new')
+            second.modify_attribute(address='2.2.2.2')
+            first.modify_attribute(address='3.3.3.3')
+            second.comment('newer')
+        _, json = self.smc.updates[0]
+        self.assertEqual(json['comment'], 'newer')
+        self.assertEqual(json['address'], '3.3.3.3')
+        # Both instances read the committed data
+        self.assertEqual(second.data['address'], '3.3.3.3')
+
+    def test_rollback_sends_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with smc.transaction():
+                self.host().comment('new')
+                raise RuntimeError
+        self.assertEqual(self.smc.updates, [])
+        self.assertEqual(self.host().data['comment'], 'old')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for smc.base.views copy-on-write views of element json.
+"""
+import copy
+import json
+import unittest
+
+from smc.base.views import freeze, unwrap, writable
+
+
+def element_json():
+    return {'name': 'fw', 'antivirus': {'enabled': False},
+            'dns': [{'value': '8.8.8.8'}],
+            'link': [{'rel': 'self', 'href': 'http://smc/elements/1'}]}
+
+
+class ViewsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = element_json()
+        self.data = freeze(self.base)
+
+    def assertBaseUnchanged(self):
+        self.assertEqual(self.base, element_json())
+
+    def test_reads_share_json(self):
+        for key in self.data:
+            value = self.data[key]
+            if hasattr(value, 'keys'):
+                dict(value)
+        [item['value'] for item in self.data['dns']]
+        self.assertIsNone(self.data._own)
+        self.assertIs(unwrap(self.data), self.base)
+
+    def test_changes_copy_modified_levels(self):
+        self.data['antivirus']['enabled'] = True
+        self.data['dns'].append({'value': '8.8.4.4'})
+        result = unwrap(self.data)
+        self.assertBaseUnchanged()
+        self.assertEqual(result['antivirus'], {'enabled': True})
+        self.assertEqual(len(result['dns']), 2)
+        self.assertIs(result['link'], self.base['link'])
+
+    def test_copies_do_not_expose_json(self):
+        for values in (dict(self.data), dict(**self.data),
+                       dict(self.data.items()), self.data.copy()):
+            try:
+                values['antivirus']['enabled'] = True
+                values['dns'][0]['value'] = '1.1.1.1'
+            except TypeError:
+                pass
+        copy.copy(self.data)
+        copy.deepcopy(self.data)['dns'].append(None)
+        self.assertBaseUnchanged()
+
+    def test_views_of_same_json(self):
+        first, second = self.data['antivirus'], self.data['antivirus']
+        first['enabled'] = True
+        second['level'] = 1
+        self.assertEqual(unwrap(self.data)['antivirus'],
+                         {'enabled': True, 'level': 1})
+        self.assertBaseUnchanged()
+
+    def test_view_kept_after_insert(self):
+        dns = self.data['dns'][0]
+        self.data['dns'].insert(0, {'value': '8.8.4.4'})
+        dns['value'] = '1.1.1.1'
+        self.assertEqual(unwrap(self.data)['dns'],
+                         [{'value': '8.8.4.4'}, {'value': '1.1.1.1'}])
+
+    def test_writable(self):
+        antivirus = writable(self.data['antivirus'])
+        antivirus['enabled'] = True
+        self.assertTrue(unwrap(self.data)['antivirus']['enabled'])
+        self.assertBaseUnchanged()
+
+    def test_serialize(self):
+        self.data['name'] = 'fw2'
+        self.assertEqual(json.loads(json.dumps(unwrap(self.data)))['name'],
+                         'fw2')
+        self.assertEqual(self.data, dict(element_json(), name='fw2'))
+
+
+if __name__ == '__main__':
+    unittest.main()